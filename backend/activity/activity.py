@@ -1,5 +1,7 @@
 import os
+import sys
 import json
+import hashlib
 import pika
 import threading
 from datetime import datetime
@@ -8,6 +10,11 @@ from dotenv import load_dotenv
 from flask import Flask, jsonify
 from google.cloud import firestore
 from google.oauth2 import service_account
+# Shared helpers in backend/ (copied next to this file in the Docker image)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import responses
+import service_runner
+from log_batcher import LogBatcher
 
 # Load .env from root (../../.env)
 load_dotenv()
@@ -21,28 +28,38 @@ cred = service_account.Credentials.from_service_account_file(service_account_pat
 db = firestore.Client(project=project_id, credentials=cred, database=database_id)
 
 app = Flask(__name__)
+responses.init_app(app)
 
 # Calculate current week ID like "2025-wk13"
 def get_week_id(timestamp: datetime) -> str:
     year, week_num, _ = timestamp.isocalendar()
     return f"{year}-wk{week_num:02d}"
 
-def store_log(week_id: str, dish_name: str, dish_data: dict):
+def parse_time(value: str) -> datetime:
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+def log_id(dish_name: str, dish_data: dict) -> str:
+    """
+    Document ID for one dish's log, computed without reading the collection:
+    the completion time in milliseconds (so IDs, and therefore streamed logs,
+    are in completion order) plus a digest of the log's content. A redelivered
+    message writes the same IDs again instead of duplicating its logs.
     """
-    Stores one dish's log info in the Firestore collection for the given week_id.
-    Expects dish_data to contain at least:
+    end_ms = int(parse_time(dish_data["orderEndTime"]).timestamp() * 1000)
+    content = "|".join(str(dish_data.get(field)) for field in ("hawkerCenter", "stallName", "orderStartTime", "orderEndTime"))
+    digest = hashlib.sha1(f"{content}|{dish_name}".encode()).hexdigest()[:12]
+    return f"log_{end_ms:013d}_{digest}"
+
+def store_log(writer, week_id: str, dish_name: str, dish_data: dict):
+    """
+    Adds one dish's log info to writer (a BulkWriter or WriteBatch), for the
+    Firestore collection of the given week_id. Expects dish_data to contain at least:
       - hawkerCenter
       - stallName
       - quantity
       - orderStartTime
       - orderEndTime
     """
-    collection_ref = db.collection(week_id)
-
-    # Count how many docs are already there (not always optimal for large sets)
-    existing_logs = list(collection_ref.stream())
-    next_id = f"log{len(existing_logs) + 1}"
-
     payload = {
         "hawkerCenter": dish_data.get("hawkerCenter"),
         "dishName": dish_name,
@@ -51,9 +68,23 @@ def store_log(week_id: str, dish_name: str, dish_data: dict):
         "orderStartTime": dish_data.get("orderStartTime"),
         "orderEndTime": dish_data.get("orderEndTime")
     }
-
-    collection_ref.document(next_id).set(payload)
-    print(f"Logged dish '{dish_name}' into {week_id}/{next_id}")
+    doc_id = log_id(dish_name, dish_data)
+    writer.set(db.collection(week_id).document(doc_id), payload)
+    return f"{week_id}/{doc_id}"
+
+###############################################################################
+# Micro-batched ingestion: Q_log messages are buffered and written together
+###############################################################################
+# Flush when this many dishes are buffered, or when the oldest buffered
+# message has waited ACTIVITY_BATCH_MAX_MS
+ACTIVITY_BATCH_MAX_ITEMS = int(os.environ.get("ACTIVITY_BATCH_MAX_ITEMS", 500))
+ACTIVITY_BATCH_MAX_MS = int(os.environ.get("ACTIVITY_BATCH_MAX_MS", 250))
+# Unacked messages RabbitMQ hands us; buffered messages count against it
+ACTIVITY_PREFETCH = int(os.environ.get("ACTIVITY_PREFETCH", 500))
+# Attempts per document before its message is requeued
+ACTIVITY_WRITE_ATTEMPTS = int(os.environ.get("ACTIVITY_WRITE_ATTEMPTS", 5))
+
+batcher = None
 
 def callback(ch, method, properties, body):
     """
@@ -73,26 +104,28 @@ def callback(ch, method, properties, body):
     """
     try:
         message = json.loads(body)
-        print("Received activity log")
 
         # Just grab the first dish to figure out what week it belongs to:
         # We'll assume every dish in this message shares the same startTime week
         first_dish = next(iter(message.values()))
-        start_time = datetime.fromisoformat(
-            first_dish["orderStartTime"].replace("Z", "+00:00")
-        )
+        start_time = parse_time(first_dish["orderStartTime"])
         week_id = get_week_id(start_time)
-
-        # Iterate over every dish in the message
-        for dish_name, data in message.items():
-            store_log(week_id, dish_name, data)
+        for dish_name, dish_data in message.items():
+            log_id(dish_name, dish_data)  # Fails here, not in the batch, if a dish is malformed
 
     except Exception as e:
+        # Malformed: retrying cannot help
         print("Error while processing message:", e)
+        ch.basic_ack(delivery_tag=method.delivery_tag)
+        return
+
+    # Acked by the batcher once written
+    batcher.add(method.delivery_tag, week_id, message)
 
 def run_consumer():
     """
-    Runs a RabbitMQ consumer on a separate thread (daemon).
+    Runs the RabbitMQ consumer until it is stopped: in a daemon thread when
+    started from __main__, or as the service_runner consumer role.
     Retries connection if RabbitMQ is not ready yet.
     """
     rabbit_host = os.environ.get("RABBITMQ_HOST", "localhost")
@@ -116,13 +149,23 @@ def run_consumer():
         print("Failed to connect to RabbitMQ after multiple attempts.")
         return
 
+    global batcher
     channel = connection.channel()
     channel.queue_declare(queue="Q_log", durable=True)
-    channel.basic_consume(queue="Q_log", on_message_callback=callback, auto_ack=True)
+    channel.basic_qos(prefetch_count=ACTIVITY_PREFETCH)
+    batcher = LogBatcher(
+        connection, channel, db.bulk_writer, store_log,
+        max_items=ACTIVITY_BATCH_MAX_ITEMS, max_ms=ACTIVITY_BATCH_MAX_MS, write_attempts=ACTIVITY_WRITE_ATTEMPTS
+    )
+    channel.basic_consume(queue="Q_log", on_message_callback=callback)
+    service_runner.stop_consuming_on_shutdown(connection, channel)
 
     print("activityLog microservice listening on RabbitMQ topic 'Q_log'...")
     try:
         channel.start_consuming()
+        # Stopped: write and ack what is buffered before exiting
+        batcher.flush()
+        connection.close()
     except Exception as e:
         print("Consumer crashed:", e)
 
@@ -160,4 +203,4 @@ def get_current_week_logs():
 if __name__ == '__main__':
     # Start the consumer in a background thread
     threading.Thread(target=run_consumer, daemon=True).start()
-    app.run(debug=True, host='0.0.0.0', port=5004)
\ No newline at end of file
+    app.run(debug=os.environ.get("FLASK_DEBUG") == "1", host='0.0.0.0', port=5004)
\ No newline at end of file
@@ -0,0 +1,87 @@
+"""
+Micro-batched ingestion for the activity service: Q_log messages are
+buffered and written to Firestore together, then acked.
+
+A batch is flushed when max_items dishes are buffered or max_ms after its
+first message, whichever comes first. Everything runs on the pika
+consumer thread (the timer is a connection.call_later callback), so the
+batcher needs no locking.
+"""
+
+import time
+
+
+class LogBatcher:
+    """
+    Buffers Q_log messages on the consumer thread and writes them through a
+    BulkWriter. Messages are acked only after their writes are committed;
+    messages with a write that kept failing are requeued (log IDs are
+    deterministic, so rewriting the rest of the message is harmless).
+
+    bulk_writer() returns a new BulkWriter; store(writer, week_id,
+    dish_name, dish_data) adds one dish's write and returns its path.
+    """
+
+    def __init__(self, connection, channel, bulk_writer, store, max_items=500, max_ms=250, write_attempts=5):
+        self.connection = connection
+        self.channel = channel
+        self.bulk_writer = bulk_writer
+        self.store = store
+        self.max_items = max_items
+        self.max_ms = max_ms
+        self.write_attempts = write_attempts
+        # (delivery_tag, week_id, dishes)
+        self.pending = []
+        self.items = 0
+        self.timer = None
+
+    def add(self, delivery_tag, week_id, dishes):
+        self.pending.append((delivery_tag, week_id, dishes))
+        self.items += len(dishes)
+        if self.items >= self.max_items:
+            self.flush()
+        elif self.timer is None:
+            self.timer = self.connection.call_later(self.max_ms / 1000, self.flush)
+
+    def flush(self):
+        if self.timer is not None:
+            self.connection.remove_timeout(self.timer)
+            self.timer = None
+        if not self.pending:
+            return
+        batch, items = self.pending, self.items
+        self.pending, self.items = [], 0
+
+        failed_paths = set()
+        def on_write_error(failure, bulk_writer):
+            if failure.attempts < self.write_attempts:
+                return True  # BulkWriter retries with backoff
+            failed_paths.add(failure.operation.reference.path)
+            print(f"Failed to write {failure.operation.reference.path}: {failure.message}")
+            return False
+
+        start = time.perf_counter()
+        writer = self.bulk_writer()
+        writer.on_write_error(on_write_error)
+        paths = []
+        try:
+            for delivery_tag, week_id, dishes in batch:
+                paths.append([self.store(writer, week_id, dish_name, dish_data) for dish_name, dish_data in dishes.items()])
+            writer.close()
+        except Exception as e:
+            print(f"Failed to write {len(batch)} activity log message(s), requeueing: {e}")
+            for delivery_tag, _, _ in batch:
+                self.channel.basic_nack(delivery_tag=delivery_tag, requeue=True)
+            return
+
+        if not failed_paths:
+            # Everything up to the newest tag on this channel is in this batch or already acked
+            self.channel.basic_ack(delivery_tag=batch[-1][0], multiple=True)
+        else:
+            for (delivery_tag, _, _), message_paths in zip(batch, paths):
+                if failed_paths.intersection(message_paths):
+                    self.channel.basic_nack(delivery_tag=delivery_tag, requeue=True)
+                else:
+                    self.channel.basic_ack(delivery_tag=delivery_tag)
+        print(f"Logged {items} dish(es) from {len(batch)} message(s) in {(time.perf_counter() - start) * 1000:.0f} ms"
+              + (f", {len(failed_paths)} write(s) failed" if failed_paths else ""))
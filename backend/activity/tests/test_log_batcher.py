@@ -0,0 +1,149 @@
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from log_batcher import LogBatcher  # noqa: E402
+
+
+class Connection:
+    """pika's call_later/remove_timeout; timers only fire when the test says so."""
+
+    def __init__(self):
+        self.timers = {}
+
+    def call_later(self, delay, callback):
+        timer = object()
+        self.timers[timer] = (delay, callback)
+        return timer
+
+    def remove_timeout(self, timer):
+        self.timers.pop(timer, None)
+
+    def fire(self):
+        for delay, callback in list(self.timers.values()):
+            callback()
+
+
+class Channel:
+    def __init__(self, log):
+        self.log = log
+        self.acks = []
+        self.nacks = []
+
+    def basic_ack(self, delivery_tag, multiple=False):
+        self.log.append(("ack", delivery_tag))
+        self.acks.append((delivery_tag, multiple))
+
+    def basic_nack(self, delivery_tag, requeue):
+        self.nacks.append(delivery_tag)
+
+
+class BulkWriter:
+    """Commits on close(); paths in failing fail on every attempt."""
+
+    def __init__(self, log, failing=(), error=None):
+        self.log = log
+        self.failing = failing
+        self.error = error
+        self.writes = []
+        self.on_error = None
+
+    def on_write_error(self, callback):
+        self.on_error = callback
+
+    def set(self, path, payload):
+        self.writes.append(path)
+
+    def close(self):
+        if self.error is not None:
+            raise self.error
+        for path in self.writes:
+            attempts = 1
+            while path in self.failing:
+                failure = SimpleNamespace(
+                    attempts=attempts, message="unavailable",
+                    operation=SimpleNamespace(reference=SimpleNamespace(path=path))
+                )
+                if not self.on_error(failure, self):
+                    break
+                attempts += 1
+        self.log.append(("committed", list(self.writes)))
+
+
+def store(writer, week_id, dish_name, dish_data):
+    path = f"{week_id}/{dish_name}"
+    writer.set(path, dish_data)
+    return path
+
+
+def make_batcher(max_items=3, failing=(), error=None):
+    log = []
+    connection, channel = Connection(), Channel(log)
+    writers = []
+
+    def bulk_writer():
+        writers.append(BulkWriter(log, failing, error))
+        return writers[-1]
+
+    batcher = LogBatcher(connection, channel, bulk_writer, store, max_items=max_items, max_ms=250, write_attempts=3)
+    return batcher, connection, channel, writers, log
+
+
+def test_flushes_when_max_items_are_buffered():
+    batcher, connection, channel, writers, log = make_batcher(max_items=3)
+    batcher.add(1, "wk", {"a": {}, "b": {}})
+    assert writers == [] and channel.acks == []
+    batcher.add(2, "wk", {"c": {}})
+    # Acked only after the writes are committed
+    assert log == [("committed", ["wk/a", "wk/b", "wk/c"]), ("ack", 2)]
+    assert channel.acks == [(2, True)]
+    # The size flush cancelled the timer
+    assert connection.timers == {}
+
+
+def test_flushes_on_the_timer():
+    batcher, connection, channel, writers, log = make_batcher(max_items=100)
+    batcher.add(1, "wk", {"a": {}})
+    batcher.add(2, "wk", {"b": {}})
+    assert len(connection.timers) == 1
+    assert [delay for delay, _ in connection.timers.values()] == [0.25]
+    connection.fire()
+    assert log == [("committed", ["wk/a", "wk/b"]), ("ack", 2)]
+    assert channel.acks == [(2, True)]
+
+
+def test_empty_flush_writes_nothing():
+    batcher, connection, channel, writers, log = make_batcher()
+    batcher.flush()
+    assert writers == [] and channel.acks == []
+
+
+def test_only_messages_with_failed_writes_are_requeued():
+    batcher, connection, channel, writers, log = make_batcher(max_items=100, failing={"wk/b"})
+    batcher.add(1, "wk", {"a": {}})
+    batcher.add(2, "wk", {"b": {}, "c": {}})
+    batcher.add(3, "wk", {"d": {}})
+    batcher.flush()
+    assert channel.nacks == [2]
+    assert channel.acks == [(1, False), (3, False)]
+
+
+def test_writer_error_requeues_the_whole_batch():
+    batcher, connection, channel, writers, log = make_batcher(max_items=100, error=RuntimeError("closed"))
+    batcher.add(1, "wk", {"a": {}})
+    batcher.add(2, "wk", {"b": {}})
+    batcher.flush()
+    assert channel.nacks == [1, 2]
+    assert channel.acks == []
+    assert log == []
+
+
+def test_next_batch_starts_empty():
+    batcher, connection, channel, writers, log = make_batcher(max_items=2)
+    batcher.add(1, "wk", {"a": {}, "b": {}})
+    batcher.add(2, "wk", {"c": {}})
+    connection.fire()
+    assert log == [("committed", ["wk/a", "wk/b"]), ("ack", 1), ("committed", ["wk/c"]), ("ack", 2)]
+    assert channel.acks == [(1, True), (2, True)]
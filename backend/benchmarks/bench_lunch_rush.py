@@ -0,0 +1,185 @@
+"""
+Lunch-rush load test for the payment path, runnable offline against
+payment/fake_stripe.py.
+
+    cd payment
+    FAKE_STRIPE_LATENCY_MEDIAN_MS=250 python fake_stripe.py
+    STRIPE_API_BASE=http://localhost:12111 STRIPE_API_KEY=sk_test_fake python ../service_runner.py web payment:app --port 5002
+
+    # POST /payment directly
+    python benchmarks/bench_lunch_rush.py --mode payment --url http://localhost:5002 \
+        --profile 20:5,40:60,20:5 --spike 30:10:1500 --fake-stripe http://localhost:12111
+
+    # The whole order path (ordermgt with VALIDATE_ORDER_PRICES=false, or a real menu)
+    python benchmarks/bench_lunch_rush.py --mode order --url http://localhost:5003 \
+        --order-template order.json --profile 20:5,40:60,20:5
+
+Arrivals are open-loop (Poisson) at the rate of the current phase of
+--profile (seconds:requests-per-second,...), so a slow service does not
+slow the load down, just as customers at lunch do not wait for each other.
+--spike AT:DURATION:MEDIAN_MS raises the fake Stripe's latency during the
+run, to see how a Stripe slowdown propagates.
+
+Prints one line per --window seconds (requests sent in it, sent/s, p50/p99,
+errors, status codes) once all of that window's requests have completed,
+and a summary at the end.
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+import uuid
+from collections import Counter, defaultdict
+
+import httpx
+
+
+def parse_profile(profile):
+    phases = []
+    for phase in profile.split(","):
+        seconds, rate = phase.split(":")
+        phases.append((float(seconds), float(rate)))
+    return phases
+
+
+def rate_at(phases, elapsed):
+    for seconds, rate in phases:
+        if elapsed < seconds:
+            return rate
+        elapsed -= seconds
+    return None
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p * len(values)))] * 1000
+
+
+def payment_request(args, template):
+    return "/payment", {"amount": 5.5, "token": {"id": "tok_visa", "type": "card"}, "orderId": f"bench_{uuid.uuid4().hex}"}
+
+
+def order_request(args, template):
+    body = dict(template)
+    body["userId"] = f"bench_user_{random.randrange(args.users)}"
+    return "/order", body
+
+
+async def send(client, path, body, window, results, outstanding):
+    start = time.perf_counter()
+    try:
+        response = await client.post(path, json=body)
+        status = response.status_code
+    except httpx.HTTPError as e:
+        status = type(e).__name__
+    results[window].append((time.perf_counter() - start, status))
+    outstanding[window] -= 1
+
+
+async def set_fake_latency(fake_stripe, median_ms):
+    async with httpx.AsyncClient(base_url=fake_stripe) as client:
+        await client.post("/_fake/config", json={"latencyMedianMs": median_ms})
+
+
+async def spike(args, start):
+    at, duration, median_ms = (float(x) for x in args.spike.split(":"))
+    async with httpx.AsyncClient(base_url=args.fake_stripe) as client:
+        baseline = (await client.get("/_fake/config")).json()["latencyMedianMs"]
+    await asyncio.sleep(max(0, start + at - time.perf_counter()))
+    print(f"--- spike: Stripe median latency {baseline:.0f} -> {median_ms:.0f} ms for {duration:.0f}s")
+    await set_fake_latency(args.fake_stripe, median_ms)
+    await asyncio.sleep(duration)
+    await set_fake_latency(args.fake_stripe, baseline)
+    print(f"--- spike over: Stripe median latency back to {baseline:.0f} ms")
+
+
+def report(window, samples, window_seconds):
+    latencies = [latency for latency, status in samples]
+    statuses = Counter(status for _, status in samples)
+    errors = sum(count for status, count in statuses.items() if not (isinstance(status, int) and status < 500))
+    print(
+        f"t={window * window_seconds:>5.0f}s  n={len(samples):>5}  {len(samples) / window_seconds:>6.1f}/s  "
+        f"p50={percentile(latencies, 0.5):>7.1f}ms  p99={percentile(latencies, 0.99):>7.1f}ms  "
+        f"errors={errors:>4}  {dict(statuses)}"
+    )
+
+
+async def run(args):
+    phases = parse_profile(args.profile)
+    template = {}
+    if args.mode == "order":
+        with open(args.order_template) as f:
+            template = json.load(f)
+    make_request = payment_request if args.mode == "payment" else order_request
+
+    # Results are grouped by the window in which the request was sent; a window
+    # is reported once every request sent in it has completed, so slow requests
+    # (e.g. during a spike) count towards the window that sent them
+    results = defaultdict(list)
+    outstanding = Counter()
+    in_flight = set()
+    dropped = 0
+    limits = httpx.Limits(max_connections=args.max_in_flight, max_keepalive_connections=args.max_in_flight)
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as client:
+        start = time.perf_counter()
+        spike_task = asyncio.create_task(spike(args, start)) if args.spike else None
+        reported = 0
+        while True:
+            elapsed = time.perf_counter() - start
+            rate = rate_at(phases, elapsed)
+            if rate is None:
+                break
+            window = int(elapsed // args.window)
+            while reported < window and outstanding[reported] == 0:
+                report(reported, results[reported], args.window)
+                reported += 1
+            if len(in_flight) >= args.max_in_flight:
+                dropped += 1
+            else:
+                path, body = make_request(args, template)
+                outstanding[window] += 1
+                task = asyncio.create_task(send(client, path, body, window, results, outstanding))
+                in_flight.add(task)
+                task.add_done_callback(in_flight.discard)
+            await asyncio.sleep(random.expovariate(rate) if rate > 0 else 0.1)
+
+        await asyncio.gather(*in_flight)
+        if spike_task:
+            spike_task.cancel()
+        for window in range(reported, max(results, default=-1) + 1):
+            report(window, results[window], args.window)
+
+    samples = [sample for window in results.values() for sample in window]
+    latencies = [latency for latency, _ in samples]
+    print(
+        f"\ntotal={len(samples)}  dropped (client at --max-in-flight)={dropped}  "
+        f"mean={statistics.mean(latencies) * 1000 if latencies else 0:.1f}ms  "
+        f"p50={percentile(latencies, 0.5):.1f}ms  p99={percentile(latencies, 0.99):.1f}ms  "
+        f"statuses={dict(Counter(status for _, status in samples))}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lunch-rush load test for /payment and /order")
+    parser.add_argument("--mode", choices=["payment", "order"], default="payment")
+    parser.add_argument("--url", required=True, help="Base URL of the payment or order service")
+    parser.add_argument("--profile", default="20:5,40:50,20:5", help="seconds:rate phases, comma separated")
+    parser.add_argument("--order-template", help="JSON body for POST /order (userId is randomised)")
+    parser.add_argument("--users", type=int, default=1000, help="Distinct userIds in order mode")
+    parser.add_argument("--spike", help="AT:DURATION:MEDIAN_MS latency spike on the fake Stripe")
+    parser.add_argument("--fake-stripe", default="http://localhost:12111")
+    parser.add_argument("--window", type=float, default=5.0, help="Report interval in seconds")
+    parser.add_argument("--max-in-flight", type=int, default=500)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    args = parser.parse_args()
+    if args.mode == "order" and not args.order_template:
+        parser.error("--order-template is required in order mode")
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Load test comparing the WSGI (menu.py under gunicorn) and ASGI (menu_asgi.py
+under uvicorn) menu services.
+
+Start both against the same Firestore project, e.g.
+
+    cd menu
+    gunicorn -b 0.0.0.0:5001 -w 2 --threads 8 menu:app
+    uvicorn menu_asgi:app --port 5101 --workers 2
+
+then run
+
+    python benchmarks/bench_menu_asgi.py \
+        --target wsgi=http://localhost:5001 --target asgi=http://localhost:5101 \
+        --path "/hawkerCenters/Maxwell Food Centre/stalls/Tian Tian/dishes" \
+        --concurrency 200 --duration 20
+
+Reports requests per second, p50/p99 latency and errors for every target.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from urllib.parse import quote
+
+import httpx
+
+
+async def worker(client, url, deadline, latencies, errors):
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            response = await client.get(url)
+            if response.status_code >= 500:
+                errors.append(response.status_code)
+                continue
+        except httpx.HTTPError as e:
+            errors.append(type(e).__name__)
+            continue
+        latencies.append(time.perf_counter() - start)
+
+
+async def run_target(base_url, path, concurrency, duration, warmup):
+    url = base_url.rstrip("/") + quote(path)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+        # Warm-up fills caches and opens the connection pool
+        warm_deadline = time.perf_counter() + warmup
+        await asyncio.gather(*[worker(client, url, warm_deadline, [], []) for _ in range(concurrency)])
+
+        latencies, errors = [], []
+        started = time.perf_counter()
+        deadline = started + duration
+        await asyncio.gather(*[worker(client, url, deadline, latencies, errors) for _ in range(concurrency)])
+        elapsed = time.perf_counter() - started
+    return latencies, errors, elapsed
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return float("nan")
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", action="append", required=True, help="label=base_url, repeatable")
+    parser.add_argument("--path", default="/hawkerCenters")
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--warmup", type=float, default=3.0)
+    args = parser.parse_args()
+
+    print(f"path={args.path} concurrency={args.concurrency} duration={args.duration}s\n")
+    print(f"{'target':<10}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'mean ms':>10}{'errors':>8}")
+    for target in args.target:
+        label, base_url = target.split("=", 1)
+        latencies, errors, elapsed = asyncio.run(
+            run_target(base_url, args.path, args.concurrency, args.duration, args.warmup)
+        )
+        latencies.sort()
+        mean = statistics.fmean(latencies) if latencies else float("nan")
+        print(
+            f"{label:<10}{len(latencies) / elapsed:>10.1f}"
+            f"{percentile(latencies, 0.50) * 1000:>10.1f}{percentile(latencies, 0.99) * 1000:>10.1f}"
+            f"{mean * 1000:>10.1f}{len(errors):>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Compares Flask's default jsonify with the shared response layer (responses.py)
+on a get_all_orders-shaped payload.
+
+    python benchmarks/bench_responses.py [--orders 200] [--requests 500]
+
+Prints bytes on the wire and CPU time per request for each variant. No
+Firestore access is needed; timestamps are built as DatetimeWithNanoseconds
+when google-api-core is installed, plain datetimes otherwise.
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+from flask import Flask, jsonify
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import responses
+
+try:
+    from google.api_core.datetime_helpers import DatetimeWithNanoseconds as Timestamp
+except ImportError:
+    Timestamp = datetime
+
+DISHES = ["Chicken Rice", "Roasted Pork Rice", "Iced Lemon Tea", "Char Kway Teow", "Fried Carrot Cake"]
+
+
+def build_orders(count: int) -> dict:
+    start = Timestamp(2025, 4, 4, 12, 0, 0, tzinfo=timezone.utc)
+    orders = {}
+    for n in range(count):
+        order = {"userId": f"user_{n % 50:03d}", "phoneNumber": "+6591234567"}
+        for i, dish in enumerate(DISHES[: 1 + n % 3]):
+            started = start + timedelta(seconds=n * 7 + i)
+            order[dish] = {
+                "completed": n % 4 == 0,
+                "quantity": 1 + i,
+                "time_started": Timestamp.fromtimestamp(started.timestamp(), tz=timezone.utc),
+                "time_completed": None,
+                "waitTime": 5 + i * 3,
+                "price": 4.5 + i,
+            }
+        orders[f"order_{1743768000000 + n}"] = order
+    return orders
+
+
+def make_app(payload: dict, shared_layer: bool) -> Flask:
+    app = Flask(f"bench_{shared_layer}")
+    if shared_layer:
+        responses.init_app(app)
+
+    @app.route("/orders")
+    def get_all_orders():
+        return jsonify(payload), 200
+
+    return app
+
+
+def run(app: Flask, requests: int, accept_encoding: str):
+    client = app.test_client()
+    headers = {"Accept-Encoding": accept_encoding} if accept_encoding else {}
+    response = client.get("/orders", headers=headers)  # warm-up
+    size = len(response.get_data())
+    encoding = response.headers.get("Content-Encoding", "identity")
+
+    cpu_start = time.process_time()
+    for _ in range(requests):
+        client.get("/orders", headers=headers)
+    cpu_per_request_ms = (time.process_time() - cpu_start) * 1000 / requests
+    return size, encoding, cpu_per_request_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+
+    payload = build_orders(args.orders)
+    print(f"orjson: {'yes' if responses.orjson else 'no'}, brotli: {'yes' if responses.brotli else 'no'}")
+    print(f"payload: {args.orders} orders, {args.requests} requests per variant\n")
+    print(f"{'variant':<34}{'encoding':<10}{'bytes':>10}{'cpu ms/req':>12}")
+
+    baseline = None
+    for label, shared_layer, accept in [
+        ("flask jsonify", False, "gzip, br"),
+        ("shared layer, no compression", True, ""),
+        ("shared layer, gzip", True, "gzip"),
+        ("shared layer, br + gzip", True, "br, gzip"),
+    ]:
+        size, encoding, cpu_ms = run(make_app(payload, shared_layer), args.requests, accept)
+        if baseline is None:
+            baseline = (size, cpu_ms)
+        print(f"{label:<34}{encoding:<10}{size:>10}{cpu_ms:>12.3f}")
+
+    print(f"\nbaseline: {baseline[0]} bytes, {baseline[1]:.3f} ms CPU per request")
+
+
+if __name__ == "__main__":
+    main()
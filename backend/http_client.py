@@ -0,0 +1,119 @@
+"""
+Shared HTTP client for calls between the HawkerFlow services.
+
+    import http_client
+    r = http_client.get(f"{MENU_SERVICE_URL}/hawkerCenters", timeout=5)
+
+- One requests.Session per process with a connection pool per host, so
+  keep-alive connections are reused instead of opening a new TCP connection
+  for every call.
+- timeout is a budget for the whole call, retries included: every attempt
+  gets what is left of it.
+- Idempotent methods are retried on connection errors and 502/503/504 with
+  exponential backoff and full jitter. POST/PATCH are never retried here.
+"""
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Per-host pool size; keep it at or above the number of threads making calls
+POOL_MAXSIZE = int(os.environ.get("HTTP_POOL_MAXSIZE", 32))
+# Number of distinct hosts whose pools are kept
+POOL_CONNECTIONS = int(os.environ.get("HTTP_POOL_CONNECTIONS", 10))
+DEFAULT_TIMEOUT = 5.0
+DEFAULT_RETRIES = 2
+CONNECT_TIMEOUT = 1.0
+BACKOFF_BASE = 0.05
+BACKOFF_MAX = 1.0
+
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+RETRY_STATUS_CODES = {502, 503, 504}
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def _new_session() -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE, max_retries=0)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def get_session() -> requests.Session:
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _new_session()
+    return _session
+
+
+def _reset_after_fork():
+    # Pooled sockets must not be shared between a parent and its forked workers
+    global _session, _session_lock
+    _session = None
+    _session_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff for the given retry attempt (1-based)."""
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+
+def request(method: str, url: str, timeout: float = DEFAULT_TIMEOUT, retries: int = None, **kwargs) -> requests.Response:
+    """
+    Sends a request over the shared pool. Raises requests exceptions like
+    requests.request() does; returns the last response when retries run out.
+    """
+    method = method.upper()
+    if retries is None:
+        retries = DEFAULT_RETRIES if method in IDEMPOTENT_METHODS else 0
+    deadline = time.monotonic() + timeout
+    session = get_session()
+
+    attempt = 0
+    last_response = None
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            response = session.request(method, url, timeout=(min(CONNECT_TIMEOUT, remaining), remaining), **kwargs)
+            if response.status_code not in RETRY_STATUS_CODES or attempt >= retries:
+                return response
+            last_response = response
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt >= retries:
+                raise
+
+        attempt += 1
+        delay = backoff_delay(attempt)
+        if time.monotonic() + delay >= deadline:
+            break
+        time.sleep(delay)
+
+    if last_response is not None:
+        return last_response
+    raise requests.Timeout(f"Timeout budget of {timeout}s exhausted for {method} {url}")
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    return request("GET", url, **kwargs)
+
+
+def post(url: str, **kwargs) -> requests.Response:
+    return request("POST", url, **kwargs)
+
+
+def patch(url: str, **kwargs) -> requests.Response:
+    return request("PATCH", url, **kwargs)
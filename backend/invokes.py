@@ -1,4 +1,5 @@
 import requests
+import http_client
 
 SUPPORTED_HTTP_METHODS = set([
     "GET", "OPTIONS", "HEAD", "POST", "PUT", "PATCH", "DELETE"
@@ -17,7 +18,7 @@ def invoke_http(url, method='GET', json=None, **kwargs):
 
     try:
         if method.upper() in SUPPORTED_HTTP_METHODS:
-            r = requests.request(method, url, json = json, **kwargs)
+            r = http_client.request(method, url, json = json, **kwargs)
         else:
             raise Exception("HTTP method {} unsupported.".format(method))
     except Exception as e:
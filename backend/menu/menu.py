@@ -1,13 +1,22 @@
 import os
+import sys
+import threading
 from dotenv import load_dotenv
 from flask import Flask, jsonify, request
 from google.cloud import firestore
 from google.oauth2 import service_account
+from search_index import DishSearchIndex
+from snapshots import MenuSnapshotPublisher, MenuSnapshotFollower
+# Shared helpers in backend/ (copied next to this file in the Docker image)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import responses
+import service_runner
 
 # Load environment variables
 load_dotenv()
 
 app = Flask(__name__)
+responses.init_app(app)
 
 # Retrieve credentials and project ID
 service_account_path = os.environ.get("FIREBASE_SERVICE_ACCOUNT_KEY_PATH")
@@ -19,6 +28,118 @@ cred = service_account.Credentials.from_service_account_file(service_account_pat
 # Initialize Firestore client (remove the database parameter if not needed)
 db = firestore.Client(project=project_id, credentials=cred, database='menu')
 
+##############################################
+# Static menu snapshots (published when MENU_SNAPSHOT_DIR is set)
+##############################################
+def build_hawker_snapshot(hawker_id):
+    """Reads one hawker centre with all its stalls and dishes, in the same
+    shape as the GET routes return them."""
+    hawker_doc_ref = db.collection("hawkerCenters").document(hawker_id)
+    hawker_doc = hawker_doc_ref.get()
+    if not hawker_doc.exists:
+        return None
+    hawker_data = hawker_doc.to_dict()
+    hawker_data["hawkerId"] = hawker_doc.id
+    stalls = []
+    for stall_doc in hawker_doc_ref.collection("Stalls").stream():
+        stall_data = stall_doc.to_dict()
+        stall_data["stallId"] = stall_doc.id
+        stall_data["dishes"] = []
+        for dish_doc in stall_doc.reference.collection("dishes").stream():
+            dish_data = dish_doc.to_dict()
+            dish_data["dishId"] = dish_doc.id
+            stall_data["dishes"].append(dish_data)
+        stalls.append(stall_data)
+    return {"hawkerCenter": hawker_data, "stalls": stalls}
+
+snapshot_dir = os.environ.get("MENU_SNAPSHOT_DIR")
+# Only the process running the Firestore watches publishes (see start_menu_watches)
+snapshot_publisher = None
+
+def mark_menu_changed(hawker_id):
+    if snapshot_publisher:
+        snapshot_publisher.mark_dirty(hawker_id)
+
+##############################################
+# Dish search index
+# The menu watcher (run_menu_watcher) is the one process that watches
+# Firestore and publishes the snapshots; web workers only read, and keep
+# their index in step with the published snapshots.
+##############################################
+search_index = DishSearchIndex()
+menu_watches = []
+
+def on_published_snapshot(hawker_id, snapshot):
+    search_index.replace_hawker(hawker_id, snapshot["stalls"] if snapshot else [])
+
+snapshot_follower = MenuSnapshotFollower(snapshot_dir, on_published_snapshot) if snapshot_dir else None
+
+def current_search_index():
+    if snapshot_follower and not menu_watches:
+        snapshot_follower.refresh()
+    return search_index
+
+def _menu_path(doc):
+    # hawkerCenters/<hawkerId>/Stalls/<stallId>[/dishes/<dishId>]
+    return doc.reference.path.split("/")
+
+def on_stalls_snapshot(col_snapshot, changes, read_time):
+    for change in changes:
+        parts = _menu_path(change.document)
+        if len(parts) != 4 or parts[0] != "hawkerCenters":
+            continue
+        if change.type.name == "REMOVED":
+            search_index.remove_stall(parts[1], parts[3])
+        else:
+            search_index.upsert_stall(parts[1], parts[3], change.document.to_dict() or {})
+        mark_menu_changed(parts[1])
+
+def on_dishes_snapshot(col_snapshot, changes, read_time):
+    for change in changes:
+        parts = _menu_path(change.document)
+        if len(parts) != 6 or parts[0] != "hawkerCenters":
+            continue
+        if change.type.name == "REMOVED":
+            search_index.remove_dish(parts[1], parts[3], parts[5])
+        else:
+            search_index.upsert_dish(parts[1], parts[3], parts[5], change.document.to_dict() or {})
+        mark_menu_changed(parts[1])
+
+def on_hawker_centers_snapshot(col_snapshot, changes, read_time):
+    for change in changes:
+        mark_menu_changed(change.document.id)
+
+def start_menu_watches():
+    """
+    Subscribes to every stall and dish document (and, with MENU_SNAPSHOT_DIR,
+    starts publishing snapshots). The first snapshot delivers all existing
+    documents, which builds the index and publishes every hawker centre;
+    later snapshots only carry the documents that changed.
+    Runs in a single process: the menu watcher, or `python menu.py`.
+    """
+    global snapshot_publisher
+    if snapshot_dir and snapshot_publisher is None:
+        snapshot_publisher = MenuSnapshotPublisher(snapshot_dir, build_hawker_snapshot)
+    try:
+        menu_watches.append(db.collection_group("Stalls").on_snapshot(on_stalls_snapshot))
+        menu_watches.append(db.collection_group("dishes").on_snapshot(on_dishes_snapshot))
+        if snapshot_publisher:
+            menu_watches.append(db.collection("hawkerCenters").on_snapshot(on_hawker_centers_snapshot))
+    except Exception as e:
+        print(f"Failed to start menu watches: {e}")
+
+def run_menu_watcher():
+    """service_runner consumer role: python service_runner.py consumer menu:run_menu_watcher"""
+    if not snapshot_dir:
+        raise ValueError("MENU_SNAPSHOT_DIR is required for the menu watcher.")
+    stopped = threading.Event()
+    service_runner.on_shutdown(stopped.set)
+    start_menu_watches()
+    while not stopped.wait(1):
+        pass
+    for watch in menu_watches:
+        watch.unsubscribe()
+
 ##############################################
 # GET /hawkerCenters
 ##############################################
@@ -77,6 +198,110 @@ def get_dishes_in_stall(hawkerId, stallId):
         return jsonify({"error": f"No dishes found for stall '{stallId}'."}), 404
     return jsonify(dishes), 200
 
+##############################################
+# GET /hawkerCenters/<hawkerId>/menu
+# Live fallback for the static snapshots (same document as <hawkerId>/latest.json)
+##############################################
+@app.route("/hawkerCenters/<hawkerId>/menu", methods=["GET"])
+def get_hawker_center_menu(hawkerId):
+    snapshot = build_hawker_snapshot(hawkerId)
+    if snapshot is None:
+        return jsonify({"error": f"Hawker center '{hawkerId}' not found."}), 404
+    if snapshot_publisher:
+        # A snapshot miss may mean the static copy is missing or stale: publish
+        # what was just read (a no-op when the published version is the same)
+        try:
+            snapshot_publisher.publish(hawkerId, snapshot)
+        except Exception as e:
+            print(f"Failed to publish menu snapshot for '{hawkerId}': {e}")
+    return jsonify(snapshot), 200
+
+##############################################
+# GET /search?q=<text>&hawkerId=<id>&category=<category>&limit=<n>
+##############################################
+@app.route("/search", methods=["GET"])
+def search_dishes():
+    query = request.args.get("q", "")
+    hawker_id = request.args.get("hawkerId")
+    category = request.args.get("category")
+    if not query.strip() and not category:
+        return jsonify({"error": "Query parameter 'q' or 'category' is required."}), 400
+    try:
+        limit = int(request.args.get("limit", 20))
+    except ValueError:
+        return jsonify({"error": "Query parameter 'limit' must be an integer."}), 400
+    hits = current_search_index().search(query, hawker_id=hawker_id, category=category, limit=max(limit, 0))
+    return jsonify(hits), 200
+
+##############################################
+# POST /menu/dishes/batch
+##############################################
+def dish_ref_for(hawker_center, stall_name, dish_name):
+    return (
+        db.collection("hawkerCenters")
+            .document(hawker_center)
+            .collection("Stalls")
+            .document(stall_name)
+            .collection("dishes")
+            .document(dish_name)
+    )
+
+def dish_lookup_result(key, dish_data):
+    hawker_center, stall_name, dish_name = key
+    result = {"hawkerCenter": hawker_center, "stallName": stall_name, "dishName": dish_name, "found": dish_data is not None}
+    if dish_data is not None:
+        result["price"] = dish_data.get("price")
+        result["waitTime"] = dish_data.get("waitTime")
+        if "inStock" in dish_data:
+            result["inStock"] = dish_data["inStock"]
+    return result
+
+def parse_dish_keys(payload):
+    """Returns (keys, errors) for a list of {hawkerCenter, stallName, dishName}."""
+    items = payload.get("dishes") if isinstance(payload, dict) else payload
+    if not items or not isinstance(items, list):
+        return None, [{"error": "Payload must be a list of {hawkerCenter, stallName, dishName} objects"}]
+    keys, errors = [], []
+    for idx, item in enumerate(items):
+        key = (item.get("hawkerCenter"), item.get("stallName"), item.get("dishName")) if isinstance(item, dict) else (None,)
+        if not all(key):
+            errors.append({"index": idx, "error": "Missing hawkerCenter, stallName, or dishName"})
+        keys.append(key)
+    return keys, errors
+
+@app.route("/menu/dishes/batch", methods=["POST"])
+def batch_get_dishes():
+    """
+    Looks up the authoritative price and waitTime of many dishes in one call.
+    Dishes already in the search index are answered from memory; the rest
+    are read with a single Firestore get_all().
+    Results are returned in request order, with found=false for unknown dishes.
+    """
+    keys, errors = parse_dish_keys(request.get_json(silent=True))
+    if errors:
+        return jsonify({"error": "Invalid dish keys", "errors": errors}), 400
+
+    index = current_search_index()
+    found = {}
+    missing = []
+    for key in set(keys):
+        dish_data = index.get_dish(*key)
+        if dish_data is None:
+            missing.append(key)
+        else:
+            found[key] = dish_data
+
+    if missing:
+        refs = {dish_ref_for(*key).path: key for key in missing}
+        try:
+            for doc in db.get_all([dish_ref_for(*key) for key in missing]):
+                if doc.exists:
+                    found[refs[doc.reference.path]] = doc.to_dict()
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+
+    return jsonify([dish_lookup_result(key, found.get(key)) for key in keys]), 200
+
 ##############################################
 # PATCH /menu/waitTime
 ##############################################
@@ -129,9 +354,16 @@ def update_wait_times():
     # Otherwise, commit the batch
     try:
         batch.commit()
+        # Apply locally straight away; the dish watch delivers the same change shortly
+        for update in payload:
+            search_index.update_wait_time(
+                update["hawkerCenter"], update["stallName"], update["dishName"], update["waitTime"]
+            )
+            mark_menu_changed(update["hawkerCenter"])
         return jsonify({"message": "Wait times updated successfully"}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 if __name__ == "__main__":
-    app.run(host='0.0.0.0', port=5001, debug=True)
+    start_menu_watches()
+    app.run(host='0.0.0.0', port=5001, debug=os.environ.get("FLASK_DEBUG") == "1")
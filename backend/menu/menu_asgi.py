@@ -0,0 +1,224 @@
+"""
+ASGI mode of the menu service.
+
+Same routes and responses as menu.py, served by Quart on Firestore's
+AsyncClient so one worker keeps many menu requests in flight, and the
+existence checks of a route run concurrently with its stream.
+
+    uvicorn menu_asgi:app --host 0.0.0.0 --port 5001 --workers 2
+
+The search index is shared with menu.py: like its web workers, this one
+follows the snapshots published by the menu watcher (menu:run_menu_watcher),
+the single process that watches Firestore, which it only supports on the
+synchronous client.
+"""
+import asyncio
+from quart import Quart, Response, request
+from google.cloud import firestore
+
+import menu as wsgi_menu
+import responses
+
+app = Quart(__name__)
+
+async_db = firestore.AsyncClient(project=wsgi_menu.project_id, credentials=wsgi_menu.cred, database='menu')
+
+
+def json_response(obj, status=200):
+    # Quart has no after_request hook from responses.init_app, so compress here
+    body, encoding = responses.compress_body(responses.dumps_bytes(obj), request.accept_encodings)
+    headers = {"Vary": "Accept-Encoding"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(body, status=status, mimetype="application/json", headers=headers)
+
+
+async def collect(stream, id_field):
+    items = []
+    async for doc in stream:
+        data = doc.to_dict()
+        data[id_field] = doc.id
+        items.append(data)
+    return items
+
+##############################################
+# GET /hawkerCenters
+##############################################
+@app.route("/hawkerCenters", methods=["GET"])
+async def get_all_hawker_centers():
+    centers = await collect(async_db.collection("hawkerCenters").stream(), "hawkerId")
+    if not centers:
+        return json_response({"error": "No hawker centers found."}, 404)
+    return json_response(centers, 200)
+
+##############################################
+# GET /hawkerCenters/<hawkerId>/stalls
+##############################################
+@app.route("/hawkerCenters/<hawkerId>/stalls", methods=["GET"])
+async def get_stalls_for_hawker_center(hawkerId):
+    hawker_doc_ref = async_db.collection("hawkerCenters").document(hawkerId)
+    hawker_doc, stalls = await asyncio.gather(
+        hawker_doc_ref.get(),
+        collect(hawker_doc_ref.collection("Stalls").stream(), "stallId"),
+    )
+    if not hawker_doc.exists:
+        return json_response({"error": f"Hawker center '{hawkerId}' not found."}, 404)
+    if not stalls:
+        return json_response({"error": f"No stalls found for hawker center '{hawkerId}'."}, 404)
+    return json_response(stalls, 200)
+
+##############################################
+# GET /hawkerCenters/<hawkerId>/stalls/<stallId>/dishes
+##############################################
+@app.route("/hawkerCenters/<hawkerId>/stalls/<stallId>/dishes", methods=["GET"])
+async def get_dishes_in_stall(hawkerId, stallId):
+    hawker_doc_ref = async_db.collection("hawkerCenters").document(hawkerId)
+    stall_doc_ref = hawker_doc_ref.collection("Stalls").document(stallId)
+    hawker_doc, stall_doc, dishes = await asyncio.gather(
+        hawker_doc_ref.get(),
+        stall_doc_ref.get(),
+        collect(stall_doc_ref.collection("dishes").stream(), "dishId"),
+    )
+    if not hawker_doc.exists:
+        return json_response({"error": f"Hawker center '{hawkerId}' not found."}, 404)
+    if not stall_doc.exists:
+        return json_response({"error": f"Stall '{stallId}' not found in hawker center '{hawkerId}'."}, 404)
+    if not dishes:
+        return json_response({"error": f"No dishes found for stall '{stallId}'."}, 404)
+    return json_response(dishes, 200)
+
+##############################################
+# GET /hawkerCenters/<hawkerId>/menu
+##############################################
+@app.route("/hawkerCenters/<hawkerId>/menu", methods=["GET"])
+async def get_hawker_center_menu(hawkerId):
+    hawker_doc_ref = async_db.collection("hawkerCenters").document(hawkerId)
+    hawker_doc, stall_docs = await asyncio.gather(
+        hawker_doc_ref.get(),
+        collect(hawker_doc_ref.collection("Stalls").stream(), "stallId"),
+    )
+    if not hawker_doc.exists:
+        return json_response({"error": f"Hawker center '{hawkerId}' not found."}, 404)
+
+    # Every stall's dishes are streamed concurrently
+    dish_lists = await asyncio.gather(*[
+        collect(hawker_doc_ref.collection("Stalls").document(stall["stallId"]).collection("dishes").stream(), "dishId")
+        for stall in stall_docs
+    ])
+    for stall, dishes in zip(stall_docs, dish_lists):
+        stall["dishes"] = dishes
+    hawker_data = hawker_doc.to_dict()
+    hawker_data["hawkerId"] = hawker_doc.id
+    snapshot = {"hawkerCenter": hawker_data, "stalls": stall_docs}
+    if wsgi_menu.snapshot_publisher:
+        # Publish what was just read (a no-op when the published version is
+        # the same), off the event loop since it writes files
+        try:
+            await asyncio.to_thread(wsgi_menu.snapshot_publisher.publish, hawkerId, snapshot)
+        except Exception as e:
+            print(f"Failed to publish menu snapshot for '{hawkerId}': {e}")
+    return json_response(snapshot, 200)
+
+##############################################
+# GET /search
+##############################################
+@app.route("/search", methods=["GET"])
+async def search_dishes():
+    query = request.args.get("q", "")
+    category = request.args.get("category")
+    if not query.strip() and not category:
+        return json_response({"error": "Query parameter 'q' or 'category' is required."}, 400)
+    try:
+        limit = int(request.args.get("limit", 20))
+    except ValueError:
+        return json_response({"error": "Query parameter 'limit' must be an integer."}, 400)
+    index = await asyncio.to_thread(wsgi_menu.current_search_index)
+    hits = index.search(query, hawker_id=request.args.get("hawkerId"), category=category, limit=max(limit, 0))
+    return json_response(hits, 200)
+
+##############################################
+# POST /menu/dishes/batch
+##############################################
+@app.route("/menu/dishes/batch", methods=["POST"])
+async def batch_get_dishes():
+    keys, errors = wsgi_menu.parse_dish_keys(await request.get_json(silent=True))
+    if errors:
+        return json_response({"error": "Invalid dish keys", "errors": errors}, 400)
+
+    index = await asyncio.to_thread(wsgi_menu.current_search_index)
+    found = {}
+    missing = []
+    for key in set(keys):
+        dish_data = index.get_dish(*key)
+        if dish_data is None:
+            missing.append(key)
+        else:
+            found[key] = dish_data
+
+    if missing:
+        refs = {}
+        for key in missing:
+            ref = (
+                async_db.collection("hawkerCenters").document(key[0])
+                    .collection("Stalls").document(key[1])
+                    .collection("dishes").document(key[2])
+            )
+            refs[ref.path] = (key, ref)
+        try:
+            async for doc in async_db.get_all([ref for _, ref in refs.values()]):
+                if doc.exists:
+                    found[refs[doc.reference.path][0]] = doc.to_dict()
+        except Exception as e:
+            return json_response({"error": str(e)}, 500)
+
+    return json_response([wsgi_menu.dish_lookup_result(key, found.get(key)) for key in keys], 200)
+
+##############################################
+# PATCH /menu/waitTime
+##############################################
+@app.route("/menu/waitTime", methods=["PATCH"])
+async def update_wait_times():
+    payload = await request.get_json()
+    if not payload or not isinstance(payload, list):
+        return json_response({"error": "Payload must be a list of update objects"}, 400)
+
+    batch = async_db.batch()
+    errors = []
+    for idx, update in enumerate(payload):
+        hawker_center = update.get("hawkerCenter")
+        stall_name = update.get("stallName")
+        dish_name = update.get("dishName")
+        wait_time = update.get("waitTime")
+
+        if not all([hawker_center, stall_name, dish_name, (wait_time is not None)]):
+            errors.append(
+                {"index": idx, "error": "Missing hawkerCenter, stallName, dishName, or waitTime"}
+            )
+            continue
+
+        try:
+            dish_ref = (
+                async_db.collection("hawkerCenters")
+                    .document(hawker_center)
+                    .collection("Stalls")
+                    .document(stall_name)
+                    .collection("dishes")
+                    .document(dish_name)
+            )
+            batch.set(dish_ref, {"waitTime": wait_time}, merge=True)
+        except Exception as e:
+            errors.append({"index": idx, "error": str(e)})
+
+    if errors:
+        return json_response({"message": "Partial success", "errors": errors}, 207)
+
+    try:
+        await batch.commit()
+        for update in payload:
+            wsgi_menu.search_index.update_wait_time(
+                update["hawkerCenter"], update["stallName"], update["dishName"], update["waitTime"]
+            )
+            wsgi_menu.mark_menu_changed(update["hawkerCenter"])
+        return json_response({"message": "Wait times updated successfully"}, 200)
+    except Exception as e:
+        return json_response({"error": str(e)}, 500)
@@ -0,0 +1,249 @@
+import heapq
+import re
+import threading
+from collections import defaultdict
+
+# Field weights used for ranking: a hit on the dish name counts for more than
+# a hit on the stall's category, which counts for more than the stall name.
+DISH_NAME_WEIGHT = 3.0
+CATEGORY_WEIGHT = 2.0
+STALL_NAME_WEIGHT = 1.0
+# A query term that matches a whole token scores higher than a bare prefix
+EXACT_MATCH_BONUS = 1.0
+# Prefixes longer than this are not indexed (tokens still match exactly)
+MAX_PREFIX_LENGTH = 20
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text) -> list:
+    """Lower-cases text and splits it into alphanumeric tokens."""
+    if not text:
+        return []
+    return _TOKEN_RE.findall(str(text).lower())
+
+
+def normalize_category(category) -> str:
+    return " ".join(tokenize(category))
+
+
+class DishSearchIndex:
+    """
+    In-memory inverted index over dish names, stall names and categories.
+
+    Every dish is keyed by (hawkerId, stallId, dishId). For each token of the
+    indexed fields the index stores the token itself and all of its prefixes,
+    so a lookup for "chick" is a single dict access instead of a scan.
+
+    The index is updated incrementally through upsert_dish / remove_dish /
+    upsert_stall / remove_stall, which the menu watcher drives from Firestore
+    change events, or per hawker centre through replace_hawker, which web
+    workers drive from the published snapshots. All methods are thread-safe.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        # (hawkerId, stallId, dishId) -> dish record returned in search hits
+        self._dishes = {}
+        # (hawkerId, stallId) -> stall fields relevant to the index
+        self._stalls = {}
+        # (hawkerId, stallId) -> set of dish keys, used to re-index on stall changes
+        self._dishes_by_stall = defaultdict(set)
+        # prefix -> {dish key: weight}
+        self._prefixes = defaultdict(dict)
+        # full token -> {dish key: weight}
+        self._terms = defaultdict(dict)
+        # dish key -> set of indexed tokens, used to unindex a dish
+        self._tokens_by_dish = {}
+
+    ##############################################
+    # Updates
+    ##############################################
+    def upsert_stall(self, hawker_id: str, stall_id: str, stall_data: dict):
+        with self._lock:
+            self._stalls[(hawker_id, stall_id)] = {
+                "stallName": stall_data.get("name") or stall_data.get("stallName") or stall_id,
+                "category": stall_data.get("category"),
+            }
+            # Stall name and category are part of every dish entry of the stall
+            for key in list(self._dishes_by_stall.get((hawker_id, stall_id), ())):
+                self._index_dish(key, self._dishes[key]["_source"])
+
+    def remove_stall(self, hawker_id: str, stall_id: str):
+        with self._lock:
+            for key in list(self._dishes_by_stall.get((hawker_id, stall_id), ())):
+                self._unindex_dish(key)
+                self._dishes.pop(key, None)
+            self._dishes_by_stall.pop((hawker_id, stall_id), None)
+            self._stalls.pop((hawker_id, stall_id), None)
+
+    def upsert_dish(self, hawker_id: str, stall_id: str, dish_id: str, dish_data: dict):
+        with self._lock:
+            key = (hawker_id, stall_id, dish_id)
+            self._dishes_by_stall[(hawker_id, stall_id)].add(key)
+            self._index_dish(key, dict(dish_data))
+
+    def update_wait_time(self, hawker_id: str, stall_id: str, dish_id: str, wait_time):
+        """Cheap path for waitTime changes, which do not affect any indexed token."""
+        with self._lock:
+            record = self._dishes.get((hawker_id, stall_id, dish_id))
+            if record is None:
+                return
+            record["waitTime"] = wait_time
+            record["_source"]["waitTime"] = wait_time
+
+    def remove_dish(self, hawker_id: str, stall_id: str, dish_id: str):
+        with self._lock:
+            key = (hawker_id, stall_id, dish_id)
+            self._unindex_dish(key)
+            self._dishes.pop(key, None)
+            stall_dishes = self._dishes_by_stall.get((hawker_id, stall_id))
+            if stall_dishes is not None:
+                stall_dishes.discard(key)
+
+    def replace_hawker(self, hawker_id: str, stalls: list):
+        """
+        Makes the index hold exactly these stalls of one hawker centre, each
+        with its "dishes" (the shape of a published menu snapshot). Stalls
+        and dishes missing from the list are removed.
+        """
+        with self._lock:
+            stall_ids = set()
+            for stall in stalls:
+                stall_id = stall["stallId"]
+                stall_ids.add(stall_id)
+                self.upsert_stall(hawker_id, stall_id, stall)
+                dish_ids = set()
+                for dish in stall.get("dishes") or []:
+                    dish_ids.add(dish["dishId"])
+                    dish_data = {field: value for field, value in dish.items() if field != "dishId"}
+                    self.upsert_dish(hawker_id, stall_id, dish["dishId"], dish_data)
+                for key in list(self._dishes_by_stall.get((hawker_id, stall_id), ())):
+                    if key[2] not in dish_ids:
+                        self.remove_dish(*key)
+            for known_hawker, stall_id in set(self._stalls) | set(self._dishes_by_stall):
+                if known_hawker == hawker_id and stall_id not in stall_ids:
+                    self.remove_stall(hawker_id, stall_id)
+
+    def _index_dish(self, key, dish_data: dict):
+        hawker_id, stall_id, dish_id = key
+        stall = self._stalls.get((hawker_id, stall_id), {})
+        stall_name = stall.get("stallName") or stall_id
+        dish_name = dish_data.get("name") or dish_data.get("dishName") or dish_id
+        category = dish_data.get("category") or stall.get("category")
+
+        self._unindex_dish(key)
+
+        weights = {}
+        for field_text, weight in (
+            (dish_name, DISH_NAME_WEIGHT),
+            (category, CATEGORY_WEIGHT),
+            (stall_name, STALL_NAME_WEIGHT),
+        ):
+            for token in tokenize(field_text):
+                weights[token] = max(weights.get(token, 0.0), weight)
+
+        for token, weight in weights.items():
+            self._terms[token][key] = weight
+            for end in range(1, min(len(token), MAX_PREFIX_LENGTH) + 1):
+                postings = self._prefixes[token[:end]]
+                postings[key] = max(postings.get(key, 0.0), weight)
+        self._tokens_by_dish[key] = set(weights)
+
+        self._dishes[key] = {
+            "hawkerId": hawker_id,
+            "stallId": stall_id,
+            "stallName": stall_name,
+            "dishId": dish_id,
+            "dishName": dish_name,
+            "category": category,
+            "price": dish_data.get("price"),
+            "waitTime": dish_data.get("waitTime"),
+            "_category": normalize_category(category),
+            "_source": dish_data,
+        }
+
+    def _unindex_dish(self, key):
+        for token in self._tokens_by_dish.pop(key, ()):
+            self._discard_posting(self._terms, token, key)
+            for end in range(1, min(len(token), MAX_PREFIX_LENGTH) + 1):
+                self._discard_posting(self._prefixes, token[:end], key)
+
+    @staticmethod
+    def _discard_posting(postings, token, key):
+        entries = postings.get(token)
+        if entries is None:
+            return
+        entries.pop(key, None)
+        if not entries:
+            del postings[token]
+
+    ##############################################
+    # Queries
+    ##############################################
+    def search(self, query: str = "", hawker_id: str = None, category: str = None, limit: int = 20) -> list:
+        """
+        Returns dish hits ranked by score (highest first), then by waitTime.
+        Every query term must match (as a whole token or a prefix of one) in
+        the dish name, stall name or category. When only a category is given,
+        every dish in that category is returned.
+        """
+        terms = tokenize(query)
+        wanted_category = normalize_category(category) if category else None
+
+        with self._lock:
+            if terms:
+                scores = None
+                for term in terms:
+                    term_scores = self._score_term(term)
+                    if scores is None:
+                        scores = term_scores
+                    else:
+                        scores = {key: score + term_scores[key] for key, score in scores.items() if key in term_scores}
+                    if not scores:
+                        return []
+            elif wanted_category:
+                scores = dict.fromkeys(self._dishes, 0.0)
+            else:
+                return []
+
+            ranked = []
+            for key, score in scores.items():
+                record = self._dishes[key]
+                if hawker_id and record["hawkerId"] != hawker_id:
+                    continue
+                if wanted_category and record["_category"] != wanted_category:
+                    continue
+                ranked.append((-score, _wait_time_sort_key(record["waitTime"]), record["dishName"], key))
+
+            # Only the returned hits are sorted and materialised
+            top = heapq.nsmallest(limit, ranked) if limit else sorted(ranked)
+            hits = []
+            for neg_score, _, _, key in top:
+                hit = {field: value for field, value in self._dishes[key].items() if not field.startswith("_")}
+                hit["score"] = -neg_score
+                hits.append(hit)
+        return hits
+
+    def _score_term(self, term: str) -> dict:
+        if len(term) > MAX_PREFIX_LENGTH:
+            # Only whole tokens are indexed beyond the prefix cap
+            return dict(self._terms.get(term, {}))
+        scores = dict(self._prefixes.get(term, {}))
+        for key in self._terms.get(term, ()):
+            scores[key] = scores.get(key, 0.0) + EXACT_MATCH_BONUS
+        return scores
+
+    def get_dish(self, hawker_id: str, stall_id: str, dish_id: str):
+        with self._lock:
+            record = self._dishes.get((hawker_id, stall_id, dish_id))
+            if record is None:
+                return None
+            return dict(record["_source"])
+
+    def __len__(self):
+        return len(self._dishes)
+
+
+def _wait_time_sort_key(wait_time):
+    return wait_time if isinstance(wait_time, (int, float)) else float("inf")
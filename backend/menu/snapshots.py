@@ -0,0 +1,224 @@
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from urllib.parse import quote
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; snapshots are then published as identity + gzip only
+    brotli = None
+
+MANIFEST_NAME = "manifest.json"
+# Number of published versions kept per hawker centre (older ones are pruned)
+KEEP_VERSIONS = 3
+
+
+def _atomic_write(path: str, data: bytes):
+    """Writes to a temp file in the same directory and renames it into place,
+    so a static file server never sees a half-written snapshot."""
+    directory = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.chmod(tmp_path, 0o644)  # mkstemp creates 0600; the file server must be able to read it
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def encode_variants(body: bytes) -> dict:
+    """Returns {file suffix: encoded bytes} for every supported encoding."""
+    variants = {".json": body, ".json.gz": gzip.compress(body, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants[".json.br"] = brotli.compress(body, quality=11)
+    return variants
+
+
+class MenuSnapshotPublisher:
+    """
+    Publishes pre-serialised, pre-compressed menu snapshots per hawker centre.
+
+    Layout of output_dir:
+        manifest.json                       - hawkerId -> current version and (URL-encoded) file paths
+        <hawkerId>/<version>.json[.gz|.br]  - immutable, content-addressed versions
+        <hawkerId>/latest.json[.gz|.br]     - copy of the current version
+
+    Changes are debounced: mark_dirty() only records the hawker centre and the
+    background thread rebuilds it once the burst of change events settles.
+    build_snapshot(hawker_id) returns the snapshot dict, or None if the hawker
+    centre no longer exists.
+    """
+
+    def __init__(self, output_dir: str, build_snapshot, debounce_seconds: float = 0.5):
+        self.output_dir = output_dir
+        self.build_snapshot = build_snapshot
+        self.debounce_seconds = debounce_seconds
+        self._dirty = set()
+        self._cond = threading.Condition()
+        self._manifest_lock = threading.Lock()
+        os.makedirs(output_dir, exist_ok=True)
+        self._manifest = self._load_manifest()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def mark_dirty(self, hawker_id: str):
+        with self._cond:
+            self._dirty.add(hawker_id)
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._dirty:
+                    self._cond.wait()
+            # Let the rest of the burst arrive before rebuilding
+            time.sleep(self.debounce_seconds)
+            with self._cond:
+                dirty, self._dirty = self._dirty, set()
+            for hawker_id in dirty:
+                try:
+                    self.publish(hawker_id, self.build_snapshot(hawker_id))
+                except Exception as e:
+                    print(f"Failed to publish menu snapshot for '{hawker_id}': {e}")
+
+    ##############################################
+    # Publishing
+    ##############################################
+    def publish(self, hawker_id: str, snapshot):
+        if snapshot is None:
+            self.unpublish(hawker_id)
+            return None
+
+        body = json.dumps(snapshot, separators=(",", ":"), sort_keys=True, default=str).encode("utf-8")
+        version = hashlib.sha256(body).hexdigest()[:16]
+
+        with self._manifest_lock:
+            # Firestore IDs cannot contain "/", so the raw ID is a safe directory
+            # name and matches the decoded URI a static file server looks up
+            hawker_dir = os.path.join(self.output_dir, hawker_id)
+            current = self._manifest["hawkerCenters"].get(hawker_id)
+            if current and current["version"] == version and os.path.exists(os.path.join(hawker_dir, "latest.json")):
+                return version  # Nothing changed since the last publish
+            os.makedirs(hawker_dir, exist_ok=True)
+            files = {}
+            for suffix, data in encode_variants(body).items():
+                _atomic_write(os.path.join(hawker_dir, version + suffix), data)
+                _atomic_write(os.path.join(hawker_dir, "latest" + suffix), data)
+                files[suffix] = {"path": f"{quote(hawker_id, safe='')}/{version}{suffix}", "bytes": len(data)}
+
+            self._manifest["hawkerCenters"][hawker_id] = {
+                "version": version,
+                "sha256": hashlib.sha256(body).hexdigest(),
+                "publishedAt": datetime.now(timezone.utc).isoformat(),
+                "files": files,
+            }
+            self._write_manifest()
+            self._prune(hawker_dir, version)
+
+        print(f"Published menu snapshot {hawker_id}@{version}")
+        return version
+
+    def unpublish(self, hawker_id: str):
+        with self._manifest_lock:
+            if self._manifest["hawkerCenters"].pop(hawker_id, None) is None:
+                return
+            self._write_manifest()
+            shutil.rmtree(os.path.join(self.output_dir, hawker_id), ignore_errors=True)
+        print(f"Removed menu snapshot for {hawker_id}")
+
+    def _prune(self, hawker_dir: str, current_version: str):
+        versions = {}
+        for name in os.listdir(hawker_dir):
+            version = name.split(".", 1)[0]
+            if version in ("latest", current_version) or name.startswith(".tmp-"):
+                continue
+            versions.setdefault(version, []).append(name)
+        # Keep the newest versions so clients holding an older manifest still resolve
+        by_age = sorted(versions, key=lambda v: os.path.getmtime(os.path.join(hawker_dir, versions[v][0])), reverse=True)
+        for version in by_age[KEEP_VERSIONS - 1:]:
+            for name in versions[version]:
+                os.remove(os.path.join(hawker_dir, name))
+
+    ##############################################
+    # Manifest
+    ##############################################
+    def _load_manifest(self) -> dict:
+        try:
+            with open(os.path.join(self.output_dir, MANIFEST_NAME), "rb") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"hawkerCenters": {}}
+
+    def _write_manifest(self):
+        self._manifest["generatedAt"] = datetime.now(timezone.utc).isoformat()
+        body = json.dumps(self._manifest, separators=(",", ":"), sort_keys=True).encode("utf-8")
+        _atomic_write(os.path.join(self.output_dir, MANIFEST_NAME), body)
+
+
+class MenuSnapshotFollower:
+    """
+    Follows the snapshots a MenuSnapshotPublisher in another process writes
+    to output_dir, so only that process has to watch Firestore.
+
+    refresh() re-reads manifest.json when it changed (checked at most once per
+    check_seconds) and calls on_snapshot(hawker_id, snapshot) for every hawker
+    centre with a new version, and on_snapshot(hawker_id, None) for every one
+    that was removed. Concurrent callers do not wait for a refresh in progress.
+    """
+
+    def __init__(self, output_dir: str, on_snapshot, check_seconds: float = 2.0):
+        self.output_dir = output_dir
+        self.on_snapshot = on_snapshot
+        self.check_seconds = check_seconds
+        self._versions = {}
+        self._manifest_mtime = None
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            now = time.monotonic()
+            if self._checked_at is not None and now - self._checked_at < self.check_seconds:
+                return
+            self._checked_at = now
+            manifest_path = os.path.join(self.output_dir, MANIFEST_NAME)
+            try:
+                mtime = os.stat(manifest_path).st_mtime_ns
+                if mtime == self._manifest_mtime:
+                    return
+                with open(manifest_path, "rb") as f:
+                    published = json.load(f)["hawkerCenters"]
+            except (OSError, ValueError, KeyError):
+                return  # Nothing published yet (or mid-replace): keep what we have
+            complete = True
+            for hawker_id, entry in published.items():
+                if self._versions.get(hawker_id) == entry["version"]:
+                    continue
+                try:
+                    with open(os.path.join(self.output_dir, hawker_id, entry["version"] + ".json"), "rb") as f:
+                        snapshot = json.load(f)
+                except (OSError, ValueError) as e:
+                    # Already pruned by a newer version: the next manifest lists that one
+                    print(f"Failed to load menu snapshot {hawker_id}@{entry['version']}: {e}")
+                    complete = False
+                    continue
+                self.on_snapshot(hawker_id, snapshot)
+                self._versions[hawker_id] = entry["version"]
+            for hawker_id in set(self._versions) - set(published):
+                self.on_snapshot(hawker_id, None)
+                del self._versions[hawker_id]
+            # An incomplete pass re-reads the manifest on the next check
+            self._manifest_mtime = mtime if complete else None
+        finally:
+            self._lock.release()
@@ -0,0 +1,102 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search_index import DishSearchIndex  # noqa: E402
+
+
+def names(hits):
+    return [hit["dishName"] for hit in hits]
+
+
+def make_index():
+    """The state after a watch's first snapshot delivered every document."""
+    index = DishSearchIndex()
+    index.upsert_stall("maxwell", "s1", {"name": "Tian Tian", "category": "Chicken Rice"})
+    index.upsert_stall("maxwell", "s2", {"name": "Zhen Zhen", "category": "Porridge"})
+    index.upsert_dish("maxwell", "s1", "d1", {"name": "Steamed Chicken", "price": 5.0, "waitTime": 10})
+    index.upsert_dish("maxwell", "s1", "d2", {"name": "Roasted Chicken", "price": 5.5, "waitTime": 5})
+    index.upsert_dish("maxwell", "s2", "d3", {"name": "Fish Porridge", "price": 4.0})
+    return index
+
+
+def test_prefix_search_ranks_by_score_then_wait_time():
+    index = make_index()
+    assert names(index.search("chick")) == ["Roasted Chicken", "Steamed Chicken"]
+    assert names(index.search("porridge")) == ["Fish Porridge"]
+
+
+def test_every_term_must_match():
+    index = make_index()
+    assert names(index.search("steamed chicken")) == ["Steamed Chicken"]
+    assert index.search("steamed fish") == []
+
+
+def test_modified_dish_is_reindexed():
+    index = make_index()
+    index.upsert_dish("maxwell", "s1", "d1", {"name": "Poached Chicken", "price": 5.0})
+    assert index.search("steamed") == []
+    assert names(index.search("poached")) == ["Poached Chicken"]
+    assert len(index) == 3
+
+
+def test_removed_dish_leaves_the_index():
+    index = make_index()
+    index.remove_dish("maxwell", "s2", "d3")
+    assert index.search("fish") == []
+    assert index.get_dish("maxwell", "s2", "d3") is None
+    # No empty postings are left behind
+    assert "fish" not in index._terms and "f" not in index._prefixes
+
+
+def test_stall_change_reindexes_its_dishes():
+    index = make_index()
+    index.upsert_stall("maxwell", "s1", {"name": "Ah Tai", "category": "Chicken Rice"})
+    assert names(index.search("ah tai", limit=0)) == ["Roasted Chicken", "Steamed Chicken"]
+    assert index.search("tian") == []
+
+
+def test_removed_stall_takes_its_dishes():
+    index = make_index()
+    index.remove_stall("maxwell", "s1")
+    assert index.search("chicken") == []
+    assert len(index) == 1
+
+
+def test_dish_before_its_stall_is_fixed_up_by_the_stall():
+    # The dishes watch can deliver before the stalls watch
+    index = DishSearchIndex()
+    index.upsert_dish("maxwell", "s1", "d1", {"name": "Steamed Chicken"})
+    index.upsert_stall("maxwell", "s1", {"name": "Tian Tian", "category": "Chicken Rice"})
+    assert names(index.search("tian")) == ["Steamed Chicken"]
+    assert names(index.search(category="chicken rice")) == ["Steamed Chicken"]
+
+
+def test_wait_time_update_changes_order_without_reindexing():
+    index = make_index()
+    index.update_wait_time("maxwell", "s1", "d1", 1)
+    assert names(index.search("chicken")) == ["Steamed Chicken", "Roasted Chicken"]
+    assert index.get_dish("maxwell", "s1", "d1")["waitTime"] == 1
+
+
+def test_filters():
+    index = make_index()
+    index.upsert_stall("lau_pa_sat", "s9", {"name": "Satay Stall", "category": "Satay"})
+    index.upsert_dish("lau_pa_sat", "s9", "d9", {"name": "Chicken Satay"})
+    assert names(index.search("chicken", hawker_id="lau_pa_sat")) == ["Chicken Satay"]
+    assert names(index.search(category="Satay")) == ["Chicken Satay"]
+    assert len(index.search("chicken", limit=1)) == 1
+
+
+def test_replace_hawker_matches_the_published_snapshot():
+    index = make_index()
+    index.replace_hawker("maxwell", [
+        {"stallId": "s1", "name": "Tian Tian", "category": "Chicken Rice",
+         "dishes": [{"dishId": "d1", "name": "Steamed Chicken", "price": 6.0}]},
+    ])
+    assert names(index.search("chicken")) == ["Steamed Chicken"]
+    assert index.get_dish("maxwell", "s1", "d1") == {"name": "Steamed Chicken", "price": 6.0}
+    assert index.search("porridge") == []
+    index.replace_hawker("maxwell", [])
+    assert len(index) == 0
@@ -0,0 +1,52 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from snapshots import MenuSnapshotFollower, MenuSnapshotPublisher  # noqa: E402
+
+
+def snapshot(price):
+    return {"hawkerCenter": {"hawkerId": "maxwell"}, "stalls": [{"stallId": "s1", "dishes": [{"dishId": "d1", "price": price}]}]}
+
+
+def follow(output_dir):
+    seen = []
+    follower = MenuSnapshotFollower(output_dir, lambda hawker_id, snap: seen.append((hawker_id, snap)), check_seconds=0)
+    return follower, seen
+
+
+def test_follower_sees_each_published_version_once(tmp_path):
+    publisher = MenuSnapshotPublisher(str(tmp_path), lambda hawker_id: None)
+    follower, seen = follow(str(tmp_path))
+    follower.refresh()
+    assert seen == []
+
+    publisher.publish("maxwell", snapshot(5.0))
+    follower.refresh()
+    follower.refresh()
+    assert seen == [("maxwell", snapshot(5.0))]
+
+    publisher.publish("maxwell", snapshot(6.0))
+    publisher.unpublish("maxwell")
+    follower.refresh()
+    assert seen[1:] == [("maxwell", None)]
+
+
+def test_follower_catches_up_from_an_existing_manifest(tmp_path):
+    publisher = MenuSnapshotPublisher(str(tmp_path), lambda hawker_id: None)
+    publisher.publish("maxwell", snapshot(5.0))
+    publisher.publish("maxwell", snapshot(6.0))
+    follower, seen = follow(str(tmp_path))
+    follower.refresh()
+    assert seen == [("maxwell", snapshot(6.0))]
+
+
+def test_follower_checks_at_most_once_per_interval(tmp_path):
+    publisher = MenuSnapshotPublisher(str(tmp_path), lambda hawker_id: None)
+    follower, seen = follow(str(tmp_path))
+    follower.check_seconds = 60
+    follower.refresh()
+    publisher.publish("maxwell", snapshot(5.0))
+    follower.refresh()
+    assert seen == []
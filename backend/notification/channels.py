@@ -0,0 +1,218 @@
+"""
+Delivery channels for customer notifications and the dispatcher that picks
+between them.
+
+- "app": in-app delivery over Socket.IO to every socket the customer has
+  open. Counts as delivered once a socket acknowledges the event, which
+  takes milliseconds instead of an SMS round trip.
+- "sms": Twilio SMS, the fallback for customers who are offline, did not
+  acknowledge in time, or asked for SMS as well.
+
+Each customer's preferences choose the route:
+
+    {"app": true, "sms": "fallback" | "always" | "never"}
+
+ChannelMetrics keeps per-channel attempts, delivery rate and latency
+percentiles for GET /notifications/metrics.
+"""
+
+import threading
+import time
+from collections import deque
+
+SMS_FALLBACK = "fallback"
+SMS_ALWAYS = "always"
+SMS_NEVER = "never"
+
+
+class DispatchError(Exception):
+    """A channel failed after others had delivered; delivered lists those."""
+
+    def __init__(self, cause, delivered):
+        super().__init__(str(cause))
+        self.cause = cause
+        self.delivered = delivered
+
+
+class ChannelMetrics:
+    def __init__(self, window_size=2048):
+        self.window_size = window_size
+        self._lock = threading.Lock()
+        self._latencies = {}
+        self._counts = {}
+
+    def record(self, channel, outcome, seconds=None):
+        """outcome is "delivered", "failed" or "skipped" (e.g. the customer was offline)."""
+        with self._lock:
+            counts = self._counts.setdefault(channel, {"delivered": 0, "failed": 0, "skipped": 0})
+            counts[outcome] += 1
+            if seconds is not None:
+                self._latencies.setdefault(channel, deque(maxlen=self.window_size)).append(seconds)
+
+    def summary(self):
+        with self._lock:
+            counts = {channel: dict(values) for channel, values in self._counts.items()}
+            latencies = {channel: sorted(values) for channel, values in self._latencies.items()}
+        result = {}
+        for channel, values in counts.items():
+            attempts = values["delivered"] + values["failed"]
+            samples = latencies.get(channel, [])
+
+            def percentile(p):
+                if not samples:
+                    return None
+                return round(samples[min(len(samples) - 1, int(p * len(samples)))] * 1000, 1)
+
+            result[channel] = {
+                **values,
+                "attempts": attempts,
+                "deliveryRate": round(values["delivered"] / attempts, 4) if attempts else None,
+                "p50Ms": percentile(0.50),
+                "p95Ms": percentile(0.95),
+                "p99Ms": percentile(0.99),
+            }
+        return result
+
+
+class Presence:
+    """userId -> open Socket.IO session ids, for this notification process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self._users = {}
+
+    def connect(self, user_id, sid):
+        with self._lock:
+            self._sessions.setdefault(user_id, set()).add(sid)
+            self._users[sid] = user_id
+
+    def disconnect(self, sid):
+        with self._lock:
+            user_id = self._users.pop(sid, None)
+            sessions = self._sessions.get(user_id)
+            if sessions is not None:
+                sessions.discard(sid)
+                if not sessions:
+                    del self._sessions[user_id]
+        return user_id
+
+    def user(self, sid):
+        with self._lock:
+            return self._users.get(sid)
+
+    def sessions(self, user_id):
+        with self._lock:
+            return list(self._sessions.get(user_id, ()))
+
+    def online_users(self):
+        with self._lock:
+            return len(self._sessions)
+
+
+class Preferences:
+    """Per-customer channel preferences, set by the app; unknown customers get the default."""
+
+    def __init__(self, default):
+        self.default = default
+        self._lock = threading.Lock()
+        self._preferences = {}
+
+    def get(self, user_id):
+        with self._lock:
+            return dict(self.default, **self._preferences.get(user_id, {}))
+
+    def update(self, user_id, preferences):
+        if "sms" in preferences and preferences["sms"] not in (SMS_FALLBACK, SMS_ALWAYS, SMS_NEVER):
+            raise ValueError(f"sms must be one of {SMS_FALLBACK}, {SMS_ALWAYS}, {SMS_NEVER}")
+        if "app" in preferences and not isinstance(preferences["app"], bool):
+            raise ValueError("app must be true or false")
+        with self._lock:
+            current = self._preferences.setdefault(user_id, {})
+            current.update({key: preferences[key] for key in ("app", "sms") if key in preferences})
+        return self.get(user_id)
+
+
+class SmsChannel:
+    name = "sms"
+
+    def __init__(self, send_sms):
+        self.send_sms = send_sms
+
+    def deliver(self, notification):
+        """Sends the SMS; raises on failure so the message can be retried."""
+        self.send_sms(notification["phoneNumber"], notification["message"])
+        return True
+
+
+class AppChannel:
+    name = "app"
+
+    def __init__(self, socketio, presence, namespace, event="notification", ack_timeout=1.5):
+        self.socketio = socketio
+        self.presence = presence
+        self.namespace = namespace
+        self.event = event
+        self.ack_timeout = ack_timeout
+
+    def deliver(self, notification):
+        """Emits to every open socket of the customer; True once one of them acknowledges."""
+        sessions = self.presence.sessions(notification.get("userId"))
+        if not sessions:
+            return None
+        acknowledged = threading.Event()
+        payload = {key: notification[key] for key in ("orderId", "message", "events") if key in notification}
+        for sid in sessions:
+            self.socketio.emit(
+                self.event, payload, to=sid, namespace=self.namespace,
+                callback=lambda *args: acknowledged.set()
+            )
+        return acknowledged.wait(self.ack_timeout)
+
+
+class Dispatcher:
+    def __init__(self, app_channel, sms_channel, preferences, metrics):
+        self.app_channel = app_channel
+        self.sms_channel = sms_channel
+        self.preferences = preferences
+        self.metrics = metrics
+
+    def _attempt(self, channel, notification):
+        start = time.perf_counter()
+        try:
+            delivered = channel.deliver(notification)
+        except Exception:
+            self.metrics.record(channel.name, "failed", time.perf_counter() - start)
+            raise
+        if delivered is None:
+            self.metrics.record(channel.name, "skipped")
+        else:
+            self.metrics.record(channel.name, "delivered" if delivered else "failed", time.perf_counter() - start)
+        return bool(delivered)
+
+    def dispatch(self, notification, already_delivered=()):
+        """
+        Delivers in-app when the customer is online, falling back to SMS.
+        Channels in already_delivered (by an earlier attempt of a retried
+        message) are not sent again. Returns the channels that delivered;
+        SMS failures are raised as DispatchError.
+        """
+        preferences = self.preferences.get(notification.get("userId"))
+        delivered = list(already_delivered)
+        if (
+            preferences["app"] and self.app_channel is not None and self.app_channel.name not in delivered
+            and self._attempt(self.app_channel, notification)
+        ):
+            delivered.append(self.app_channel.name)
+        wants_sms = self.sms_channel.name not in delivered and (
+            preferences["sms"] == SMS_ALWAYS or (preferences["sms"] == SMS_FALLBACK and not delivered)
+        )
+        if wants_sms and notification.get("phoneNumber"):
+            try:
+                self._attempt(self.sms_channel, notification)
+            except Exception as e:
+                raise DispatchError(e, delivered) from e
+            delivered.append(self.sms_channel.name)
+        elif wants_sms or not delivered:
+            self.metrics.record(self.sms_channel.name, "skipped")
+        return delivered
@@ -0,0 +1,74 @@
+"""
+Holds notifications for the same key (orderId, phone number) for a short
+window and hands them over together, so one multi-stall order produces one
+SMS instead of one per event.
+
+The first notification for a key opens its window; everything that arrives
+for the key before the window closes joins the batch. flush(key, parts,
+deliveries) is called from the coalescer's own thread when the window
+closes, so it should only hand the batch off (e.g. to a worker pool).
+"""
+
+import threading
+import time
+
+
+class Coalescer:
+    def __init__(self, window_seconds, flush):
+        self.window_seconds = window_seconds
+        self.flush = flush
+        self._condition = threading.Condition()
+        # key -> {"deadline", "parts", "deliveries"}
+        self._batches = {}
+        self._thread = None
+        if window_seconds > 0:
+            self._thread = threading.Thread(target=self._run, name="coalescer", daemon=True)
+            self._thread.start()
+
+    def add(self, key, part, delivery):
+        if self._thread is None:
+            self.flush(key, [part], [delivery])
+            return
+        with self._condition:
+            batch = self._batches.get(key)
+            if batch is None:
+                batch = self._batches[key] = {
+                    "deadline": time.monotonic() + self.window_seconds, "parts": [], "deliveries": []
+                }
+                self._condition.notify()
+            batch["parts"].append(part)
+            batch["deliveries"].append(delivery)
+
+    def pending(self):
+        with self._condition:
+            return sum(len(batch["parts"]) for batch in self._batches.values())
+
+    def _take_due(self, now):
+        due = [key for key, batch in self._batches.items() if batch["deadline"] <= now]
+        return [(key, self._batches.pop(key)) for key in due]
+
+    def _run(self):
+        while True:
+            with self._condition:
+                now = time.monotonic()
+                due = self._take_due(now)
+                if not due:
+                    next_deadline = min((batch["deadline"] for batch in self._batches.values()), default=None)
+                    self._condition.wait(None if next_deadline is None else next_deadline - now)
+                    continue
+            for key, batch in due:
+                self._flush(key, batch)
+
+    def _flush(self, key, batch):
+        try:
+            self.flush(key, batch["parts"], batch["deliveries"])
+        except Exception as e:
+            print(f"Notification_Log: Failed to flush notifications for {key}: {e}")
+
+    def flush_all(self):
+        """Hands over every open batch now (on shutdown)."""
+        with self._condition:
+            batches = list(self._batches.items())
+            self._batches.clear()
+        for key, batch in batches:
+            self._flush(key, batch)
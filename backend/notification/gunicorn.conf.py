@@ -0,0 +1,30 @@
+"""
+gunicorn settings for the notification service with the in-app channel on
+(python notification.py starts it this way when NOTIFICATION_PORT and
+CUSTOMER_TOKEN_SECRET are set):
+
+    gunicorn -c gunicorn.conf.py notification:app
+
+A single gthread worker serves Socket.IO and the HTTP routes and runs the
+RabbitMQ consumer on a thread, because in-app delivery needs the sockets,
+presence and acknowledgements of the same process. Every open socket holds
+one of the worker's threads.
+"""
+import os
+
+bind = f"0.0.0.0:{os.environ.get('NOTIFICATION_PORT', 5005)}"
+workers = 1
+worker_class = "gthread"
+threads = int(os.environ.get("NOTIFICATION_WEB_THREADS", 100))
+graceful_timeout = int(os.environ.get("GRACEFUL_TIMEOUT", 30))
+accesslog = "-"
+
+
+def post_worker_init(worker):
+    import notification
+    notification.start_consumer()
+
+
+def worker_exit(server, worker):
+    import notification
+    notification.stop_consumer()
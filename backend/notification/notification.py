@@ -4,6 +4,22 @@ import json
 import pika
 from dotenv import load_dotenv
 import os
+import time
+import threading
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from flask import Flask, request, jsonify
+from flask_socketio import SocketIO, join_room, leave_room
+from coalescing import Coalescer
+from channels import (
+    ChannelMetrics, Presence, Preferences, Dispatcher, DispatchError, AppChannel, SmsChannel, SMS_FALLBACK
+)
+
+# Shared helpers in backend/ (copied next to this file in the Docker image)
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import user_tokens
 
 
 load_dotenv()
@@ -11,6 +27,8 @@ load_dotenv()
 # twilio set up
 import os
 from twilio.rest import Client
+from twilio.http.http_client import TwilioHttpClient
+from twilio.base.exceptions import TwilioRestException
 
 #from .env
 account_sid = os.environ.get("TWILIO_ACCOUNT_SID")
@@ -24,9 +42,48 @@ if not all([account_sid, auth_token, twilio_phone_number]):
 # message_body = "hello world"
 # contact = "+6597730551"
 
-client = Client(account_sid, auth_token)
+# Sends run on a pool of NOTIFICATION_WORKERS threads, at most TWILIO_SEND_RATE
+# messages/second (0 = unlimited) with bursts of TWILIO_SEND_BURST
+NOTIFICATION_WORKERS = int(os.environ.get("NOTIFICATION_WORKERS", 16))
+# Unacked messages RabbitMQ hands us; messages waiting in a coalescing window
+# count too, so this is well above the number of workers
+NOTIFICATION_PREFETCH = int(os.environ.get("NOTIFICATION_PREFETCH", 200))
+# Notifications for the same order and phone number within this many seconds
+# go out as one SMS (0 sends every notification on its own)
+NOTIFICATION_COALESCE_SECONDS = float(os.environ.get("NOTIFICATION_COALESCE_SECONDS", 5))
+TWILIO_SEND_RATE = float(os.environ.get("TWILIO_SEND_RATE", 10))
+TWILIO_SEND_BURST = int(os.environ.get("TWILIO_SEND_BURST", 10))
+TWILIO_TIMEOUT = float(os.environ.get("TWILIO_TIMEOUT", 10))
+
+# One pooled HTTP session for every worker: keep-alive connections to Twilio are
+# reused instead of a new TLS handshake per SMS
+twilio_http_client = TwilioHttpClient(pool_connections=True, timeout=TWILIO_TIMEOUT)
+twilio_http_client.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=NOTIFICATION_WORKERS))
+client = Client(account_sid, auth_token, http_client=twilio_http_client)
 #end of twilio set up 
 
+class SendRateLimiter:
+    """Blocks callers so that at most rate sends/second go out (after an initial burst)."""
+
+    def __init__(self, rate, burst=1):
+        self.interval = 1 / rate if rate > 0 else 0
+        self.burst = max(1, burst)
+        self._lock = threading.Lock()
+        self._next_free = 0.0
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._next_free = max(self._next_free, now)
+            wait = self._next_free - now - (self.burst - 1) * self.interval
+            self._next_free += self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+send_limiter = SendRateLimiter(TWILIO_SEND_RATE, TWILIO_SEND_BURST)
+
 """ 
 DS from order management #scenario 1: notify payment and order success
 
@@ -46,26 +103,157 @@ DS from queuemanagement #scenario 2: notify order completed
     "paymentNumber":"+65xxxxxxxx"
 }
 """
+###############################################################################
+# In-app channel: customers' Socket.IO connections, preferences and metrics
+###############################################################################
+# Socket.IO server for in-app notifications, e.g. 5005 (0 disables it; everything goes by SMS)
+NOTIFICATION_PORT = int(os.environ.get("NOTIFICATION_PORT", 0))
+# How long an in-app notification may go unacknowledged before SMS is used
+NOTIFICATION_APP_ACK_TIMEOUT = float(os.environ.get("NOTIFICATION_APP_ACK_TIMEOUT", 1.5))
+# Route for customers who have not set preferences ("fallback", "always" or "never")
+NOTIFICATION_DEFAULT_SMS = os.environ.get("NOTIFICATION_DEFAULT_SMS", SMS_FALLBACK)
+CUSTOMER_NAMESPACE = '/customer_updates'
+# Customers connect with the customerToken from POST /order, signed with this
+# secret (shared with Order Management, see user_tokens.py)
+CUSTOMER_TOKEN_SECRET = os.environ.get("CUSTOMER_TOKEN_SECRET")
+if NOTIFICATION_PORT and not CUSTOMER_TOKEN_SECRET:
+    print("Notification_Log: CUSTOMER_TOKEN_SECRET is not set; in-app notifications are disabled")
+    NOTIFICATION_PORT = 0
+
+app = Flask(__name__)
+socketio = SocketIO(app, cors_allowed_origins="*", async_mode="threading")
+presence = Presence()
+preferences = Preferences({"app": True, "sms": NOTIFICATION_DEFAULT_SMS})
+channel_metrics = ChannelMetrics()
+
+def authenticated_user():
+    """The userId of the request's "Authorization: Bearer <token>", or None."""
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer":
+        return None
+    try:
+        return user_tokens.verify(token, CUSTOMER_TOKEN_SECRET)
+    except user_tokens.InvalidToken:
+        return None
+
+@socketio.on('connect', namespace=CUSTOMER_NAMESPACE)
+def handle_connect(auth=None):
+    # io('/customer_updates', { auth: { token } }); the customer is online once connected
+    try:
+        user_id = user_tokens.verify((auth or {}).get('token'), CUSTOMER_TOKEN_SECRET)
+    except user_tokens.InvalidToken as e:
+        print(f"Notification_Log: Refusing socket: {e}")
+        raise ConnectionRefusedError("unauthorized")
+    join_room(user_id)
+    presence.connect(user_id, request.sid)
+    print(f"Notification_Log: {user_id} is online")
+
+@socketio.on('join_room', namespace=CUSTOMER_NAMESPACE)
+def handle_join(data):
+    # socket.emit('join_room', { preferences: { sms: 'fallback' } }); the user comes from the token
+    user_id = presence.user(request.sid)
+    if user_id is None:
+        return
+    if data.get('userId') not in (None, user_id):
+        print(f"Notification_Log: Ignoring join_room for {data.get('userId')} from {user_id}")
+        return
+    if data.get('preferences'):
+        try:
+            preferences.update(user_id, data['preferences'])
+        except ValueError as e:
+            print(f"Notification_Log: Ignoring preferences of {user_id}: {e}")
+
+@socketio.on('leave_room', namespace=CUSTOMER_NAMESPACE)
+def handle_leave(data=None):
+    user_id = presence.disconnect(request.sid)
+    if user_id:
+        leave_room(user_id)
+
+@socketio.on('disconnect', namespace=CUSTOMER_NAMESPACE)
+def handle_disconnect(*args):
+    presence.disconnect(request.sid)
+
+@app.route('/notifications/preferences/<string:userId>', methods=['GET', 'PUT'])
+def notification_preferences(userId):
+    user_id = authenticated_user()
+    if user_id is None:
+        return jsonify({"error": "A valid bearer token is required"}), 401
+    if user_id != userId:
+        return jsonify({"error": "Token does not belong to this user"}), 403
+    if request.method == 'PUT':
+        try:
+            return jsonify(preferences.update(userId, request.get_json() or {})), 200
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+    return jsonify(preferences.get(userId)), 200
+
+@app.route('/notifications/metrics', methods=['GET'])
+def notification_metrics():
+    """Per-channel delivered/failed/skipped counts, delivery rate and latency (ms)."""
+    return jsonify({
+        "channels": channel_metrics.summary(),
+        "onlineUsers": presence.online_users(),
+        "pendingInWindow": coalescer.pending()
+    }), 200
+
+def run_socket_server():
+    """
+    Hands the process over to gunicorn (see gunicorn.conf.py), which serves
+    Socket.IO and the routes and runs the consumer in its worker.
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    os.execvp("gunicorn", ["gunicorn", "--chdir", here, "-c", os.path.join(here, "gunicorn.conf.py"), "notification:app"])
+
 RABBITMQ_HOST = os.environ.get("RABBITMQ_HOST")
-connection = pika.BlockingConnection(pika.ConnectionParameters(RABBITMQ_HOST))
-channel = connection.channel()
+connection = None
+channel = None
+send_executor = ThreadPoolExecutor(max_workers=NOTIFICATION_WORKERS, thread_name_prefix="sms")
 
 #queue name 
 order_completed_queue_name = "Q_notif"
 payment_completed_queue_name = "O_notif"
 
+# Failed sends are republished to <queue>.retry.<delay>s on this exchange and
+# come back to <queue> when the delay expires; after the last delay (or on a
+# permanent error) they are parked in <queue>.dlq. Declared by amqp_setup.py.
+RETRY_EXCHANGE_NAME = "notification_retry_exchange"
+NOTIFICATION_RETRY_DELAYS = [int(delay) for delay in os.environ.get("NOTIFICATION_RETRY_DELAYS", "5,30,120,600").split(",")]
+
+def setup_rabbitmq_connection():
+    global connection, channel
+    max_retries = 10
+    retry_delay = 3
+
+    for attempt in range(1, max_retries + 1):
+        try:
+            print(f"Notification_Log: Attempt {attempt}: Connecting to RabbitMQ at {RABBITMQ_HOST}...")
+            connection = pika.BlockingConnection(pika.ConnectionParameters(host=RABBITMQ_HOST, heartbeat=600))
+            channel = connection.channel()
+            channel.basic_qos(prefetch_count=NOTIFICATION_PREFETCH)
+            print("Notification_Log: Connected to RabbitMQ")
+            return
+        except pika.exceptions.AMQPConnectionError as e:
+            print(f"Notification_Log: Connection failed: {e}")
+            if attempt < max_retries:
+                time.sleep(retry_delay)
+    raise RuntimeError("Failed to connect to RabbitMQ after multiple attempts.")
+
 # set up the consumer for both payment completed and order completed
 def receiveNotification():
     try:
+        setup_rabbitmq_connection()
 
-        # set up a consumer and start to wait for coming messages
-        channel.basic_consume(queue=order_completed_queue_name, on_message_callback=callbackOrderCompletedNotification, auto_ack=True)
-        channel.basic_consume(queue=payment_completed_queue_name, on_message_callback=callbackPaymentCompletedNotification, auto_ack=True)
+        # set up a consumer and start to wait for coming messages; messages are
+        # acked by the worker pool once they are handled
+        channel.basic_consume(queue=order_completed_queue_name, on_message_callback=callbackOrderCompletedNotification)
+        channel.basic_consume(queue=payment_completed_queue_name, on_message_callback=callbackPaymentCompletedNotification)
+        print("Notification_Log: Consuming from queue:",  f'{order_completed_queue_name}')
+        print("Notification_Log: Consuming from queue:",  f'{payment_completed_queue_name}')
+        print(f"Notification_Log: {NOTIFICATION_WORKERS} senders, prefetch {NOTIFICATION_PREFETCH}, "
+              f"Twilio rate {TWILIO_SEND_RATE or 'unlimited'}/s, coalescing window {NOTIFICATION_COALESCE_SECONDS}s")
 
         channel.start_consuming() # an implicit loop waiting to receive messages; 
         #it doesn't exit by default. Use Ctrl+C in the command window to terminate it.
-        print("Notification_Log: Consuming from queue:",  f'{order_completed_queue_name}')
-        print("Notification_Log: Consuming from queue:",  f'{payment_completed_queue_name}')
     
     except pika.exceptions.AMQPError as e:
         print(
@@ -74,81 +262,228 @@ def receiveNotification():
 
     except KeyboardInterrupt:
         print("Notification_Log: Program interrupted by user.")
+        channel.stop_consuming()
+    finally:
+        # Send what is waiting in coalescing windows, finish the sends in flight
+        # and deliver their acks before closing
+        coalescer.flush_all()
+        send_executor.shutdown(wait=True)
+        if connection is not None and connection.is_open:
+            connection.process_data_events(time_limit=0)
+            connection.close()
 
-#Callback fucntion to keep listening  for notifications from queue management
-def callbackOrderCompletedNotification(channel, method, properties, body): # required signature for the callback; no return
-    print("\nReceived an order completed Notification by " + __file__)
-    processOrderCompletedNotification(body)
-    print() # print a new line feed
-    
+def is_transient(error):
+    """Twilio errors worth retrying: rate limiting, server errors and network failures."""
+    if isinstance(error, TwilioRestException):
+        return error.status == 429 or error.status >= 500
+    return True
+
+class Delivery:
+    """A message being handled: where it came from and what to republish if it fails."""
+
+    def __init__(self, delivery_channel, method, properties, queue_name, body):
+        self.channel = delivery_channel
+        self.delivery_tag = method.delivery_tag
+        self.headers = dict(properties.headers or {}) if properties is not None else {}
+        self.queue_name = queue_name
+        self.body = body
+
+    @property
+    def attempts(self):
+        return int(self.headers.get("x-retry-count", 0))
 
-# to edit 
-def processOrderCompletedNotification(body):
+    @property
+    def delivered_channels(self):
+        """Channels an earlier attempt of this message already delivered on."""
+        return [name for name in str(self.headers.get("x-delivered-channels", "")).split(",") if name]
+
+def republish(delivery, routing_key, error, attempts, delivered=()):
+    headers = dict(delivery.headers, **{
+        "x-retry-count": attempts,
+        "x-original-queue": delivery.queue_name,
+        "x-last-error": str(error)[:500],
+    })
+    delivered = sorted(set(delivery.delivered_channels) | set(delivered))
+    if delivered:
+        # So the retry only sends on the channels that failed
+        headers["x-delivered-channels"] = ",".join(delivered)
+    delivery.channel.basic_publish(
+        exchange=RETRY_EXCHANGE_NAME,
+        routing_key=routing_key,
+        body=delivery.body,
+        properties=pika.BasicProperties(delivery_mode=2, content_type="application/json", headers=headers)
+    )
+
+def park(delivery, error):
+    """Republishes a message for a later retry, or to the DLQ, then acks it. Runs on the consumer thread."""
     try:
-        data = json.loads(body)
-
-        if "orderStatus" in data :
-            payment_status = data["orderStatus"]
-            contact = data.get("phoneNumber")  # Use `.get()` to avoid KeyErrors
-            stallName = data.get("stallName")
-            if "completed" in payment_status:
-                message_body = f"Your orders from '{stallName}'have been completed."
-                send_sms(contact, message_body)
-                return
+        if error is not None:
+            if error.transient and delivery.attempts < len(NOTIFICATION_RETRY_DELAYS):
+                delay = NOTIFICATION_RETRY_DELAYS[delivery.attempts]
+                republish(delivery, f"{delivery.queue_name}.retry.{delay}s", error.cause, delivery.attempts + 1, error.delivered)
+                print(f"Notification_Log: Retrying in {delay}s (attempt {delivery.attempts + 1}): {error.cause}")
             else:
-                print(f"Unexpected order status: {payment_status}")
+                republish(delivery, f"{delivery.queue_name}.dlq", error.cause, delivery.attempts, error.delivered)
+                print(f"Notification_Log: Dead-lettered to {delivery.queue_name}.dlq: {error.cause}")
+        delivery.channel.basic_ack(delivery_tag=delivery.delivery_tag)
+    except Exception as e:
+        # Could not republish: leave the message with RabbitMQ
+        print(f"Notification_Log: Failed to route failed message, requeueing: {e}")
+        delivery.channel.basic_nack(delivery_tag=delivery.delivery_tag, requeue=True)
 
-    except json.JSONDecodeError:
-        print("Error: Failed to parse JSON.")
+class SendError:
+    def __init__(self, cause, transient, delivered=()):
+        self.cause = cause
+        self.transient = transient
+        # Channels that did deliver before the failure
+        self.delivered = delivered
+
+def settle(deliveries, error=None):
+    """Acks the deliveries (routing them to retry or the DLQ on error) from the consumer thread, which owns the channel."""
+    for delivery in deliveries:
+        connection.add_callback_threadsafe(functools.partial(park, delivery, error))
+
+def send_batch(key, parts, deliveries):
+    """Runs on the worker pool: delivers one notification for a batch, then acks them all."""
+    order_id, contact = key
+    notification = {
+        "orderId": order_id,
+        "userId": next((part["userId"] for part in parts if part.get("userId")), None),
+        "phoneNumber": contact,
+        "message": compose_message(parts),
+        "events": [{field: value for field, value in part.items() if field in ("kind", "stallName")} for part in parts]
+    }
+    already_delivered = set.intersection(*(set(delivery.delivered_channels) for delivery in deliveries))
+    try:
+        delivered = dispatcher.dispatch(notification, already_delivered)
+        print(f"Notification_Log: Order {order_id}: {len(parts)} notification(s) delivered by {delivered or 'no channel'}")
+        settle(deliveries)
+    except DispatchError as e:
+        print(f"Notification_Log: Send to {contact} failed after {e.delivered or 'no channel'} delivered: {e.cause}")
+        settle(deliveries, SendError(e.cause, is_transient(e.cause), e.delivered))
     except Exception as e:
-        print(f"Unexpected error: {e}")
-        
+        print(f"Notification_Log: Send to {contact} failed: {e}")
+        settle(deliveries, SendError(e, is_transient(e)))
 
-#Callback fucntion to keep listening  for notifications from queue management
-def callbackPaymentCompletedNotification(channel, method, properties, body): # required signature for the callback; no return
-    print("\nReceived a payment completed and order success Notification by " + __file__)
-    processPaymentCompletedNotification(body)
-    print() # print a new line feed
+coalescer = Coalescer(
+    NOTIFICATION_COALESCE_SECONDS,
+    lambda key, parts, deliveries: send_executor.submit(send_batch, key, parts, deliveries)
+)
 
-def processPaymentCompletedNotification(body):
+def dispatch(delivery_channel, method, properties, queue_name, to_part, body):
+    """Turns a message into an SMS part and queues it for its (orderId, phone) batch."""
+    delivery = Delivery(delivery_channel, method, properties, queue_name, body)
     try:
-        data = json.loads(body)
-        print(data)
-        if "paymentStatus" in data:
-            
-            payment_status = data["paymentStatus"]
-            contact = data.get("phoneNumber")  # Use `.get()` to avoid KeyErrors
-
-            if "success" in payment_status:
-                message_body = "Your payment has been received."
-                send_sms(contact, message_body)
-                print("sending sms")
-                return
+        part = to_part(json.loads(body))
+    except (json.JSONDecodeError, TypeError) as e:
+        print("Error: Failed to parse JSON.")
+        park(delivery, SendError(e, transient=False))
+        return
+    if part is None:
+        # Nothing to send for this message
+        delivery_channel.basic_ack(delivery_tag=method.delivery_tag)
+        return
+    key = (part["orderId"], part["phoneNumber"])
+    if delivery.delivered_channels:
+        # A retry that already went out on some channel: batching it with
+        # fresh parts would send those parts on that channel again
+        send_executor.submit(send_batch, key, [part], [delivery])
+        return
+    coalescer.add(key, part, delivery)
+
+def compose_message(parts):
+    """One message for everything that happened to an order within the window."""
+    sentences = []
+    if any(part["kind"] == "payment" for part in parts):
+        sentences.append("Your payment has been received.")
+    stalls = list(dict.fromkeys(part["stallName"] for part in parts if part["kind"] == "stall"))
+    if len(stalls) == 1:
+        sentences.append(f"Your orders from '{stalls[0]}' have been completed.")
+    elif stalls:
+        names = ", ".join(f"'{stall}'" for stall in stalls[:-1]) + f" and '{stalls[-1]}'"
+        sentences.append(f"Your orders from {names} have been completed.")
+    return " ".join(sentences)
+
+#Callback fucntion to keep listening  for notifications from queue management
+def callbackOrderCompletedNotification(channel, method, properties, body): # required signature for the callback; no return
+    print("\nReceived an order completed Notification by " + __file__)
+    dispatch(channel, method, properties, order_completed_queue_name, orderCompletedPart, body)
+    
+
+def orderCompletedPart(data):
+    if "orderStatus" in data :
+        order_status = data["orderStatus"]
+        if "completed" in order_status:
+            return {
+                "kind": "stall",
+                "orderId": data.get("orderId"),
+                "userId": data.get("userId"),
+                "phoneNumber": data.get("phoneNumber"),  # Use `.get()` to avoid KeyErrors
+                "stallName": data.get("stallName")
+            }
+        print(f"Unexpected order status: {order_status}")
+    return None
         
-            else:
-                print(f"Unexpected payment status: {payment_status}")
 
-    except json.JSONDecodeError:
-        print("Error: Failed to parse JSON.")
-    except Exception as e:
-        print(f"Unexpected error: {e}")
+#Callback fucntion to keep listening  for notifications from order management
+def callbackPaymentCompletedNotification(channel, method, properties, body): # required signature for the callback; no return
+    print("\nReceived a payment completed and order success Notification by " + __file__)
+    dispatch(channel, method, properties, payment_completed_queue_name, paymentCompletedPart, body)
+
+def paymentCompletedPart(data):
+    print(data)
+    if "paymentStatus" in data:
+        payment_status = data["paymentStatus"]
+        if "success" in payment_status:
+            return {
+                "kind": "payment",
+                "orderId": data.get("orderId"),
+                "userId": data.get("userId"),
+                "phoneNumber": data.get("phoneNumber")  # Use `.get()` to avoid KeyErrors
+            }
+        print(f"Unexpected payment status: {payment_status}")
+    return None
   
 
 #twilio send sms function for messages from both queues
 def send_sms(contact, message_body):
-    # use twilio to send message
-    try:
-        message = client.messages.create(
-            body=message_body, from_=twilio_phone_number, to=contact
-        )
-        print(f"Message sent to {contact}, SID: {message.sid}")
-    except Exception as e:
-        print(f"Failed to send message to {contact}: {e}")
+    # use twilio to send message; failures are raised so the message is not acked
+    send_limiter.acquire()
+    message = client.messages.create(
+        body=message_body, from_=twilio_phone_number, to=contact
+    )
+    print(f"Message sent to {contact}, SID: {message.sid}")
+
+dispatcher = Dispatcher(
+    AppChannel(socketio, presence, CUSTOMER_NAMESPACE, ack_timeout=NOTIFICATION_APP_ACK_TIMEOUT) if NOTIFICATION_PORT else None,
+    SmsChannel(send_sms),
+    preferences,
+    channel_metrics
+)
+
+
+consumer_thread = None
+
+def start_consumer():
+    """Consumes on a thread of the gunicorn worker, next to the sockets it delivers to."""
+    global consumer_thread
+    consumer_thread = threading.Thread(target=receiveNotification, name="consumer", daemon=True)
+    consumer_thread.start()
+
+def stop_consumer():
+    """Stops consuming and waits for the in-flight messages to be handled and acked."""
+    if connection is None or not connection.is_open:
+        return  # Not consuming (yet): nothing to drain
+    connection.add_callback_threadsafe(channel.stop_consuming)
+    if consumer_thread is not None:
+        consumer_thread.join(timeout=25)
 
 
 if (
     __name__ == "__main__"
 ):  # execute this program only if it is run as a script (not by 'import')
+    if NOTIFICATION_PORT:
+        run_socket_server()
     print("Notification_Log: Getting Connection")
     print("Notification_Log: Connection established successfully")
     receiveNotification()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Moves notifications parked in a dead-letter queue back to their queue, e.g.
+after a Twilio outage:
+
+    python replay_dlq.py                     # Q_notif.dlq and O_notif.dlq
+    python replay_dlq.py --queue O_notif --limit 100
+    python replay_dlq.py --dry-run           # only print what would be replayed
+
+Replayed messages start over with a retry count of 0. Each message is acked
+on the DLQ only after it has been republished.
+"""
+import argparse
+import os
+
+import pika
+
+RABBITMQ_HOST = os.environ.get("RABBITMQ_HOST", "localhost")
+RETRY_EXCHANGE_NAME = "notification_retry_exchange"
+NOTIFICATION_QUEUES = ["Q_notif", "O_notif"]
+
+
+def replay(channel, queue_name, limit, dry_run):
+    dlq_name = f"{queue_name}.dlq"
+    replayed = 0
+    while limit is None or replayed < limit:
+        method, properties, body = channel.basic_get(queue=dlq_name)
+        if method is None:
+            break
+        headers = dict(properties.headers or {})
+        print(f"{dlq_name}: {body[:200]!r} (last error: {headers.get('x-last-error')})")
+        if dry_run:
+            # Left unacked: RabbitMQ returns it to the DLQ when the connection closes
+            replayed += 1
+            continue
+        headers["x-retry-count"] = 0
+        headers["x-replayed"] = headers.get("x-replayed", 0) + 1
+        channel.basic_publish(
+            exchange=RETRY_EXCHANGE_NAME,
+            routing_key=queue_name,
+            body=body,
+            properties=pika.BasicProperties(delivery_mode=2, content_type=properties.content_type, headers=headers)
+        )
+        channel.basic_ack(delivery_tag=method.delivery_tag)
+        replayed += 1
+    return replayed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay notifications from their dead-letter queues")
+    parser.add_argument("--queue", action="append", choices=NOTIFICATION_QUEUES, help="Queue to replay into (repeatable, default: all)")
+    parser.add_argument("--limit", type=int, help="Replay at most this many messages per queue")
+    parser.add_argument("--dry-run", action="store_true", help="Print the messages and leave them on the DLQ")
+    args = parser.parse_args()
+
+    connection = pika.BlockingConnection(pika.ConnectionParameters(host=RABBITMQ_HOST))
+    channel = connection.channel()
+    # Confirms make basic_publish wait until RabbitMQ has the message, before the DLQ ack
+    channel.confirm_delivery()
+    try:
+        for queue_name in args.queue or NOTIFICATION_QUEUES:
+            replayed = replay(channel, queue_name, args.limit, args.dry_run)
+            print(f"{queue_name}: {'found' if args.dry_run else 'replayed'} {replayed} message(s)")
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from channels import (  # noqa: E402
+    SMS_ALWAYS, SMS_FALLBACK, ChannelMetrics, Dispatcher, DispatchError, Preferences, SmsChannel
+)
+
+
+class FakeAppChannel:
+    name = "app"
+
+    def __init__(self, online=True):
+        self.online = online
+        self.sent = []
+
+    def deliver(self, notification):
+        if not self.online:
+            return None
+        self.sent.append(notification)
+        return True
+
+
+class FakeSms:
+    def __init__(self):
+        self.sent = []
+        self.error = None
+
+    def __call__(self, phone_number, message):
+        if self.error is not None:
+            raise self.error
+        self.sent.append((phone_number, message))
+
+
+def make_dispatcher(sms_preference, online=True):
+    app, sms = FakeAppChannel(online), FakeSms()
+    preferences = Preferences({"app": True, "sms": sms_preference})
+    return Dispatcher(app, SmsChannel(sms), preferences, ChannelMetrics()), app, sms
+
+
+NOTIFICATION = {"orderId": "a", "userId": "u", "phoneNumber": "+6590000000", "message": "Ready"}
+
+
+def test_fallback_skips_sms_when_delivered_in_app():
+    dispatcher, app, sms = make_dispatcher(SMS_FALLBACK)
+    assert dispatcher.dispatch(NOTIFICATION) == ["app"]
+    assert sms.sent == []
+
+
+def test_fallback_sends_sms_when_offline():
+    dispatcher, app, sms = make_dispatcher(SMS_FALLBACK, online=False)
+    assert dispatcher.dispatch(NOTIFICATION) == ["sms"]
+
+
+def test_failed_sms_reports_what_was_delivered():
+    dispatcher, app, sms = make_dispatcher(SMS_ALWAYS)
+    sms.error = ConnectionError("twilio down")
+    with pytest.raises(DispatchError) as excinfo:
+        dispatcher.dispatch(NOTIFICATION)
+    assert excinfo.value.delivered == ["app"]
+    assert isinstance(excinfo.value.cause, ConnectionError)
+
+
+def test_retry_only_sends_the_failed_channel():
+    dispatcher, app, sms = make_dispatcher(SMS_ALWAYS)
+    assert dispatcher.dispatch(NOTIFICATION, already_delivered={"app"}) == ["app", "sms"]
+    assert app.sent == []
+    assert len(sms.sent) == 1
@@ -0,0 +1,73 @@
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from coalescing import Coalescer  # noqa: E402
+
+
+class Flushes:
+    def __init__(self):
+        self.batches = []
+        self.flushed = threading.Event()
+
+    def __call__(self, key, parts, deliveries):
+        self.batches.append((key, parts, deliveries))
+        self.flushed.set()
+
+
+def test_parts_within_the_window_are_merged():
+    flushes = Flushes()
+    coalescer = Coalescer(0.05, flushes)
+    coalescer.add("a", 1, "d1")
+    coalescer.add("a", 2, "d2")
+    coalescer.add("b", 3, "d3")
+    assert coalescer.pending() == 3
+    time.sleep(0.15)
+    assert sorted(flushes.batches) == [("a", [1, 2], ["d1", "d2"]), ("b", [3], ["d3"])]
+    assert coalescer.pending() == 0
+
+
+def test_part_after_the_window_starts_a_new_batch():
+    flushes = Flushes()
+    coalescer = Coalescer(0.03, flushes)
+    coalescer.add("a", 1, "d1")
+    assert flushes.flushed.wait(1)
+    coalescer.add("a", 2, "d2")
+    time.sleep(0.1)
+    assert flushes.batches == [("a", [1], ["d1"]), ("a", [2], ["d2"])]
+
+
+def test_zero_window_flushes_immediately():
+    flushes = Flushes()
+    coalescer = Coalescer(0, flushes)
+    coalescer.add("a", 1, "d1")
+    assert flushes.batches == [("a", [1], ["d1"])]
+
+
+def test_flush_all_hands_over_open_batches_on_shutdown():
+    flushes = Flushes()
+    coalescer = Coalescer(60, flushes)
+    coalescer.add("a", 1, "d1")
+    coalescer.add("a", 2, "d2")
+    coalescer.flush_all()
+    assert flushes.batches == [("a", [1, 2], ["d1", "d2"])]
+    assert coalescer.pending() == 0
+
+
+def test_flush_errors_do_not_stop_the_coalescer():
+    calls = []
+
+    def flush(key, parts, deliveries):
+        calls.append(key)
+        if key == "a":
+            raise RuntimeError("pool shut down")
+
+    coalescer = Coalescer(0.02, flush)
+    coalescer.add("a", 1, "d1")
+    time.sleep(0.06)
+    coalescer.add("b", 2, "d2")
+    time.sleep(0.06)
+    assert calls == ["a", "b"]
@@ -0,0 +1,46 @@
+import os
+import sys
+
+import pytest
+
+# user_tokens.py is shared, in backend/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import user_tokens  # noqa: E402
+from user_tokens import InvalidToken, issue, verify  # noqa: E402
+
+
+def test_round_trip():
+    assert verify(issue("user_123", "secret"), "secret") == "user_123"
+
+
+def test_user_ids_with_separators_survive():
+    assert verify(issue("a.b/é", "secret"), "secret") == "a.b/é"
+
+
+@pytest.mark.parametrize("token", [None, "", "abc", "a.b.c.d", 42])
+def test_malformed_tokens_are_rejected(token):
+    with pytest.raises(InvalidToken):
+        verify(token, "secret")
+
+
+def test_other_secret_is_rejected():
+    with pytest.raises(InvalidToken):
+        verify(issue("user_123", "secret"), "other")
+
+
+def test_changed_user_is_rejected():
+    _, expires_at, signature = issue("user_123", "secret").split(".")
+    forged = f"{user_tokens._b64encode(b'user_456')}.{expires_at}.{signature}"
+    with pytest.raises(InvalidToken):
+        verify(forged, "secret")
+
+
+def test_expired_token_is_rejected():
+    with pytest.raises(InvalidToken, match="expired"):
+        verify(issue("user_123", "secret", ttl_seconds=-1), "secret")
+
+
+def test_no_secret_rejects_every_token():
+    with pytest.raises(InvalidToken):
+        verify(issue("user_123", "secret"), None)
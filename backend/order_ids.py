@@ -0,0 +1,135 @@
+"""
+K-sortable order IDs, issued by ordermgt.
+
+    order_0C5Q3ZK8X2000
+
+A 64-bit value (milliseconds since 2025-01-01 | node | sequence), written as
+13 Crockford base32 characters after "order_". The encoding is fixed-width
+and its alphabet is in ASCII order, so IDs sort by creation time both as
+strings and as Firestore document IDs, and "all orders issued before T" is
+a key range: order_id_floor(T) is a lower bound for every ID issued at or
+after T.
+
+    bits 63..22  timestamp (ms since EPOCH_MS, ~139 years)
+    bits 21..12  node (0-1023), unique per issuing process
+    bits 11..0   sequence (per process, from a random start)
+
+Nodes are assigned, never guessed: ORDER_ID_NODE if set, else
+ORDER_ID_REPLICA (0-31, one per ordermgt container) in the high five bits
+and the gunicorn worker's index (0-31, WEB_WORKER_INDEX, set by
+service_runner) in the low five. Out-of-range values raise instead of
+wrapping onto another process's node. Running more than one replica
+therefore needs a distinct ORDER_ID_REPLICA on each.
+
+Generation is lock-free: the sequence comes from itertools.count, whose
+next() is atomic under the GIL. IDs from one process collide only if it
+issues more than 4096 IDs within one millisecond.
+
+Orders created before these IDs are named order_<unix ms> (13 decimal
+digits). Those are also valid base32 but decode to a time years ahead, so
+is_order_id() rejects them and legacy_order_time() reads their time.
+"""
+import itertools
+import os
+import secrets
+import time
+
+PREFIX = "order_"
+EPOCH_MS = 1735689600000  # 2025-01-01T00:00:00Z
+NODE_BITS = 10
+WORKER_BITS = 5  # Low bits of the node: the worker's index within its replica
+SEQUENCE_BITS = 12
+ENCODED_LENGTH = 13
+ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"  # Crockford base32, ascending
+# IDs from further in the future than this are not ours (e.g. legacy IDs)
+MAX_CLOCK_SKEW_SECONDS = 86400
+
+def _new_sequence():
+    # A random start, so a restarted process does not replay its predecessor's IDs
+    return itertools.count(secrets.randbelow(1 << SEQUENCE_BITS))
+
+
+_sequence = _new_sequence()
+_node = None
+
+
+def _env_int(name: str, default: int, bits: int) -> int:
+    value = int(os.environ.get(name, default))
+    if not 0 <= value < (1 << bits):
+        raise ValueError(f"{name}={value} is out of range (0-{(1 << bits) - 1})")
+    return value
+
+
+def node_id() -> int:
+    global _node
+    if _node is None:
+        if os.environ.get("ORDER_ID_NODE") is not None:
+            _node = _env_int("ORDER_ID_NODE", 0, NODE_BITS)
+        else:
+            replica = _env_int("ORDER_ID_REPLICA", 0, NODE_BITS - WORKER_BITS)
+            _node = (replica << WORKER_BITS) | _env_int("WEB_WORKER_INDEX", 0, WORKER_BITS)
+    return _node
+
+
+def _reset_after_fork():
+    # Forked workers (gunicorn) are different nodes
+    global _node, _sequence
+    _node = None
+    _sequence = _new_sequence()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def encode(value: int) -> str:
+    chars = []
+    for _ in range(ENCODED_LENGTH):
+        value, digit = divmod(value, 32)
+        chars.append(ALPHABET[digit])
+    return "".join(reversed(chars))
+
+
+def decode(encoded: str) -> int:
+    value = 0
+    for char in encoded:
+        value = value * 32 + ALPHABET.index(char)
+    return value
+
+
+def pack(timestamp_ms: int, node: int, sequence: int) -> int:
+    return ((timestamp_ms - EPOCH_MS) << (NODE_BITS + SEQUENCE_BITS)) | (node << SEQUENCE_BITS) | sequence
+
+
+def new_order_id() -> str:
+    sequence = next(_sequence) & ((1 << SEQUENCE_BITS) - 1)
+    return PREFIX + encode(pack(time.time_ns() // 1_000_000, node_id(), sequence))
+
+
+def is_order_id(order_id: str) -> bool:
+    encoded = order_id[len(PREFIX):]
+    return (
+        order_id.startswith(PREFIX)
+        and len(encoded) == ENCODED_LENGTH
+        and all(char in ALPHABET for char in encoded)
+        and order_id_time(order_id) <= time.time() + MAX_CLOCK_SKEW_SECONDS
+    )
+
+
+def legacy_order_time(order_id: str):
+    """Unix time (seconds) of a legacy order_<unix ms> ID, or None for any other ID."""
+    encoded = order_id[len(PREFIX):]
+    if not order_id.startswith(PREFIX) or not encoded.isdigit() or is_order_id(order_id):
+        return None
+    return int(encoded) / 1000
+
+
+def order_id_floor(timestamp: float) -> str:
+    """The smallest ID that can be issued at unix time timestamp (seconds)."""
+    return PREFIX + encode(pack(int(timestamp * 1000), 0, 0))
+
+
+def order_id_time(order_id: str) -> float:
+    """Unix time (seconds) at which an ID was issued."""
+    value = decode(order_id[len(PREFIX):])
+    return ((value >> (NODE_BITS + SEQUENCE_BITS)) + EPOCH_MS) / 1000
@@ -0,0 +1,124 @@
+"""
+Admission control for POST /order.
+
+- TokenBucket / KeyedRateLimiter: per-userId and per-hawkerCenter request
+  rates, so one client retrying in a loop or one busy hawker centre cannot
+  crowd out everyone else.
+- ConcurrencyLimiter: a global cap on orders being processed at once; work
+  beyond it is shed immediately instead of queueing up behind payment calls.
+- QueueDepthProbe: the current depth of O_queue, used to tell shed clients
+  how long the backlog needs to drain (Retry-After).
+
+Limits are per replica: with N replicas the effective limits are N times
+the configured ones.
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+
+    def take(self, now: float) -> float:
+        """Takes one token. Returns 0 on success, else seconds until one is available."""
+        # now may predate updated_at (a bucket created after the caller read
+        # the clock); never let that take tokens away
+        elapsed = max(0.0, now - self.updated_at)
+        self.tokens = min(self.burst, self.tokens + elapsed * self.rate)
+        self.updated_at = max(self.updated_at, now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class KeyedRateLimiter:
+    """One token bucket per key; the least recently used buckets are dropped past max_keys."""
+
+    def __init__(self, rate: float, burst: float, max_keys: int = 100000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()
+
+    def check(self, key) -> float:
+        """Returns 0 when the request is allowed, else the seconds to wait."""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(self.rate, self.burst)
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+            return bucket.take(now)
+
+
+class ConcurrencyLimiter:
+    def __init__(self, max_in_flight: int):
+        self.max_in_flight = max_in_flight
+        self._lock = threading.Lock()
+        self.in_flight = 0
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if self.in_flight >= self.max_in_flight:
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+
+
+class QueueDepthProbe:
+    """
+    Reads the message count of a queue with a passive declare on its own
+    connection, caching the answer for cache_seconds. Returns None while the
+    broker cannot be reached.
+    """
+
+    def __init__(self, connect, queue_name: str, cache_seconds: float = 2.0):
+        self.connect = connect
+        self.queue_name = queue_name
+        self.cache_seconds = cache_seconds
+        self._lock = threading.Lock()
+        self._connection = None
+        self._channel = None
+        self._depth = None
+        self._read_at = 0.0
+
+    def depth(self):
+        with self._lock:
+            if time.monotonic() - self._read_at < self.cache_seconds:
+                return self._depth
+            try:
+                if self._channel is None or not self._channel.is_open:
+                    if self._connection is None or not self._connection.is_open:
+                        self._connection = self.connect()
+                    self._channel = self._connection.channel()
+                result = self._channel.queue_declare(queue=self.queue_name, passive=True)
+                self._depth = result.method.message_count
+            except Exception as e:
+                print(f"Could not read depth of {self.queue_name}: {e}")
+                self._connection = self._channel = None
+                self._depth = None
+            self._read_at = time.monotonic()
+            return self._depth
+
+
+def retry_after_seconds(queue_depth, drain_rate: float, minimum: float = 1, maximum: float = 120) -> int:
+    """Seconds until a backlog of queue_depth messages drains at drain_rate messages/s."""
+    if not queue_depth or drain_rate <= 0:
+        return int(minimum)
+    return int(min(maximum, max(minimum, math.ceil(queue_depth / drain_rate))))
@@ -0,0 +1,206 @@
+"""
+Order status store behind GET /order/status/<orderId>.
+
+Status documents only hold facts that never conflict, so events can be
+applied in any order and any number of times, on any replica:
+
+    {
+        "orderId": "order_...",
+        "userId": "user_...",
+        "paymentStatus": "pending" | "success" | "failed",
+        "paymentAction": {"type": "requires_action"},
+        "stalls": {
+            "<stallName>": {"ordered": true, "dishes": {"<dishName>": true}, "ready": true}
+        },
+        "updatedAt": 1743768000.0
+    }
+
+The overall status (pending, paid, in_progress, ready, failed) is derived on
+read by derive_status(). paymentAction is only shown while the payment is
+pending: it tells the customer's browser to complete 3D Secure. Statuses are
+public (anyone with the orderId can read them), so the clientSecret that
+3D Secure needs is never stored here.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+# Events understood by apply_event (the "type" field of a .status message)
+ORDER_PENDING = "order.pending"
+PAYMENT_SUCCEEDED = "payment.succeeded"
+PAYMENT_FAILED = "payment.failed"
+PAYMENT_REQUIRES_ACTION = "payment.requires_action"
+DISH_COMPLETED = "dish.completed"
+STALL_READY = "stall.ready"
+
+
+def event_to_fields(event: dict) -> dict:
+    """Translates one status event into the (nested) fields it sets."""
+    event_type = event.get("type")
+    fields = {"orderId": event["orderId"], "updatedAt": event.get("timestamp") or time.time()}
+    if event.get("userId") is not None:
+        fields["userId"] = event["userId"]
+
+    if event_type == ORDER_PENDING:
+        fields["stalls"] = {stall_name: {"ordered": True} for stall_name in event.get("stalls", [])}
+    elif event_type == PAYMENT_SUCCEEDED:
+        fields["paymentStatus"] = "success"
+    elif event_type == PAYMENT_FAILED:
+        fields["paymentStatus"] = "failed"
+    elif event_type == PAYMENT_REQUIRES_ACTION:
+        fields["paymentAction"] = {"type": "requires_action"}
+    elif event_type == DISH_COMPLETED:
+        fields["stalls"] = {event["stallName"]: {"dishes": {event["dishName"]: True}}}
+    elif event_type == STALL_READY:
+        fields["stalls"] = {event["stallName"]: {"ready": True}}
+    else:
+        raise ValueError(f"Unknown order status event: {event_type}")
+    return fields
+
+
+def deep_merge(target: dict, fields: dict) -> dict:
+    for key, value in fields.items():
+        if isinstance(value, dict) and isinstance(target.get(key), dict):
+            deep_merge(target[key], value)
+        elif key == "paymentStatus" and target.get(key) in ("success", "failed") and value == "pending":
+            continue  # A late "pending" never hides the payment outcome
+        elif key == "updatedAt":
+            target[key] = max(target.get(key) or 0, value)
+        else:
+            target[key] = value
+    return target
+
+
+def derive_status(doc: dict) -> str:
+    if doc.get("paymentStatus") == "failed":
+        return "failed"
+    stalls = doc.get("stalls") or {}
+    if stalls and all(stall.get("ready") for stall in stalls.values()):
+        return "ready"
+    if any(stall.get("ready") or any((stall.get("dishes") or {}).values()) for stall in stalls.values()):
+        return "in_progress"
+    if doc.get("paymentStatus") == "success":
+        return "paid"
+    return "pending"
+
+
+def to_response(doc: dict) -> dict:
+    stalls = {}
+    for stall_name, stall in (doc.get("stalls") or {}).items():
+        dishes = stall.get("dishes") or {}
+        stalls[stall_name] = {
+            "status": "ready" if stall.get("ready") else ("in_progress" if any(dishes.values()) else "queued"),
+            "completedDishes": sorted(name for name, done in dishes.items() if done),
+        }
+    response = {
+        "orderId": doc["orderId"],
+        "status": derive_status(doc),
+        "paymentStatus": doc.get("paymentStatus", "pending"),
+        "stalls": stalls,
+        "updatedAt": doc.get("updatedAt"),
+    }
+    if response["paymentStatus"] == "pending" and doc.get("paymentAction"):
+        response["paymentAction"] = doc["paymentAction"]
+    return response
+
+
+class FirestoreStatusBackend:
+    """Durable tier: one document per order in the given collection."""
+
+    def __init__(self, db, collection: str = "orderStatus"):
+        self.collection = db.collection(collection)
+
+    def get(self, order_id: str):
+        doc = self.collection.document(order_id).get()
+        return doc.to_dict() if doc.exists else None
+
+    def merge(self, order_id: str, fields: dict):
+        # set(merge=True) only touches the leaf fields given, so concurrent
+        # events for the same order never overwrite each other
+        self.collection.document(order_id).set(fields, merge=True)
+
+
+class OrderStatusStore:
+    """
+    In-memory hot tier with TTL eviction in front of an optional durable
+    backend. Lookups that hit the hot tier are a single dict access; misses
+    read the backend once and cache the result.
+    """
+
+    def __init__(self, backend=None, ttl_seconds: float = 1800, max_entries: int = 50000):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # orderId -> (expires_at, doc, complete), oldest first. A doc is
+        # incomplete when it was started by an event for an order this
+        # replica had not seen; it is completed from the backend on read.
+        self._hot = OrderedDict()
+        # Called with (userId, status response) after every applied event
+        self._listeners = []
+
+    def add_listener(self, listener):
+        self._listeners.append(listener)
+
+    def _cache(self, order_id: str, doc: dict, complete: bool):
+        self._hot[order_id] = (time.monotonic() + self.ttl_seconds, doc, complete)
+        self._hot.move_to_end(order_id)
+        self._evict()
+
+    def _evict(self):
+        now = time.monotonic()
+        while self._hot:
+            order_id, (expires_at, _, _) = next(iter(self._hot.items()))
+            if expires_at > now and len(self._hot) <= self.max_entries:
+                break
+            del self._hot[order_id]
+
+    def _live_entry(self, order_id: str):
+        entry = self._hot.get(order_id)
+        if entry and entry[0] > time.monotonic():
+            return entry
+        return None
+
+    def apply_event(self, event: dict, persist: bool = True) -> dict:
+        """Applies an event to the hot tier (and the backend when persist is set)."""
+        fields = event_to_fields(event)
+        order_id = fields["orderId"]
+        with self._lock:
+            entry = self._live_entry(order_id)
+            if entry:
+                doc, complete = deep_merge(entry[1], fields), entry[2]
+            else:
+                # An order.pending event starts a new order, so nothing is missing
+                doc = deep_merge({}, fields)
+                complete = self.backend is None or event.get("type") == ORDER_PENDING
+            self._cache(order_id, doc, complete)
+            snapshot = to_response(doc)
+            user_id = doc.get("userId")
+        if persist and self.backend is not None:
+            self.backend.merge(order_id, fields)
+        for listener in self._listeners:
+            try:
+                listener(user_id, snapshot)
+            except Exception as e:
+                print(f"Order status listener failed: {e}")
+        return snapshot
+
+    def get(self, order_id: str):
+        """Returns the status response for an order, or None if unknown."""
+        with self._lock:
+            entry = self._live_entry(order_id)
+            if entry and entry[2]:
+                return to_response(entry[1])
+        if self.backend is None:
+            return to_response(entry[1]) if entry else None
+        doc = self.backend.get(order_id)
+        with self._lock:
+            # Events applied while the backend was being read win over the read
+            entry = self._live_entry(order_id)
+            if entry:
+                doc = deep_merge(doc or {}, entry[1])
+            if doc is None:
+                return None
+            self._cache(order_id, doc, True)
+            return to_response(doc)
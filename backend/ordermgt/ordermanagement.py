@@ -1,13 +1,36 @@
 import os
+import sys
 import time
+import math
 import json
-import requests
+import threading
+from functools import wraps
+from concurrent.futures import ThreadPoolExecutor
 import pika
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
+from google.cloud import firestore
+from google.oauth2 import service_account
+from proxy_cache import StaleWhileRevalidateCache, UpstreamError
+from resilience import CircuitBreaker, Bulkhead, Dependency, DependencyUnavailable
+from status_stream import StatusBroadcaster, event_stream
+from admission import KeyedRateLimiter, ConcurrencyLimiter, QueueDepthProbe, retry_after_seconds
+from pending_orders import MemoryPendingOrders, FirestorePendingOrders
+from order_status import (
+    OrderStatusStore, FirestoreStatusBackend,
+    ORDER_PENDING, PAYMENT_SUCCEEDED, PAYMENT_FAILED, PAYMENT_REQUIRES_ACTION
+)
+# Shared helpers in backend/ (copied next to this file in the Docker image)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import responses
+import http_client
+import order_ids
+import service_runner
+import user_tokens
 
 # Flask App Initialization
 app = Flask(__name__)
+responses.init_app(app)
 CORS(app)
 
 # Environment-Based Configuration
@@ -16,6 +39,59 @@ CORS(app)
 # PAYMENT_SERVICE_URL = os.environ.get("PAYMENT_SERVICE_URL", "http:/localhost/payment:5002")
 MENU_SERVICE_URL = os.environ.get("MENU_SERVICE_URL", "http://localhost:5001")
 PAYMENT_SERVICE_URL = os.environ.get("PAYMENT_SERVICE_URL", "http://localhost:5002")
+# Re-price every cart against the menu service before charging it
+VALIDATE_ORDER_PRICES = os.environ.get("VALIDATE_ORDER_PRICES", "true").lower() == "true"
+# Async order acceptance: POST /order replies 202 and payments run on a worker pool
+ASYNC_ORDERS = os.environ.get("ASYNC_ORDERS", "false").lower() == "true"
+PAYMENT_WORKERS = int(os.environ.get("PAYMENT_WORKERS", 8))
+# "webhook": payment replies 202 once the charge is submitted and the outcome
+# arrives later on O_payment (from Stripe webhooks); "sync" waits for it
+PAYMENT_CONFIRMATION = os.environ.get("PAYMENT_CONFIRMATION", "sync")
+# One POST /payment may take Stripe's timeout on each of its network retries
+# (payment's STRIPE_TIMEOUT=10 x (STRIPE_MAX_NETWORK_RETRIES=2 + 1)) plus
+# PAYMENT_PROCESSING_WAIT; giving up sooner turns a charge into an unknown outcome
+PAYMENT_TIMEOUT = float(os.environ.get("PAYMENT_TIMEOUT", 35))
+# How often to ask again (same idempotency key) while the outcome is unknown
+# or, in sync mode, while payment says "pending"
+PAYMENT_PENDING_RETRIES = int(os.environ.get("PAYMENT_PENDING_RETRIES", 3))
+PAYMENT_PENDING_RETRY_SECONDS = float(os.environ.get("PAYMENT_PENDING_RETRY_SECONDS", 1.0))
+# Webhook mode: orders whose outcome has not arrived after this long are failed
+# (keep it longer than a customer needs for 3D Secure)
+PAYMENT_PENDING_TIMEOUT = int(os.environ.get("PAYMENT_PENDING_TIMEOUT", 1800))
+PAYMENT_SWEEP_INTERVAL = int(os.environ.get("PAYMENT_SWEEP_INTERVAL", 60))
+payment_executor = ThreadPoolExecutor(max_workers=PAYMENT_WORKERS, thread_name_prefix="payment")
+# Accepted async orders that are queued or charging on the pool; beyond this
+# POST /order replies 503 instead of growing the executor's queue
+payment_backlog = ConcurrencyLimiter(int(os.environ.get("PAYMENT_MAX_BACKLOG", PAYMENT_WORKERS * 8)))
+PAYMENT_BACKLOG_RETRY_AFTER = int(os.environ.get("PAYMENT_BACKLOG_RETRY_AFTER", 2))
+# Signs the customerToken returned with each order (see user_tokens.py); the
+# per-user status stream and the notification service's in-app sockets
+# only accept a customer with it
+CUSTOMER_TOKEN_SECRET = os.environ.get("CUSTOMER_TOKEN_SECRET")
+CUSTOMER_TOKEN_TTL = int(os.environ.get("CUSTOMER_TOKEN_TTL", user_tokens.DEFAULT_TTL_SECONDS))
+if not CUSTOMER_TOKEN_SECRET:
+    print("Order_Management_Log: CUSTOMER_TOKEN_SECRET is not set; orders are returned without a customerToken")
+
+# Outbound dependencies: each gets its own bulkhead (bounded concurrent calls)
+# and circuit breaker, so a slow PAYMENT service cannot starve the menu routes
+payment_dependency = Dependency(
+    "payment",
+    CircuitBreaker(
+        "payment",
+        slow_call_seconds=float(os.environ.get("PAYMENT_SLOW_CALL_SECONDS", 2.0)),
+        open_seconds=float(os.environ.get("PAYMENT_CIRCUIT_OPEN_SECONDS", 15))
+    ),
+    Bulkhead("payment", int(os.environ.get("PAYMENT_MAX_CONCURRENT", 16)))
+)
+menu_dependency = Dependency(
+    "menu",
+    CircuitBreaker(
+        "menu",
+        slow_call_seconds=float(os.environ.get("MENU_SLOW_CALL_SECONDS", 1.0)),
+        open_seconds=float(os.environ.get("MENU_CIRCUIT_OPEN_SECONDS", 10))
+    ),
+    Bulkhead("menu", int(os.environ.get("MENU_MAX_CONCURRENT", 16)))
+)
 
 # (Queue and Notification services will be notified via RabbitMQ.)
 # RabbitMQ configuration for asynchronous messaging:
@@ -32,7 +108,7 @@ def setup_rabbitmq_connection():
     for attempt in range(1, max_retries + 1):
         try:
             print(f"Attempt {attempt}: Connecting to RabbitMQ at {RABBITMQ_HOST}...")
-            connection = pika.BlockingConnection(pika.ConnectionParameters(host='localhost', port=5672))
+            connection = pika.BlockingConnection(pika.ConnectionParameters(host=RABBITMQ_HOST, port=5672))
             channel = connection.channel()
             print("Connected to RabbitMQ")
             break
@@ -44,74 +120,645 @@ def setup_rabbitmq_connection():
             else:
                 print("Failed to connect to RabbitMQ after multiple attempts.")
 
+# Admission control for POST /order (per replica)
+# Per user: ORDER_RATE_PER_USER orders/minute with bursts of ORDER_BURST_PER_USER
+user_rate_limiter = KeyedRateLimiter(
+    rate=float(os.environ.get("ORDER_RATE_PER_USER", 6)) / 60,
+    burst=float(os.environ.get("ORDER_BURST_PER_USER", 3))
+)
+# Per hawker centre: ORDER_RATE_PER_HAWKER orders/second
+hawker_rate_limiter = KeyedRateLimiter(
+    rate=float(os.environ.get("ORDER_RATE_PER_HAWKER", 20)),
+    burst=float(os.environ.get("ORDER_BURST_PER_HAWKER", 40))
+)
+order_slots = ConcurrencyLimiter(int(os.environ.get("ORDER_MAX_IN_FLIGHT", 64)))
+# Rate at which queue management works through O_queue (messages/second),
+# used to turn the current backlog into a Retry-After
+ORDER_QUEUE_NAME = 'O_queue'
+QUEUE_DRAIN_RATE = float(os.environ.get("QUEUE_DRAIN_RATE", 20))
+order_queue_probe = QueueDepthProbe(
+    lambda: pika.BlockingConnection(pika.ConnectionParameters(host=RABBITMQ_HOST, heartbeat=0, socket_timeout=1)),
+    ORDER_QUEUE_NAME
+)
+
+# Order status store: in-memory hot tier in front of Firestore (database 'orders')
+ORDER_STATUS_TTL = int(os.environ.get("ORDER_STATUS_TTL", 1800))
+STATUS_QUEUE_NAME = 'O_status'
+STATUS_EXCHANGES = ['order_exchange', 'queue_exchange']
+PAYMENT_QUEUE_NAME = 'O_payment'
+
+service_account_path = os.environ.get("FIREBASE_SERVICE_ACCOUNT_KEY_PATH")
+project_id = os.environ.get("FIREBASE_PROJECT_ID")
+status_backend = None
+if service_account_path and project_id:
+    cred = service_account.Credentials.from_service_account_file(service_account_path)
+    orders_db = firestore.Client(project=project_id, credentials=cred, database='orders')
+    status_backend = FirestoreStatusBackend(orders_db)
+    pending_orders = FirestorePendingOrders(orders_db)
+else:
+    print("Firebase credentials not set; order statuses are kept in memory only.")
+    if PAYMENT_CONFIRMATION == "webhook":
+        # Web workers save pending orders and the separate O_payment consumer
+        # claims them; a per-process store would never see the other side
+        raise ValueError("PAYMENT_CONFIRMATION=webhook needs Firebase credentials for the shared pending order store.")
+    pending_orders = MemoryPendingOrders()
+order_status = OrderStatusStore(status_backend, ttl_seconds=ORDER_STATUS_TTL)
+# Each open stream holds a worker thread: keep some of the --threads for
+# ordinary requests and end streams periodically so none is held forever
+STATUS_STREAM_MAX_SUBSCRIBERS = int(os.environ.get("STATUS_STREAM_MAX_SUBSCRIBERS", 32))
+STATUS_STREAM_MAX_SECONDS = float(os.environ.get("STATUS_STREAM_MAX_SECONDS", 300))
+STATUS_STREAM_RETRY_AFTER = 5
+# Live status streams (SSE) are fed by every event the store applies
+status_broadcaster = StatusBroadcaster(max_subscribers=STATUS_STREAM_MAX_SUBSCRIBERS)
+order_status.add_listener(status_broadcaster.publish)
+
+# Utility function: Asynchronous Publisher via RabbitMQ
+# pika channels are not thread-safe; request threads and payment workers share this one
+publish_lock = threading.Lock()
+
 def publish_message(routing_key: str, message: dict):
     try:
-        channel.basic_publish(
-            exchange=EXCHANGE_NAME,
-            routing_key=routing_key,
-            body=json.dumps(message),
-            properties=pika.BasicProperties(delivery_mode=2)
-        )
+        with publish_lock:
+            channel.basic_publish(
+                exchange=EXCHANGE_NAME,
+                routing_key=routing_key,
+                body=json.dumps(message),
+                properties=pika.BasicProperties(delivery_mode=2)
+            )
         
         print(f"Published {routing_key}: {message}")
+        return True
     except Exception as e:
         print(f"Failed to publish {routing_key}: {e}")
+        return False
 
-# In-memory storage for orders (for demonstration purposes)
-orders = {}
+def record_status_event(event: dict):
+    """
+    Applies a status event locally (so this replica reads its own writes)
+    and publishes it as <orderId>.status; the O_status consumer persists it.
+    If the broker is unreachable the event is persisted directly.
+    """
+    event.setdefault("timestamp", time.time())
+    order_status.apply_event(event, persist=False)
+    if not publish_message(f"{event['orderId']}.status", event) and status_backend is not None:
+        try:
+            order_status.apply_event(event, persist=True)
+        except Exception as e:
+            print(f"Failed to persist status of order {event['orderId']}: {e}")
 
-# Utility function: Asynchronous Publisher via RabbitMQ
-def publish_message(routing_key: str, message: dict):
+###############################################################################
+# Status events consumer (<orderId>.status on order_exchange and queue_exchange)
+###############################################################################
+def on_status_event(persist):
+    def callback(ch, method, properties, body):
+        try:
+            order_status.apply_event(json.loads(body), persist=persist)
+        except (ValueError, KeyError) as e:
+            print(f"Dropping malformed status event: {e}")
+        except Exception as e:
+            print(f"Failed to apply status event: {e}")
+            if persist:
+                ch.basic_nack(delivery_tag=method.delivery_tag, requeue=True)
+                return
+        if persist:
+            ch.basic_ack(delivery_tag=method.delivery_tag)
+    return callback
+
+def run_status_consumer(persist=True, replica=True):
+    """
+    Consumes status events on a dedicated connection:
+    - O_status (shared by all replicas, persist): every event is persisted once
+    - an exclusive queue per process (replica): every hot tier and SSE
+      stream sees every event
+    """
     try:
-        channel.basic_publish(
-            exchange=EXCHANGE_NAME,
-            routing_key=routing_key,
-            body=json.dumps(message),
-            properties=pika.BasicProperties(delivery_mode=2)
-        )
-        
-        print(f"Published {routing_key}: {message}")
+        consumer_connection = pika.BlockingConnection(pika.ConnectionParameters(host=RABBITMQ_HOST, heartbeat=600))
+        consumer_channel = consumer_connection.channel()
+        consumer_channel.basic_qos(prefetch_count=50)
+        if persist:
+            consumer_channel.queue_declare(queue=STATUS_QUEUE_NAME, durable=True)
+            consumer_channel.basic_consume(queue=STATUS_QUEUE_NAME, on_message_callback=on_status_event(True))
+            print(f"Persisting order status events from {STATUS_QUEUE_NAME}")
+        if replica:
+            replica_queue = consumer_channel.queue_declare(queue='', exclusive=True, auto_delete=True).method.queue
+            for exchange in STATUS_EXCHANGES:
+                consumer_channel.queue_bind(exchange=exchange, queue=replica_queue, routing_key="*.status")
+            consumer_channel.basic_consume(queue=replica_queue, on_message_callback=on_status_event(False), auto_ack=True)
+            print(f"Listening for order status events on {replica_queue}")
+        if threading.current_thread() is threading.main_thread():
+            service_runner.stop_consuming_on_shutdown(consumer_connection, consumer_channel)
+        consumer_channel.start_consuming()
     except Exception as e:
-        print(f"Failed to publish {routing_key}: {e}")
+        print(f"Status consumer crashed: {e}")
+
+def start_status_consumer(persist=True):
+    threading.Thread(target=run_status_consumer, kwargs={"persist": persist}, daemon=True).start()
+
+def run_status_persister():
+    """service_runner consumer role: python service_runner.py consumer ordermanagement:run_status_persister"""
+    run_status_consumer(persist=True, replica=False)
+
+def init_web_worker():
+    """
+    service_runner warm-up for every web worker: the publisher connection and
+    this process's replica queue. Persisting is left to the consumer role.
+    """
+    setup_rabbitmq_connection()
+    start_status_consumer(persist=False)
+
+###############################################################################
+# Payment outcomes consumer (<orderId>.payment from Stripe webhooks, via Payment)
+###############################################################################
+def on_payment_event(ch, method, properties, body):
+    try:
+        event = json.loads(body)
+        order_id = event["orderId"]
+        event_type = event["type"]
+    except (ValueError, KeyError) as e:
+        print(f"Dropping malformed payment event: {e}")
+        ch.basic_ack(delivery_tag=method.delivery_tag)
+        return
+
+    if event_type == PAYMENT_REQUIRES_ACTION:
+        # The status only says 3DS is needed; the clientSecret stays with the
+        # pending order, for GET /order/status/<orderId>/payment-action
+        try:
+            if event.get("clientSecret"):
+                pending_orders.set_client_secret(order_id, event["clientSecret"])
+            record_status_event({"type": PAYMENT_REQUIRES_ACTION, "orderId": order_id})
+        except Exception as e:
+            print(f"Failed to record {event_type} for order {order_id}: {e}")
+            ch.basic_nack(delivery_tag=method.delivery_tag, requeue=True)
+            return
+        ch.basic_ack(delivery_tag=method.delivery_tag)
+        return
+    if event_type not in (PAYMENT_SUCCEEDED, PAYMENT_FAILED):
+        print(f"Order {order_id}: {event_type}")
+        ch.basic_ack(delivery_tag=method.delivery_tag)
+        return
+
+    order = None
+    try:
+        order = pending_orders.claim(order_id)
+        if order is None:
+            # Already handled (duplicate webhook, or the request saw the outcome first)
+            print(f"Ignoring {event_type} for order {order_id}: nothing pending")
+        else:
+            payment_status = "success" if event_type == PAYMENT_SUCCEEDED else "failed"
+            if payment_status == "failed":
+                print(f"Payment for order {order_id} failed: {event.get('reason')}")
+            record_payment_outcome(order, payment_status)
+            publish_order_events(order, payment_status)
+    except Exception as e:
+        print(f"Failed to handle {event_type} for order {order_id}: {e}")
+        if order is not None:
+            pending_orders.save(order)
+        ch.basic_nack(delivery_tag=method.delivery_tag, requeue=True)
+        return
+    ch.basic_ack(delivery_tag=method.delivery_tag)
+
+def sweep_pending_orders():
+    """Fails the pending orders whose payment outcome never arrived."""
+    for order in pending_orders.take_expired(PAYMENT_PENDING_TIMEOUT):
+        print(f"No payment outcome for order {order['orderId']} after {PAYMENT_PENDING_TIMEOUT}s; failing it")
+        try:
+            record_payment_outcome(order, "failed")
+            publish_order_events(order, "failed")
+        except Exception as e:
+            print(f"Failed to fail order {order['orderId']}: {e}")
+            pending_orders.save(order)
+
+def run_pending_sweeper():
+    while True:
+        time.sleep(PAYMENT_SWEEP_INTERVAL)
+        try:
+            sweep_pending_orders()
+        except Exception as e:
+            print(f"Pending order sweep failed: {e}")
+
+def run_payment_consumer():
+    """
+    Consumes O_payment on a dedicated connection, and in webhook mode sweeps
+    pending orders that never got an outcome.
+    service_runner consumer role: python service_runner.py consumer ordermanagement:run_payment_consumer
+    """
+    if channel is None or channel.is_closed:
+        setup_rabbitmq_connection()  # publish_order_events needs the publisher
+    if PAYMENT_CONFIRMATION == "webhook":
+        threading.Thread(target=run_pending_sweeper, daemon=True).start()
+    try:
+        consumer_connection = pika.BlockingConnection(pika.ConnectionParameters(host=RABBITMQ_HOST, heartbeat=600))
+        consumer_channel = consumer_connection.channel()
+        consumer_channel.basic_qos(prefetch_count=20)
+        consumer_channel.queue_declare(queue=PAYMENT_QUEUE_NAME, durable=True)
+        consumer_channel.basic_consume(queue=PAYMENT_QUEUE_NAME, on_message_callback=on_payment_event)
+        print(f"Consuming payment outcomes from {PAYMENT_QUEUE_NAME}")
+        if threading.current_thread() is threading.main_thread():
+            service_runner.stop_consuming_on_shutdown(consumer_connection, consumer_channel)
+        consumer_channel.start_consuming()
+    except Exception as e:
+        print(f"Payment consumer crashed: {e}")
+
+def start_payment_consumer():
+    threading.Thread(target=run_payment_consumer, daemon=True).start()
+
+def retry_after_header(e: DependencyUnavailable):
+    return {"Retry-After": str(max(1, int(round(e.retry_after))))}
+
+# GET /health/dependencies - circuit and bulkhead state of outbound calls
+###############################################################################
+@app.route("/health/dependencies", methods=["GET"])
+def get_dependency_health():
+    return jsonify({
+        "payment": payment_dependency.snapshot(),
+        "menu": menu_dependency.snapshot(),
+        "paymentBacklog": {"inFlight": payment_backlog.in_flight, "max": payment_backlog.max_in_flight}
+    }), 200
+
+
+def shed_load(message, retry_after):
+    return jsonify({"error": message, "retryAfter": retry_after}), 429, {"Retry-After": str(retry_after)}
+
+def backlog_retry_after():
+    return retry_after_seconds(order_queue_probe.depth(), QUEUE_DRAIN_RATE)
+
+def admit_order(user_id, hawker_center):
+    """Returns a 429 response when the order must be rejected, else None."""
+    wait = user_rate_limiter.check(user_id)
+    if wait:
+        return shed_load("Too many orders, please wait before ordering again.", max(1, math.ceil(wait)))
+    if hawker_center is not None:
+        wait = hawker_rate_limiter.check(hawker_center)
+        if wait:
+            return shed_load("This hawker centre is very busy, please retry shortly.", max(math.ceil(wait), backlog_retry_after()))
+    return None
+
+def with_order_slot(route):
+    """Sheds requests beyond ORDER_MAX_IN_FLIGHT concurrent orders."""
+    @wraps(route)
+    def wrapper(*args, **kwargs):
+        if not order_slots.try_acquire():
+            return shed_load("Order service is at capacity, please retry shortly.", backlog_retry_after())
+        try:
+            return route(*args, **kwargs)
+        finally:
+            order_slots.release()
+    return wrapper
 
 
 # 1) Composite Endpoints to Retrieve Stall Lists and Menu Items (Proxy Calls)
 ###############################################################################
 
+# Menu responses are served from a stale-while-revalidate cache:
+# route -> (fresh seconds, additional stale seconds)
+MENU_CACHE_TTLS = {
+    "hawkerCenters": (int(os.environ.get("MENU_CACHE_TTL_CENTERS", 300)), 3600),
+    "stalls": (int(os.environ.get("MENU_CACHE_TTL_STALLS", 120)), 1800),
+    "dishes": (int(os.environ.get("MENU_CACHE_TTL_DISHES", 30)), 600),
+}
+
+def fetch_menu(url):
+    r = menu_dependency.call(http_client.get, url, timeout=5)
+    if r.status_code == 200:
+        return r.json()
+    # Not cached: the IDs in menu URLs come from clients
+    raise UpstreamError(r.status_code)
+
+menu_cache = StaleWhileRevalidateCache(fetch_menu)
+
+def proxy_menu(url, route, what):
+    ttl, stale_ttl = MENU_CACHE_TTLS[route]
+    try:
+        body, cache_state = menu_cache.get(url, ttl, stale_ttl)
+    except UpstreamError as e:
+        return jsonify({"error": f"Failed to retrieve {what}. Status code: {e.status_code}"}), e.status_code
+    except DependencyUnavailable as e:
+        return jsonify({"error": f"Failed to retrieve {what}. Menu service unavailable."}), 503, retry_after_header(e)
+    except Exception as e:
+        print(f"Error calling MENU microservice: {e}")
+        return jsonify({"error": f"Failed to retrieve {what}. Menu service unavailable."}), 503
+    return jsonify(body), 200, {"X-Cache": cache_state}
+
 # Proxy GET /hawkerCenters
 @app.route("/hawkerCenters", methods=["GET"])
 def proxy_get_all_hawker_centers():
     url = f"{MENU_SERVICE_URL}/hawkerCenters"
-    r = requests.get(url, timeout=5)
-    if r.status_code == 200:
-        return jsonify(r.json()), 200
-    else:
-        return jsonify({"error": f"Failed to retrieve hawker centers. Status code: {r.status_code}"}), r.status_code
+    return proxy_menu(url, "hawkerCenters", "hawker centers")
 
 # Proxy GET /hawkerCenters/<hawkerId>/stalls
 @app.route("/hawkerCenters/<string:hawkerId>/stalls", methods=["GET"])
 def proxy_get_stalls(hawkerId):
     url = f"{MENU_SERVICE_URL}/hawkerCenters/{hawkerId}/stalls"
-    r = requests.get(url, timeout=5)
-    if r.status_code == 200:
-        return jsonify(r.json()), 200
-    else:
-        return jsonify({"error": f"Failed to retrieve stalls. Status code: {r.status_code}"}), r.status_code
+    return proxy_menu(url, "stalls", "stalls")
 
 # Proxy GET /hawkerCenters/<hawkerId>/stalls/<stallId>/dishes
 @app.route("/hawkerCenters/<string:hawkerId>/stalls/<string:stallId>/dishes", methods=["GET"])
 def proxy_get_dishes(hawkerId, stallId):
     url = f"{MENU_SERVICE_URL}/hawkerCenters/{hawkerId}/stalls/{stallId}/dishes"
-    r = requests.get(url, timeout=5)
-    if r.status_code == 200:
-        return jsonify(r.json()), 200
-    else:
-        return jsonify({"error": f"Failed to retrieve dishes. Status code: {r.status_code}"}), r.status_code
+    return proxy_menu(url, "dishes", "dishes")
+
+
+# Server-side pricing of a cart
+###############################################################################
+def price_order(hawker_center, stalls_dict):
+    """
+    Looks up every dish of a (multi-stall) cart with one call to the MENU
+    service's batch endpoint and overwrites the client-sent price and waitTime
+    in stalls_dict with the menu's values.
+    Returns (amount, None) on success or (None, (error message, status code)).
+    """
+    keys = []
+    for stall_name, data in stalls_dict.items():
+        for dish_info in data.get("dishes", []):
+            keys.append({"hawkerCenter": hawker_center, "stallName": stall_name, "dishName": dish_info.get("name")})
+    if not keys:
+        return None, ("Order has no dishes.", 400)
+
+    try:
+        # Read-only lookup, so it is safe to retry like a GET
+        r = menu_dependency.call(http_client.post, f"{MENU_SERVICE_URL}/menu/dishes/batch", json=keys, timeout=5, retries=2)
+    except DependencyUnavailable as e:
+        print(f"Not calling MENU microservice: {e}")
+        return None, ("Menu service unavailable, cannot price order.", 503)
+    except Exception as e:
+        print(f"Error calling MENU microservice: {e}")
+        return None, ("Menu service unavailable, cannot price order.", 503)
+    if r.status_code != 200:
+        return None, (f"Failed to price order. Status code: {r.status_code}", 400 if r.status_code == 400 else 503)
+
+    amount = 0.0
+    unknown = []
+    results = iter(r.json())
+    for stall_name, data in stalls_dict.items():
+        for dish_info in data.get("dishes", []):
+            result = next(results)
+            if not result.get("found") or result.get("inStock") is False or result.get("price") is None:
+                unknown.append(f"{stall_name}/{dish_info.get('name')}")
+                continue
+            dish_info["price"] = result["price"]
+            if result.get("waitTime") is not None:
+                dish_info["waitTime"] = result["waitTime"]
+            amount += result["price"] * dish_info.get("quantity", 1)
+    if unknown:
+        return None, (f"Dishes not available: {', '.join(unknown)}", 400)
+    return round(amount, 2), None
 
 
 # 2) POST /order - Accept Orders, Forward Payment Payload, and Publish Notifications
 ###############################################################################
+# request_payment's status when the charge may or may not have gone through
+PAYMENT_UNKNOWN = "unknown"
+
+def charge_payment(token, amount, order_id):
+    """
+    Forwards the payment to the PAYMENT microservice and returns the payment
+    status ("success", "failed", or in webhook mode "pending" when the outcome
+    will arrive on O_payment) and payment's "data" (e.g. the clientSecret for
+    3D Secure). The orderId is the idempotency key, so the call can be
+    retried without charging twice.
+
+    When the outcome is unknown (a timeout, a 5xx, the same key still in
+    flight) the charge may have gone through, so it is never reported as
+    failed straight away: the call is repeated with the same key. In sync
+    mode nothing would ever resolve a "pending" order either, so it is
+    repeated while payment answers pending too, and the order fails if it
+    never settles. In webhook mode an outcome that stays unknown is left
+    pending for the webhook (or the pending order sweeper).
+    """
+    payment_payload = {
+        "token":token,
+        "amount":amount,
+        "orderId":order_id,
+        "confirmation":PAYMENT_CONFIRMATION
+    }
+    retry_on = (PAYMENT_UNKNOWN,) if PAYMENT_CONFIRMATION == "webhook" else (PAYMENT_UNKNOWN, "pending")
+    payment_status, payment_data = request_payment(payment_payload, order_id)
+    for attempt in range(1, PAYMENT_PENDING_RETRIES + 1):
+        if payment_status not in retry_on:
+            break
+        time.sleep(PAYMENT_PENDING_RETRY_SECONDS * attempt)
+        payment_status, payment_data = request_payment(payment_payload, order_id)
+    if payment_status == PAYMENT_UNKNOWN and PAYMENT_CONFIRMATION == "webhook":
+        return "pending", payment_data
+    if payment_status in retry_on:
+        print(f"Payment for order {order_id} still {payment_status} after {PAYMENT_PENDING_RETRIES} retries; failing the order")
+        payment_status = "failed"
+    return payment_status, payment_data
+
+def request_payment(payment_payload, order_id):
+    """
+    One POST /payment; returns ("success" | "failed" | "pending" | PAYMENT_UNKNOWN,
+    payment's "data"). Only a declined card (400) or a call that was never
+    sent (open circuit, full bulkhead) is "failed"; a timeout, a 5xx or a
+    409 (the key is in flight) leaves the outcome unknown.
+    """
+    payment_data = {}
+    # Outbound API Call: POST /payment on PAYMENT service.
+    try:
+        payment_service_url = f"{PAYMENT_SERVICE_URL}/payment"
+        payment_resp = payment_dependency.call(
+            http_client.post, payment_service_url, json=payment_payload, timeout=PAYMENT_TIMEOUT, retries=2,
+            headers={"Idempotency-Key": f"order-{order_id}"}
+        )
+    except DependencyUnavailable as e:
+        print(f"Not calling PAYMENT microservice: {e}")
+        return "failed", payment_data
+    except Exception as e:
+        print(f"Error calling PAYMENT microservice, outcome unknown: {e}")
+        return PAYMENT_UNKNOWN, payment_data
+
+    print(f"PAYMENT service responded with status code: {payment_resp.status_code}")
+    try:
+        payment_data = payment_resp.json().get("data", {})
+    except Exception:
+        pass
+    if payment_resp.status_code == 200:
+        payment_status = payment_data.get("status", "success")
+    elif payment_resp.status_code == 202:
+        payment_status = "pending"
+    elif payment_resp.status_code == 400:
+        payment_status = "failed"
+    else:
+        payment_status = PAYMENT_UNKNOWN
+    return payment_status, payment_data
+
+def publish_order_events(order, payment_status):
+    """Publishes the order to Queue Management (.queue) and the Notification service (.notif)."""
+    order_id = order["orderId"]
+    # Build order notification payload for Queue Management.
+    order_details = {
+        "hawkerCenter": order["hawkerCenter"],
+        "orderId": order_id,
+        "phoneNumber": order["phoneNumber"],
+        "userId": order["userId"],
+        "paymentStatus": payment_status,
+        "stalls": order["stalls"]
+    }
+    if "members" in order:
+        # Group order: who is at the table, for the stalls' tickets
+        order_details["members"] = order["members"]
+    # Publish to Queue Management using routing key "<orderId>.queue
+    publish_message(f"{order_id}.queue", order_details)
+
+    # Build notification payload for Notification service.
+    notif_data = {
+        "orderId": order_id,
+        "userId": order["userId"],
+        "phoneNumber": order["phoneNumber"],
+        "paymentStatus": payment_status
+    }
+    # Publish to Notification service using routing key "<orderId>.notif"
+    publish_message(f"{order_id}.notif", notif_data)
+
+def record_payment_outcome(order, payment_status):
+    record_status_event({
+        "type": PAYMENT_SUCCEEDED if payment_status == "success" else PAYMENT_FAILED,
+        "orderId": order["orderId"],
+        "userId": order["userId"]
+    })
+
+def process_order_payment(order):
+    """
+    Charges an accepted order, records the outcome and publishes its events.
+    Returns (payment status, payment's "data"); the status is "pending" when
+    the outcome will arrive on O_payment instead.
+    """
+    if PAYMENT_CONFIRMATION == "webhook":
+        pending_orders.save(order)
+    payment_status, payment_data = charge_payment(order["token"], order["amount"], order["orderId"])
+    if payment_status == "pending":
+        if payment_data.get("clientSecret"):
+            # Async orders have already replied; keep it for the payment-action route
+            pending_orders.set_client_secret(order["orderId"], payment_data["clientSecret"])
+        return payment_status, payment_data
+    if PAYMENT_CONFIRMATION == "webhook" and pending_orders.claim(order["orderId"]) is None:
+        # The O_payment consumer already published this order
+        return payment_status, payment_data
+    record_payment_outcome(order, payment_status)
+    publish_order_events(order, payment_status)
+    return payment_status, payment_data
+
+def run_payment_job(order):
+    try:
+        process_order_payment(order)
+    except Exception as e:
+        print(f"Payment job for order {order['orderId']} failed: {e}")
+        record_payment_outcome(order, "failed")
+    finally:
+        payment_backlog.release()
+
+def wants_async(req):
+    # Clients can opt in per request even when ASYNC_ORDERS is off
+    return ASYNC_ORDERS or "respond-async" in req.headers.get("Prefer", "")
+
+def payment_unavailable_response():
+    """Returns a 503 response while the payment circuit is open, else None."""
+    # Fail fast instead of accepting orders that can only fail
+    try:
+        payment_dependency.check_available()
+    except DependencyUnavailable as e:
+        return jsonify({"error": "Payment service temporarily unavailable, please retry."}), 503, retry_after_header(e)
+    return None
+
+def validate_amount(hawker_center, stalls_dict, amount):
+    """
+    Re-prices the cart when VALIDATE_ORDER_PRICES is set.
+    Returns (amount to charge, None) or (None, error response).
+    """
+    if not VALIDATE_ORDER_PRICES:
+        return amount, None
+    if hawker_center is None:
+        return None, (jsonify({"error": "Missing required field: hawkerCenter."}), 400)
+    priced_amount, error = price_order(hawker_center, stalls_dict)
+    if error:
+        return None, (jsonify({"error": error[0]}), error[1])
+    # Never charge an amount the customer did not see
+    if abs(priced_amount - float(amount)) > 0.005:
+        return None, (jsonify({"error": "Order amount does not match menu prices.", "amount": priced_amount}), 409)
+    return priced_amount, None
+
+def customer_token_fields(user_id):
+    """customerToken for the order's userId (in-app notifications, the user's stream, payment actions)."""
+    if not CUSTOMER_TOKEN_SECRET:
+        return {}
+    return {"customerToken": user_tokens.issue(str(user_id), CUSTOMER_TOKEN_SECRET, CUSTOMER_TOKEN_TTL)}
+
+def authenticated_customer():
+    """
+    The userId of the request's customerToken, or None. Sent as
+    "Authorization: Bearer <token>" or, since EventSource cannot set
+    headers, as ?token=<token>.
+    """
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer":
+        token = request.args.get("token")
+    try:
+        return user_tokens.verify(token, CUSTOMER_TOKEN_SECRET)
+    except user_tokens.InvalidToken:
+        return None
+
+def accept_order(order, response_fields=None):
+    """Records the order as pending, then charges it now (sync) or on the payment pool (async)."""
+    order_id = order["orderId"]
+    response_fields = {**customer_token_fields(order["userId"]), **(response_fields or {})}
+    run_async = wants_async(request)
+    # Take the backlog slot before recording anything, so a rejected order leaves no trace
+    if run_async and not payment_backlog.try_acquire():
+        return jsonify({
+            "error": "Too many orders waiting for payment, please retry.",
+            "retryAfter": PAYMENT_BACKLOG_RETRY_AFTER
+        }), 503, {"Retry-After": str(PAYMENT_BACKLOG_RETRY_AFTER)}
+    record_status_event({
+        "type": ORDER_PENDING,
+        "orderId": order_id,
+        "userId": order["userId"],
+        "stalls": list(order["stalls"])
+    })
+
+    ###########################################################################
+    # Async mode: accept now, charge and publish on the payment worker pool
+    ###########################################################################
+    if run_async:
+        try:
+            payment_executor.submit(run_payment_job, order)
+        except Exception:
+            payment_backlog.release()
+            raise
+        status_url = f"/order/status/{order_id}"
+        return jsonify({
+            "orderId": order_id,
+            "status": "pending",
+            "statusUrl": status_url,
+            **response_fields
+        }), 202, {"Location": status_url}
+
+    ###########################################################################
+    # Sync mode: charge, publish via RabbitMQ, then reply
+    ###########################################################################
+    payment_status, payment_data = process_order_payment(order)
+    if payment_status == "pending":
+        status_url = f"/order/status/{order_id}"
+        pending_fields = {}
+        if payment_data.get("clientSecret"):
+            # For 3D Secure in the browser if Stripe asks for it; only the
+            # creator of the order gets it (the status just shows paymentAction)
+            pending_fields["clientSecret"] = payment_data["clientSecret"]
+        return jsonify({
+            "orderId": order_id,
+            "paymentStatus": payment_status,
+            "statusUrl": status_url,
+            **pending_fields,
+            **response_fields
+        }), 202, {"Location": status_url}
+
+    return jsonify({
+        "orderId": order_id,
+        "paymentStatus": payment_status,
+        **response_fields
+    }), 200
+
 @app.route("/order", methods=["POST"])
+@with_order_slot
 def create_order():
     try:
         order_request = request.get_json()
@@ -124,104 +771,250 @@ def create_order():
         token = order_request.get("token")
         amount = order_request.get("amount")
         hawker_center = order_request.get("hawkerCenter")
-        order_id = order_request.get("orderId")
+        # IDs are issued here (time-ordered, see order_ids.py), never taken from the client
+        order_id = order_ids.new_order_id()
         
         if user_id is None or phone_number is None or stalls_dict is None or token is None or amount is None:
             return jsonify({"error": "Missing required fields: userId, phoneNumber, stalls, token are required."}), 400
-        
-        payment_payload = {
-            "token":token,
-            "amount":amount
-        }
 
-        #######################################################################
-        # Forward Payment Information to PAYMENT Microservice
-        #######################################################################
-        # Outbound API Call: POST /processPayment on PAYMENT service.
-        # We forward the payment payload (which includes fields like createdAt, phoneNumber, id, items, paymentMethod, token, total, etc.)
-        try:
-            payment_service_url = f"{PAYMENT_SERVICE_URL}/payment"
-            payment_resp = requests.post(payment_service_url, json=payment_payload, timeout=5)
-            if payment_resp.status_code == 200:
-                payment_result = payment_resp.json()
-                payment_data = payment_result.get("data", {})
-                payment_status = payment_data.get("status", "success")
-                print(f"PAYMENT service responded with status code: {payment_resp.status_code}")
-            else:
-                try:
-                    payment_result = payment_resp.json()
-                    payment_data = payment_result.get("data", {})
-                    payment_status = payment_data.get("status", "failed")
-                except Exception as e:
-                    payment_status = "failed"
-                print(f"PAYMENT service responded with status code: {payment_resp.status_code}")
-        except Exception as e:
-            print(f"Error calling PAYMENT microservice: {e}")
-            payment_status = "failed"
-
-        #######################################################################
-        # Publish Notifications via RabbitMQ (Asynchronous Messaging)
-        #######################################################################
-        # if payment_status == "success":
-            # Build order notification payload for Queue Management.
-            order_details = {
-                "hawkerCenter": hawker_center,
-                "orderId": order_id,
-                "phoneNumber":phone_number,
-                "userId": user_id,
-                "paymentStatus": payment_status,
-                "stalls": stalls_dict  # In a full implementation, detailed dish info could be included.
-            }
-            # Publish to Queue Management using routing key "<orderId>.queue
-            publish_message(f"{order_id}.queue", order_details)
-            
-            # Build notification payload for Notification service.
-            notif_data = {
-                "orderId": order_id,
-                "userId": user_id,
-                "phoneNumber": phone_number,
-                "paymentStatus": payment_status
-            }
-            # Publish to Notification service using routing key "<orderId>.notif"
-            publish_message(f"{order_id}.notif", notif_data)
-
-        #######################################################################
-        # Return Response to the Customer UI
-        #######################################################################
-        return jsonify({
+        rejection = admit_order(user_id, hawker_center) or payment_unavailable_response()
+        if rejection:
+            return rejection
+
+        amount, error = validate_amount(hawker_center, stalls_dict, amount)
+        if error:
+            return error
+
+        order = {
             "orderId": order_id,
-            "paymentStatus": payment_status
-        }), 200
+            "userId": user_id,
+            "phoneNumber": phone_number,
+            "hawkerCenter": hawker_center,
+            "stalls": stalls_dict,
+            "token": token,
+            "amount": amount
+        }
+        return accept_order(order)
 
     except Exception as e:
         print(f"Error in create_order: {e}")
         return jsonify({"error": str(e)}), 500
 
+# 2b) POST /order/batch - Group (table) order: one payment, one ticket per stall
+###############################################################################
+def merge_carts(carts):
+    """
+    Merges the stalls of several carts into one stalls dict with a single
+    entry per dish (quantities summed), so each stall gets one ticket.
+    """
+    merged = {}
+    for cart in carts:
+        for stall_name, data in cart["stalls"].items():
+            dishes = merged.setdefault(stall_name, {"dishes": []})["dishes"]
+            for dish_info in data.get("dishes", []):
+                existing = next((d for d in dishes if d.get("name") == dish_info.get("name")), None)
+                if existing is None:
+                    dishes.append(dict(dish_info, quantity=dish_info.get("quantity", 1)))
+                else:
+                    existing["quantity"] += dish_info.get("quantity", 1)
+    return merged
+
+def member_subtotals(carts, merged_stalls):
+    """Each member's share, priced with the (server-priced) merged cart."""
+    prices = {
+        (stall_name, dish_info.get("name")): dish_info.get("price") or 0
+        for stall_name, data in merged_stalls.items()
+        for dish_info in data["dishes"]
+    }
+    subtotals = []
+    for cart in carts:
+        subtotal = sum(
+            prices[(stall_name, dish_info.get("name"))] * dish_info.get("quantity", 1)
+            for stall_name, data in cart["stalls"].items()
+            for dish_info in data.get("dishes", [])
+        )
+        subtotals.append({"userId": cart["userId"], "amount": round(subtotal, 2)})
+    return subtotals
+
+@app.route("/order/batch", methods=["POST"])
+@with_order_slot
+def create_batch_order():
+    """
+    POST /order/batch
+    {
+        "userId": "<payer>", "phoneNumber": "<payer>",
+        "token": "tok_...", "amount": 42.5, "hawkerCenter": "...",
+        "orders": [{"userId": "...", "phoneNumber": "...", "stalls": {...}}, ...]
+    }
+    The carts are charged once to the payer and sent to queue management as
+    one order whose stalls are merged across carts.
+    """
+    try:
+        batch_request = request.get_json()
+        if not batch_request:
+            return jsonify({"error": "Invalid JSON payload"}), 400
+
+        user_id = batch_request.get("userId")
+        phone_number = batch_request.get("phoneNumber")
+        token = batch_request.get("token")
+        amount = batch_request.get("amount")
+        hawker_center = batch_request.get("hawkerCenter")
+        order_id = order_ids.new_order_id()
+        orders = batch_request.get("orders")
+
+        if user_id is None or phone_number is None or token is None or amount is None or not orders:
+            return jsonify({"error": "Missing required fields: userId, phoneNumber, token, amount, orders are required."}), 400
+        if not isinstance(orders, list) or any(not isinstance(o, dict) or not isinstance(o.get("stalls"), dict) for o in orders):
+            return jsonify({"error": "orders must be a list of objects with stalls."}), 400
+
+        rejection = admit_order(user_id, hawker_center) or payment_unavailable_response()
+        if rejection:
+            return rejection
+
+        carts = [{
+            "userId": o.get("userId", user_id),
+            "phoneNumber": o.get("phoneNumber", phone_number),
+            "stalls": o["stalls"]
+        } for o in orders]
+        stalls_dict = merge_carts(carts)
+
+        amount, error = validate_amount(hawker_center, stalls_dict, amount)
+        if error:
+            return error
+
+        order = {
+            "orderId": order_id,
+            "userId": user_id,
+            "phoneNumber": phone_number,
+            "hawkerCenter": hawker_center,
+            "stalls": stalls_dict,
+            "token": token,
+            "amount": amount,
+            "members": [{"userId": c["userId"], "phoneNumber": c["phoneNumber"]} for c in carts]
+        }
+        return accept_order(order, {"amount": amount, "members": member_subtotals(carts, stalls_dict)})
+
+    except Exception as e:
+        print(f"Error in create_batch_order: {e}")
+        return jsonify({"error": str(e)}), 500
+
 # 3) GET /order/status/<orderId> - Retrieve Order Status
 ###############################################################################
 @app.route("/order/status/<string:orderId>", methods=["GET"])
 def get_order_status(orderId):
     """
     GET /order/status/<orderId>
-    Returns the current status of the order from the in-memory store.
+    Returns the current status of the order from the order status store.
     Expected response:
         {
             "orderId": "order_1618033988",
-            "status": "pending" | "success" | "failed"
+            "status": "pending" | "paid" | "in_progress" | "ready" | "failed",
+            "paymentStatus": "pending" | "success" | "failed",
+            "stalls": {
+                "<stallName>": {"status": "queued" | "in_progress" | "ready", "completedDishes": [...]}
+            },
+            "updatedAt": 1743768000.0
         }
     """
-    order_data = orders.get(orderId)
-    if order_data:
-        return jsonify({
-            "orderId": orderId,
-            "status": order_data["status"]
-        }), 200
+    try:
+        status = order_status.get(orderId)
+    except Exception as e:
+        print(f"Error reading status of order {orderId}: {e}")
+        return jsonify({"error": "Order status unavailable"}), 503
+    if status:
+        return jsonify(status), 200
     else:
         return jsonify({"error": "Order not found"}), 404
 
+# 3b) GET /order/status/<orderId>/payment-action - 3D Secure for the customer
+###############################################################################
+@app.route("/order/status/<string:orderId>/payment-action", methods=["GET"])
+def get_payment_action(orderId):
+    """
+    GET /order/status/<orderId>/payment-action  (Authorization: Bearer <customerToken>)
+    The clientSecret for completing 3D Secure, once the status shows a
+    paymentAction (PAYMENT_CONFIRMATION=webhook). Only the order's customer
+    gets it.
+    """
+    user_id = authenticated_customer()
+    if user_id is None:
+        return jsonify({"error": "A valid customerToken is required"}), 401
+    try:
+        order = pending_orders.get(orderId)
+    except Exception as e:
+        print(f"Error reading pending order {orderId}: {e}")
+        return jsonify({"error": "Payment action unavailable"}), 503
+    if order is None or not order.get("clientSecret"):
+        return jsonify({"error": "No payment action for this order"}), 404
+    if str(order.get("userId")) != user_id:
+        return jsonify({"error": "Token does not belong to this order's user"}), 403
+    return jsonify({
+        "orderId": orderId,
+        "type": "requires_action",
+        "clientSecret": order["clientSecret"]
+    }), 200
+
+# 4) Server-sent events: live order status
+###############################################################################
+def streams_full_response():
+    return jsonify({
+        "error": "Too many open status streams, poll GET /order/status/<orderId> or retry later.",
+        "retryAfter": STATUS_STREAM_RETRY_AFTER
+    }), 503, {"Retry-After": str(STATUS_STREAM_RETRY_AFTER)}
+
+def sse_response(subscription, stream):
+    response = Response(stream, mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"  # Tell nginx not to buffer the stream
+    })
+    # The generator's own cleanup never runs if the client leaves before the
+    # first frame; give the subscriber slot back when the response is closed
+    response.call_on_close(subscription.close)
+    return response
+
+@app.route("/order/status/<string:orderId>/stream", methods=["GET"])
+def stream_order_status(orderId):
+    """
+    GET /order/status/<orderId>/stream
+    Sends the current status, then every change of it as an SSE "status"
+    event (same body as GET /order/status/<orderId>). The stream ends once
+    the order is ready or failed.
+    """
+    # Subscribe before reading so no event between the two is lost
+    subscription = status_broadcaster.subscribe("order", orderId)
+    if subscription is None:
+        return streams_full_response()
+    try:
+        initial = order_status.get(orderId)
+    except Exception as e:
+        print(f"Error reading status of order {orderId}: {e}")
+        initial = None
+    return sse_response(subscription, event_stream(
+        subscription, initial, close_when_done=True, max_seconds=STATUS_STREAM_MAX_SECONDS
+    ))
+
+@app.route("/users/<string:userId>/orders/stream", methods=["GET"])
+def stream_user_orders(userId):
+    """
+    GET /users/<userId>/orders/stream?token=<customerToken>
+    Sends an SSE "status" event whenever any order of the user changes.
+    The stream ends after STATUS_STREAM_MAX_SECONDS and the client reconnects.
+    """
+    user_id = authenticated_customer()
+    if user_id is None:
+        return jsonify({"error": "A valid customerToken is required"}), 401
+    if user_id != userId:
+        return jsonify({"error": "Token does not belong to this user"}), 403
+    subscription = status_broadcaster.subscribe("user", userId)
+    if subscription is None:
+        return streams_full_response()
+    return sse_response(subscription, event_stream(subscription, max_seconds=STATUS_STREAM_MAX_SECONDS))
+
 def safe_start():
     try:
         setup_rabbitmq_connection()
+        start_status_consumer()
+        start_payment_consumer()
     except Exception as e:
         print(f"RabbitMQ consumer crashed: {e}")
 
@@ -230,4 +1023,6 @@ def safe_start():
 ###############################################################################
 if __name__ == '__main__':
     setup_rabbitmq_connection()
-    app.run(host='0.0.0.0', port=5003, debug=False, use_reloader=False)
+    start_status_consumer()
+    start_payment_consumer()
+    app.run(host='0.0.0.0', port=5003, debug=False, use_reloader=False, threaded=True)
@@ -0,0 +1,123 @@
+"""
+Orders waiting for their payment outcome (PAYMENT_CONFIRMATION=webhook).
+
+An order is saved before it is sent to the payment service and claimed
+exactly once, by whoever learns the outcome first: the POST /order request
+(when payment answers with a final outcome) or the O_payment consumer (when
+the Stripe webhook arrives). Whoever claims it publishes the order's events;
+the other finds nothing to claim and does nothing, so duplicate webhooks and
+retries never publish an order twice.
+
+Orders whose outcome never arrives (a lost webhook, 3D Secure the customer
+abandoned) are claimed by take_expired() and failed by the sweeper.
+
+The card token is never stored. The PaymentIntent's clientSecret is, while
+Stripe waits for 3D Secure: it is only handed to the order's own customer
+(GET /order/status/<orderId>/payment-action), never put in the public
+order status.
+"""
+
+import threading
+import time
+
+from google.api_core.exceptions import NotFound
+from google.cloud import firestore
+
+
+def without_token(order: dict) -> dict:
+    return {key: value for key, value in order.items() if key != "token"}
+
+
+class MemoryPendingOrders:
+    """Per-process store, for sync mode and tests; webhook mode refuses to start with it."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # orderId -> (saved_at, order)
+        self._orders = {}
+
+    def save(self, order: dict):
+        with self._lock:
+            self._orders[order["orderId"]] = (time.monotonic(), without_token(order))
+
+    def get(self, order_id: str):
+        """The pending order without claiming it, or None."""
+        with self._lock:
+            entry = self._orders.get(order_id)
+        return None if entry is None else dict(entry[1])
+
+    def set_client_secret(self, order_id: str, client_secret: str):
+        """Keeps the clientSecret with the order, if it is still pending."""
+        with self._lock:
+            if order_id in self._orders:
+                self._orders[order_id][1]["clientSecret"] = client_secret
+
+    def claim(self, order_id: str):
+        """Removes and returns the order, or None if it was already claimed."""
+        with self._lock:
+            entry = self._orders.pop(order_id, None)
+        return None if entry is None else entry[1]
+
+    def take_expired(self, max_age_seconds: float) -> list:
+        """Claims and returns every order saved more than max_age_seconds ago."""
+        cutoff = time.monotonic() - max_age_seconds
+        with self._lock:
+            expired = [order_id for order_id, (saved_at, _) in self._orders.items() if saved_at < cutoff]
+            return [self._orders.pop(order_id)[1] for order_id in expired]
+
+
+class FirestorePendingOrders:
+    """Shared by every replica and consumer: one document per order in the given collection."""
+
+    def __init__(self, db, collection: str = "pendingOrders"):
+        self.db = db
+        self.collection = db.collection(collection)
+
+    def save(self, order: dict):
+        self.collection.document(order["orderId"]).set({**without_token(order), "savedAt": time.time()})
+
+    def get(self, order_id: str):
+        """The pending order without claiming it, or None."""
+        snapshot = self.collection.document(order_id).get()
+        if not snapshot.exists:
+            return None
+        order = snapshot.to_dict()
+        order.pop("savedAt", None)
+        return order
+
+    def set_client_secret(self, order_id: str, client_secret: str):
+        """Keeps the clientSecret with the order, if it is still pending."""
+        try:
+            self.collection.document(order_id).update({"clientSecret": client_secret})
+        except NotFound:
+            pass  # Already claimed: the outcome arrived first
+
+    def claim(self, order_id: str):
+        """Removes and returns the order in one transaction, or None if it was already claimed."""
+        @firestore.transactional
+        def claim_in(transaction, ref):
+            snapshot = ref.get(transaction=transaction)
+            if not snapshot.exists:
+                return None
+            transaction.delete(ref)
+            return snapshot.to_dict()
+
+        order = claim_in(self.db.transaction(), self.collection.document(order_id))
+        if order is not None:
+            order.pop("savedAt", None)
+        return order
+
+    def take_expired(self, max_age_seconds: float, limit: int = 200) -> list:
+        """
+        Claims and returns orders saved more than max_age_seconds ago. Each
+        one is claimed in its own transaction, so sweepers on several
+        replicas never fail the same order twice.
+        """
+        cutoff = time.time() - max_age_seconds
+        query = self.collection.where(filter=firestore.FieldFilter("savedAt", "<", cutoff)).limit(limit)
+        expired = []
+        for snapshot in query.stream():
+            order = self.claim(snapshot.id)
+            if order is not None:
+                expired.append(order)
+        return expired
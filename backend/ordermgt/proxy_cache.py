@@ -0,0 +1,136 @@
+"""
+Stale-while-revalidate cache for the menu proxy routes.
+
+For every key (the upstream URL) an entry is:
+- fresh for ttl seconds: served from memory
+- stale for the next stale_ttl seconds: served from memory while one
+  background refresh runs
+- past that: fetched synchronously
+and, if the upstream call fails, any entry younger than stale_if_error is
+served instead of the error.
+
+Concurrent misses for the same key share one upstream call (request
+coalescing); so do concurrent background refreshes.
+
+Keys come from client-supplied IDs, so the cache is bounded: at most
+max_entries keys (least recently used are evicted first), entries older
+than ttl + max(stale_ttl, stale_if_error) are dropped, and client errors
+(UpstreamError with a 4xx status, e.g. 404) are never cached or served stale.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+HIT = "HIT"
+STALE = "STALE"
+MISS = "MISS"
+STALE_IF_ERROR = "STALE-IF-ERROR"
+
+
+class UpstreamError(Exception):
+    """Raised by fetch functions for responses that must not be cached (e.g. 5xx)."""
+
+    def __init__(self, status_code: int, message: str = ""):
+        super().__init__(message or f"Upstream responded with {status_code}")
+        self.status_code = status_code
+
+
+class StaleWhileRevalidateCache:
+    def __init__(self, fetch, stale_if_error: float = 86400, max_refresh_workers: int = 4, max_entries: int = 2048):
+        """fetch(key) returns the value to cache or raises (UpstreamError for HTTP errors)."""
+        self.fetch = fetch
+        self.stale_if_error = stale_if_error
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # key -> (stored_at, value, drop_after), least recently used first
+        self._entries = OrderedDict()
+        # key -> Future of the upstream call in flight
+        self._inflight = {}
+        self._refresher = ThreadPoolExecutor(max_workers=max_refresh_workers, thread_name_prefix="menu-refresh")
+
+    def get(self, key, ttl: float, stale_ttl: float):
+        """Returns (value, cache_state). Raises the upstream error when nothing usable is cached."""
+        now = time.monotonic()
+        drop_after = ttl + max(stale_ttl, self.stale_if_error)
+        with self._lock:
+            entry = self._live_entry(key, now)
+            if entry is not None:
+                age = now - entry[0]
+                if age < ttl:
+                    return entry[1], HIT
+                if age < ttl + stale_ttl:
+                    if key not in self._inflight:
+                        self._inflight[key] = Future()
+                        self._refresher.submit(self._load, key, self._inflight[key], drop_after)
+                    return entry[1], STALE
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+
+        if leader:
+            self._load(key, future, drop_after)
+        try:
+            return future.result(), MISS
+        except UpstreamError as e:
+            if e.status_code < 500:
+                raise  # An answer, not an outage: nothing stale to fall back to
+            return self._stale_if_error(key, e)
+        except Exception as e:
+            return self._stale_if_error(key, e)
+
+    def _stale_if_error(self, key, error):
+        with self._lock:
+            entry = self._live_entry(key, time.monotonic())
+        if entry is not None and time.monotonic() - entry[0] < self.stale_if_error:
+            return entry[1], STALE_IF_ERROR
+        raise error
+
+    def _live_entry(self, key, now):
+        """The entry for key (marked recently used), dropping it if it is too old. Holds _lock."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if now - entry[0] >= entry[2]:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _store(self, key, value, drop_after):
+        """Holds _lock."""
+        now = time.monotonic()
+        self._entries[key] = (now, value, drop_after)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        # Expired entries at the cold end go too, so idle keys do not linger
+        while self._entries:
+            oldest_key, (stored_at, _, oldest_drop_after) = next(iter(self._entries.items()))
+            if now - stored_at < oldest_drop_after:
+                break
+            del self._entries[oldest_key]
+
+    def _load(self, key, future: Future, drop_after: float):
+        try:
+            value = self.fetch(key)
+        except Exception as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+                if isinstance(e, UpstreamError) and e.status_code < 500:
+                    self._entries.pop(key, None)
+            future.set_exception(e)
+            return
+        with self._lock:
+            self._store(key, value, drop_after)
+            self._inflight.pop(key, None)
+        future.set_result(value)
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
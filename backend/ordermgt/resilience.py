@@ -0,0 +1,216 @@
+"""
+Circuit breakers and bulkheads for ordermgt's outbound dependencies.
+
+    payment = Dependency("payment", CircuitBreaker("payment"), Bulkhead("payment", 8))
+    response = payment.call(http_client.post, url, json=payload, timeout=5)
+
+- Bulkhead: a bounded number of concurrent calls per dependency, so a slow
+  payment service can only tie up its own slots and never the threads the
+  menu routes need. Callers that cannot get a slot quickly are rejected.
+- CircuitBreaker: tracks a rolling window of outcomes. When too many calls
+  fail or are slow it opens and rejects calls immediately; after a cool-down
+  it lets a few probe calls through (half-open) and closes again if they
+  succeed.
+
+Both reject with DependencyUnavailable, which carries a retry_after hint.
+"""
+
+import threading
+import time
+from collections import deque
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class DependencyUnavailable(Exception):
+    def __init__(self, name: str, reason: str, retry_after: float = 1.0):
+        super().__init__(f"{name} unavailable: {reason}")
+        self.name = name
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        name: str,
+        window_seconds: float = 30.0,
+        min_calls: int = 10,
+        failure_ratio: float = 0.5,
+        slow_call_seconds: float = 2.0,
+        slow_ratio: float = 0.8,
+        open_seconds: float = 15.0,
+        half_open_probes: int = 2,
+    ):
+        self.name = name
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.failure_ratio = failure_ratio
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_ratio = slow_ratio
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        # (finished_at, failed, slow)
+        self._window = deque()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._maybe_half_open(time.monotonic())
+            return self._state
+
+    def _maybe_half_open(self, now: float):
+        if self._state == OPEN and now - self._opened_at >= self.open_seconds:
+            self._state = HALF_OPEN
+            self._probes_in_flight = 0
+            self._probe_successes = 0
+
+    def _trim(self, now: float):
+        while self._window and now - self._window[0][0] > self.window_seconds:
+            self._window.popleft()
+
+    def before_call(self) -> bool:
+        """
+        Raises DependencyUnavailable when the call must not be attempted.
+        Returns True when the call is a half-open probe.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._maybe_half_open(now)
+            if self._state == OPEN:
+                retry_after = self.open_seconds - (now - self._opened_at)
+                raise DependencyUnavailable(self.name, "circuit open", max(retry_after, 0.1))
+            if self._state == HALF_OPEN:
+                if self._probes_in_flight >= self.half_open_probes:
+                    raise DependencyUnavailable(self.name, "circuit half-open, probe in flight", 1.0)
+                self._probes_in_flight += 1
+                return True
+        return False
+
+    def cancel_call(self, probe: bool):
+        """The call allowed by before_call() never reached the dependency: record nothing."""
+        if not probe:
+            return
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probes_in_flight = max(self._probes_in_flight - 1, 0)
+
+    def after_call(self, failed: bool, duration: float):
+        slow = duration >= self.slow_call_seconds
+        with self._lock:
+            now = time.monotonic()
+            if self._state == HALF_OPEN:
+                self._probes_in_flight = max(self._probes_in_flight - 1, 0)
+                if failed or slow:
+                    self._open(now)
+                else:
+                    self._probe_successes += 1
+                    if self._probe_successes >= self.half_open_probes:
+                        self._state = CLOSED
+                        self._window.clear()
+                        print(f"Circuit '{self.name}' closed")
+                return
+
+            self._window.append((now, failed, slow))
+            self._trim(now)
+            calls = len(self._window)
+            if self._state == CLOSED and calls >= self.min_calls:
+                failures = sum(1 for _, f, _ in self._window if f)
+                slow_calls = sum(1 for _, _, s in self._window if s)
+                if failures / calls >= self.failure_ratio or slow_calls / calls >= self.slow_ratio:
+                    self._open(now)
+
+    def _open(self, now: float):
+        self._state = OPEN
+        self._opened_at = now
+        self._window.clear()
+        print(f"Circuit '{self.name}' opened for {self.open_seconds}s")
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            now = time.monotonic()
+            self._maybe_half_open(now)
+            self._trim(now)
+            calls = len(self._window)
+            return {
+                "state": self._state,
+                "calls": calls,
+                "failures": sum(1 for _, f, _ in self._window if f),
+                "slowCalls": sum(1 for _, _, s in self._window if s),
+            }
+
+
+class Bulkhead:
+    def __init__(self, name: str, max_concurrent: int, max_wait: float = 0.05):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_wait = max_wait
+        self._semaphore = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self._active = 0
+        self._rejected = 0
+
+    def acquire(self):
+        if not self._semaphore.acquire(timeout=self.max_wait):
+            with self._lock:
+                self._rejected += 1
+            raise DependencyUnavailable(self.name, "too many concurrent calls", 1.0)
+        with self._lock:
+            self._active += 1
+
+    def release(self):
+        with self._lock:
+            self._active -= 1
+        self._semaphore.release()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"active": self._active, "maxConcurrent": self.max_concurrent, "rejected": self._rejected}
+
+
+def is_server_error(response) -> bool:
+    return getattr(response, "status_code", 200) >= 500
+
+
+class Dependency:
+    """A bulkhead and a circuit breaker in front of one downstream service."""
+
+    def __init__(self, name: str, breaker: CircuitBreaker, bulkhead: Bulkhead, is_failure=is_server_error):
+        self.name = name
+        self.breaker = breaker
+        self.bulkhead = bulkhead
+        self.is_failure = is_failure
+
+    def check_available(self):
+        """Fails fast (DependencyUnavailable) while the circuit is open."""
+        if self.breaker.state == OPEN:
+            self.breaker.before_call()
+
+    def call(self, fn, *args, **kwargs):
+        probe = self.breaker.before_call()
+        try:
+            self.bulkhead.acquire()
+        except DependencyUnavailable:
+            # Rejected before reaching the dependency: says nothing about its health
+            self.breaker.cancel_call(probe)
+            raise
+        start = time.monotonic()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            self.breaker.after_call(failed=True, duration=time.monotonic() - start)
+            raise
+        finally:
+            self.bulkhead.release()
+        self.breaker.after_call(failed=self.is_failure(result), duration=time.monotonic() - start)
+        return result
+
+    def snapshot(self) -> dict:
+        return {"circuit": self.breaker.snapshot(), "bulkhead": self.bulkhead.snapshot()}
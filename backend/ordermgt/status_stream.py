@@ -0,0 +1,135 @@
+"""
+Server-sent events for live order status.
+
+    GET /order/status/<orderId>/stream
+    GET /users/<userId>/orders/stream
+
+Every status event applied to the OrderStatusStore (from this replica's own
+writes or from the per-replica AMQP queue) is handed to
+StatusBroadcaster.publish, which pushes the new status to the subscribers
+of that order and of its user. Each subscriber has its own bounded queue;
+a client too slow to drain it is disconnected rather than allowed to hold
+memory.
+
+Streams are long-lived, so the service must run on a threaded or
+cooperative worker (Flask's threaded server, gunicorn gthread/gevent). On
+gthread every open stream pins a thread, so the broadcaster caps the number
+of subscribers per worker (subscribe returns None when full) and
+event_stream ends a stream after max_seconds; EventSource clients reconnect
+on their own.
+"""
+
+import json
+import queue
+import threading
+import time
+
+HEARTBEAT_SECONDS = 15
+SUBSCRIBER_QUEUE_SIZE = 100
+TERMINAL_STATUSES = {"ready", "failed"}
+
+
+class Subscription:
+    def __init__(self, broadcaster, key):
+        self.broadcaster = broadcaster
+        self.key = key
+        self.queue = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.closed = False
+        # orderId -> last status pushed; the same event arrives once from the
+        # local write and once from the broker and is only sent once
+        self.last_sent = {}
+
+    def offer(self, status: dict):
+        # updatedAt alone changing is not news
+        progress = {k: v for k, v in status.items() if k != "updatedAt"}
+        if self.last_sent.get(status["orderId"]) == progress:
+            return
+        self.last_sent[status["orderId"]] = progress
+        try:
+            self.queue.put_nowait(status)
+        except queue.Full:
+            self.closed = True
+            self.broadcaster.unsubscribe(self)
+
+    def close(self):
+        self.broadcaster.unsubscribe(self)
+
+
+class StatusBroadcaster:
+    def __init__(self, max_subscribers: int = None):
+        self.max_subscribers = max_subscribers
+        self._count = 0
+        self._lock = threading.Lock()
+        # ("order", orderId) / ("user", userId) -> set of Subscriptions
+        self._subscribers = {}
+
+    def subscribe(self, kind: str, key: str):
+        """Returns a Subscription, or None when max_subscribers streams are already open."""
+        subscription = Subscription(self, (kind, key))
+        with self._lock:
+            if self.max_subscribers is not None and self._count >= self.max_subscribers:
+                return None
+            self._subscribers.setdefault(subscription.key, set()).add(subscription)
+            self._count += 1
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.key)
+            if subscribers is not None and subscription in subscribers:
+                subscribers.discard(subscription)
+                self._count -= 1
+                if not subscribers:
+                    del self._subscribers[subscription.key]
+
+    def publish(self, user_id, status: dict):
+        with self._lock:
+            targets = list(self._subscribers.get(("order", status["orderId"]), ()))
+            if user_id is not None:
+                targets += self._subscribers.get(("user", user_id), ())
+        for subscription in targets:
+            subscription.offer(status)
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return self._count
+
+
+def format_event(status: dict) -> str:
+    return f"id: {status.get('updatedAt')}\nevent: status\ndata: {json.dumps(status)}\n\n"
+
+
+def event_stream(subscription: Subscription, initial=None, close_when_done: bool = False, max_seconds: float = None):
+    """
+    Yields SSE frames for a subscription, with a comment line as heartbeat
+    so proxies keep the connection open. With close_when_done the stream
+    ends once the order is ready or failed; with max_seconds it ends after
+    that long regardless and the client reconnects.
+    """
+    deadline = None if max_seconds is None else time.monotonic() + max_seconds
+    try:
+        yield "retry: 3000\n\n"
+        if initial is not None:
+            subscription.last_sent[initial["orderId"]] = {k: v for k, v in initial.items() if k != "updatedAt"}
+            yield format_event(initial)
+            if close_when_done and initial["status"] in TERMINAL_STATUSES:
+                return
+        while not subscription.closed:
+            timeout = HEARTBEAT_SECONDS
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                timeout = min(timeout, remaining)
+            try:
+                status = subscription.queue.get(timeout=timeout)
+            except queue.Empty:
+                if deadline is not None and time.monotonic() >= deadline:
+                    return
+                yield f": keep-alive {int(time.time())}\n\n"
+                continue
+            yield format_event(status)
+            if close_when_done and status["status"] in TERMINAL_STATUSES:
+                return
+    finally:
+        subscription.close()
@@ -0,0 +1,99 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ordermanagement  # noqa: E402
+from admission import ConcurrencyLimiter, KeyedRateLimiter, TokenBucket, retry_after_seconds  # noqa: E402
+
+
+def test_bucket_allows_a_burst_then_waits():
+    bucket = TokenBucket(rate=2, burst=2)
+    now = bucket.updated_at
+    assert bucket.take(now) == 0
+    assert bucket.take(now) == 0
+    assert bucket.take(now) == pytest.approx(0.5)
+
+
+def test_bucket_refills_at_its_rate_up_to_the_burst():
+    bucket = TokenBucket(rate=2, burst=2)
+    now = bucket.updated_at
+    bucket.take(now)
+    bucket.take(now)
+    assert bucket.take(now + 0.5) == 0
+    assert bucket.take(now + 0.5) > 0
+    # A long idle period refills only up to the burst
+    assert bucket.take(now + 100) == 0
+    assert bucket.take(now + 100) == 0
+    assert bucket.take(now + 100) > 0
+
+
+def test_keys_have_their_own_buckets():
+    limiter = KeyedRateLimiter(rate=0.001, burst=1)
+    assert limiter.check("a") == 0
+    assert limiter.check("a") > 0
+    assert limiter.check("b") == 0
+
+
+def test_least_recently_used_keys_are_dropped():
+    limiter = KeyedRateLimiter(rate=0.001, burst=1, max_keys=2)
+    limiter.check("a")
+    limiter.check("b")
+    limiter.check("c")
+    # "a" lost its (empty) bucket, so it starts with a full one again
+    assert limiter.check("a") == 0
+
+
+def test_concurrency_limiter_caps_in_flight():
+    limiter = ConcurrencyLimiter(1)
+    assert limiter.try_acquire()
+    assert not limiter.try_acquire()
+    limiter.release()
+    assert limiter.try_acquire()
+
+
+def test_retry_after_follows_the_backlog():
+    assert retry_after_seconds(None, 20) == 1
+    assert retry_after_seconds(100, 20) == 5
+    assert retry_after_seconds(10 ** 6, 20) == 120
+
+
+class Probe:
+    def depth(self):
+        return 100
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(ordermanagement, "order_queue_probe", Probe())
+    monkeypatch.setattr(ordermanagement, "QUEUE_DRAIN_RATE", 20)
+    return ordermanagement.app.test_client()
+
+
+def test_order_beyond_the_user_rate_gets_429(client, monkeypatch):
+    monkeypatch.setattr(ordermanagement, "user_rate_limiter", KeyedRateLimiter(rate=0.5, burst=1))
+    with ordermanagement.app.test_request_context():
+        assert ordermanagement.admit_order("u1", None) is None
+        body, status, headers = ordermanagement.admit_order("u1", None)
+    assert status == 429
+    assert headers == {"Retry-After": "2"}
+    assert body.get_json()["retryAfter"] == 2
+
+
+def test_busy_hawker_centre_retry_after_covers_the_backlog(client, monkeypatch):
+    monkeypatch.setattr(ordermanagement, "user_rate_limiter", KeyedRateLimiter(rate=100, burst=100))
+    monkeypatch.setattr(ordermanagement, "hawker_rate_limiter", KeyedRateLimiter(rate=100, burst=1))
+    with ordermanagement.app.test_request_context():
+        assert ordermanagement.admit_order("u1", "Maxwell") is None
+        _, status, headers = ordermanagement.admit_order("u2", "Maxwell")
+    assert status == 429
+    assert headers == {"Retry-After": "5"}  # 100 queued orders at 20/s
+
+
+def test_order_at_capacity_is_shed_with_429(client, monkeypatch):
+    monkeypatch.setattr(ordermanagement, "order_slots", ConcurrencyLimiter(0))
+    response = client.post("/order", json={"userId": "u1"})
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "5"
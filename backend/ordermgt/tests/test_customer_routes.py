@@ -0,0 +1,61 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ordermanagement  # noqa: E402
+import user_tokens  # noqa: E402
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(ordermanagement, "CUSTOMER_TOKEN_SECRET", "secret")
+    monkeypatch.setattr(ordermanagement, "STATUS_STREAM_MAX_SECONDS", 0)
+    return ordermanagement.app.test_client()
+
+
+def test_stream_without_token_is_unauthorized(client):
+    assert client.get("/users/u1/orders/stream").status_code == 401
+
+
+def test_stream_with_forged_token_is_unauthorized(client):
+    token = user_tokens.issue("u1", "other")
+    assert client.get(f"/users/u1/orders/stream?token={token}").status_code == 401
+
+
+def test_stream_of_another_user_is_forbidden(client):
+    token = user_tokens.issue("u2", "secret")
+    response = client.get("/users/u1/orders/stream", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 403
+
+
+def test_stream_with_own_token(client):
+    token = user_tokens.issue("u1", "secret")
+    response = client.get(f"/users/u1/orders/stream?token={token}")
+    assert response.status_code == 200
+    assert response.mimetype == "text/event-stream"
+    response.close()
+
+
+def test_customer_token_is_issued_for_the_order_user(client):
+    fields = ordermanagement.customer_token_fields("u1")
+    assert user_tokens.verify(fields["customerToken"], "secret") == "u1"
+
+
+def test_payment_action_only_for_the_order_user(client, monkeypatch):
+    store = ordermanagement.MemoryPendingOrders()
+    store.save({"orderId": "order_a", "userId": "u1", "token": "tok_visa", "amount": 5.0})
+    store.set_client_secret("order_a", "pi_secret")
+    monkeypatch.setattr(ordermanagement, "pending_orders", store)
+    url = "/order/status/order_a/payment-action"
+    assert client.get(url).status_code == 401
+    other = user_tokens.issue("u2", "secret")
+    assert client.get(url, headers={"Authorization": f"Bearer {other}"}).status_code == 403
+    own = user_tokens.issue("u1", "secret")
+    response = client.get(url, headers={"Authorization": f"Bearer {own}"})
+    assert response.status_code == 200
+    assert response.get_json()["clientSecret"] == "pi_secret"
+    # The public status never carries it
+    assert "pi_secret" not in client.get("/order/status/order_a").get_data(as_text=True)
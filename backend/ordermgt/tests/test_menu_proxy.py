@@ -0,0 +1,43 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ordermanagement  # noqa: E402
+from proxy_cache import StaleWhileRevalidateCache  # noqa: E402
+
+
+class Response:
+    def __init__(self, status_code, body=None):
+        self.status_code = status_code
+        self.body = body
+
+    def json(self):
+        return self.body
+
+
+@pytest.fixture
+def menu(monkeypatch):
+    """Answers the menu GETs with the queued responses."""
+    answers = []
+    monkeypatch.setattr(ordermanagement.http_client, "get", lambda url, **kwargs: answers.pop(0))
+    monkeypatch.setattr(ordermanagement, "menu_cache", StaleWhileRevalidateCache(ordermanagement.fetch_menu))
+    return answers
+
+
+def test_menu_is_proxied_and_cached(menu):
+    client = ordermanagement.app.test_client()
+    menu.append(Response(200, [{"hawkerId": "maxwell"}]))
+    first = client.get("/hawkerCenters")
+    second = client.get("/hawkerCenters")
+    assert first.get_json() == second.get_json() == [{"hawkerId": "maxwell"}]
+    assert (first.headers["X-Cache"], second.headers["X-Cache"]) == ("MISS", "HIT")
+
+
+def test_menu_errors_keep_their_status(menu):
+    menu.append(Response(404, {"error": "not found"}))
+    response = ordermanagement.app.test_client().get("/hawkerCenters/nowhere/stalls")
+    assert response.status_code == 404
+    assert "Status code: 404" in response.get_json()["error"]
@@ -0,0 +1,60 @@
+import os
+import sys
+import time
+
+import pytest
+
+# order_ids.py is shared, in backend/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import order_ids  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def fresh_node(monkeypatch):
+    for name in ("ORDER_ID_NODE", "ORDER_ID_REPLICA", "WEB_WORKER_INDEX"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setattr(order_ids, "_node", None)
+
+
+def test_encode_decode_round_trip():
+    for value in (0, 1, 31, 32, 2 ** 40 + 12345, 2 ** 64 - 1):
+        encoded = order_ids.encode(value)
+        assert len(encoded) == order_ids.ENCODED_LENGTH
+        assert order_ids.decode(encoded) == value
+
+
+def test_ids_sort_by_creation_time():
+    first = order_ids.new_order_id()
+    time.sleep(0.002)
+    second = order_ids.new_order_id()
+    assert order_ids.is_order_id(first) and order_ids.is_order_id(second)
+    assert first < second
+    assert abs(order_ids.order_id_time(second) - time.time()) < 1
+
+
+def test_floor_bounds_ids_issued_at_or_after_it():
+    now = time.time()
+    floor = order_ids.order_id_floor(now - 1)
+    assert floor <= order_ids.new_order_id()
+    assert order_ids.order_id_floor(now + 60) > order_ids.new_order_id()
+
+
+def test_legacy_ids_are_not_order_ids():
+    legacy = "order_1743768000123"
+    assert not order_ids.is_order_id(legacy)
+    assert order_ids.legacy_order_time(legacy) == 1743768000.123
+    assert order_ids.legacy_order_time(order_ids.new_order_id()) is None
+    assert order_ids.legacy_order_time("something_else") is None
+
+
+def test_node_from_replica_and_worker_index(monkeypatch):
+    monkeypatch.setenv("ORDER_ID_REPLICA", "3")
+    monkeypatch.setenv("WEB_WORKER_INDEX", "2")
+    assert order_ids.node_id() == (3 << order_ids.WORKER_BITS) | 2
+
+
+def test_out_of_range_node_fails_loudly(monkeypatch):
+    monkeypatch.setenv("WEB_WORKER_INDEX", "32")
+    with pytest.raises(ValueError):
+        order_ids.node_id()
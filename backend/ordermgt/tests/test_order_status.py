@@ -0,0 +1,25 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from order_status import (  # noqa: E402
+    ORDER_PENDING, PAYMENT_REQUIRES_ACTION, PAYMENT_SUCCEEDED, deep_merge, event_to_fields, to_response
+)
+
+
+def apply(doc, event):
+    return deep_merge(doc, event_to_fields(event))
+
+
+def test_requires_action_never_stores_the_client_secret():
+    doc = apply({}, {"type": ORDER_PENDING, "orderId": "a", "userId": "u", "stalls": ["s"]})
+    apply(doc, {"type": PAYMENT_REQUIRES_ACTION, "orderId": "a", "clientSecret": "pi_secret"})
+    assert "pi_secret" not in repr(doc)
+    assert to_response(doc)["paymentAction"] == {"type": "requires_action"}
+
+
+def test_payment_action_is_hidden_once_paid():
+    doc = apply({}, {"type": PAYMENT_REQUIRES_ACTION, "orderId": "a"})
+    apply(doc, {"type": PAYMENT_SUCCEEDED, "orderId": "a"})
+    assert "paymentAction" not in to_response(doc)
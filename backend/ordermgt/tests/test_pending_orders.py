@@ -0,0 +1,40 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pending_orders import MemoryPendingOrders  # noqa: E402
+
+
+def order(order_id):
+    return {"orderId": order_id, "userId": "u", "token": "tok_visa", "amount": 5.0}
+
+
+def test_claim_returns_the_order_once_without_its_token():
+    store = MemoryPendingOrders()
+    store.save(order("a"))
+    claimed = store.claim("a")
+    assert claimed == {"orderId": "a", "userId": "u", "amount": 5.0}
+    assert store.claim("a") is None
+
+
+def test_take_expired_claims_only_old_orders():
+    store = MemoryPendingOrders()
+    store.save(order("old"))
+    time.sleep(0.05)
+    store.save(order("new"))
+    expired = store.take_expired(0.03)
+    assert [o["orderId"] for o in expired] == ["old"]
+    assert store.claim("old") is None
+    assert store.claim("new") is not None
+
+
+def test_client_secret_is_kept_only_while_pending():
+    store = MemoryPendingOrders()
+    store.save(order("a"))
+    store.set_client_secret("a", "pi_secret")
+    assert store.get("a")["clientSecret"] == "pi_secret"
+    store.claim("a")
+    store.set_client_secret("a", "pi_secret")
+    assert store.get("a") is None
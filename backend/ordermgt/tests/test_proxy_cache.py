@@ -0,0 +1,116 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from proxy_cache import (  # noqa: E402
+    HIT, MISS, STALE, STALE_IF_ERROR, StaleWhileRevalidateCache, UpstreamError
+)
+
+
+class Upstream:
+    def __init__(self):
+        self.calls = []
+        self.error = None
+
+    def __call__(self, key):
+        self.calls.append(key)
+        if self.error is not None:
+            raise self.error
+        return f"{key}#{len(self.calls)}"
+
+
+def wait_for(condition, timeout=1.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.005)
+    return condition()
+
+
+def test_miss_then_hit():
+    upstream = Upstream()
+    cache = StaleWhileRevalidateCache(upstream)
+    assert cache.get("a", ttl=10, stale_ttl=10) == ("a#1", MISS)
+    assert cache.get("a", ttl=10, stale_ttl=10) == ("a#1", HIT)
+    assert upstream.calls == ["a"]
+
+
+def test_stale_is_served_while_refreshing():
+    upstream = Upstream()
+    cache = StaleWhileRevalidateCache(upstream)
+    cache.get("a", ttl=0.02, stale_ttl=10)
+    time.sleep(0.03)
+    assert cache.get("a", ttl=0.02, stale_ttl=10) == ("a#1", STALE)
+    assert wait_for(lambda: len(upstream.calls) == 2)
+    assert wait_for(lambda: cache.get("a", ttl=10, stale_ttl=10)[0] == "a#2")
+
+
+def test_concurrent_misses_share_one_call():
+    release = threading.Event()
+    calls = []
+
+    def fetch(key):
+        calls.append(key)
+        release.wait()
+        return key
+
+    cache = StaleWhileRevalidateCache(fetch)
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get("a", ttl=10, stale_ttl=10)))
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    assert wait_for(lambda: len(calls) == 1)
+    time.sleep(0.02)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert calls == ["a"]
+    assert results == [("a", MISS)] * 5
+
+
+def test_stale_if_error_on_server_error():
+    upstream = Upstream()
+    cache = StaleWhileRevalidateCache(upstream, stale_if_error=10)
+    cache.get("a", ttl=0, stale_ttl=0)
+    upstream.error = UpstreamError(503)
+    assert cache.get("a", ttl=0, stale_ttl=0) == ("a#1", STALE_IF_ERROR)
+
+
+def test_client_errors_are_not_cached_or_served_stale():
+    upstream = Upstream()
+    cache = StaleWhileRevalidateCache(upstream, stale_if_error=10)
+    cache.get("a", ttl=0, stale_ttl=0)
+    upstream.error = UpstreamError(404)
+    with pytest.raises(UpstreamError):
+        cache.get("a", ttl=0, stale_ttl=0)
+    # The 404 dropped the old entry, so a later outage has nothing to fall back to
+    upstream.error = UpstreamError(503)
+    with pytest.raises(UpstreamError):
+        cache.get("a", ttl=0, stale_ttl=0)
+
+
+def test_least_recently_used_keys_are_evicted():
+    upstream = Upstream()
+    cache = StaleWhileRevalidateCache(upstream, max_entries=2)
+    cache.get("a", ttl=10, stale_ttl=10)
+    cache.get("b", ttl=10, stale_ttl=10)
+    cache.get("a", ttl=10, stale_ttl=10)
+    cache.get("c", ttl=10, stale_ttl=10)
+    assert cache.get("a", ttl=10, stale_ttl=10)[1] == HIT
+    assert cache.get("b", ttl=10, stale_ttl=10)[1] == MISS
+
+
+def test_entries_past_every_window_are_dropped():
+    upstream = Upstream()
+    cache = StaleWhileRevalidateCache(upstream, stale_if_error=0.02)
+    cache.get("a", ttl=0, stale_ttl=0)
+    time.sleep(0.03)
+    cache.get("b", ttl=0, stale_ttl=0)
+    assert "a" not in cache._entries
@@ -0,0 +1,81 @@
+import os
+import sys
+
+import pytest
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ordermanagement  # noqa: E402
+from resilience import CircuitBreaker, Bulkhead, Dependency, DependencyUnavailable  # noqa: E402
+
+
+class Response:
+    def __init__(self, status_code, status=None):
+        self.status_code = status_code
+        self.body = {"data": {"status": status}} if status else {}
+
+    def json(self):
+        return self.body
+
+
+@pytest.fixture
+def payment(monkeypatch):
+    """Answers POST /payment with the queued responses (or raises queued exceptions)."""
+    answers = []
+    calls = []
+
+    def post(url, **kwargs):
+        calls.append(kwargs)
+        answer = answers.pop(0)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+    monkeypatch.setattr(ordermanagement.http_client, "post", post)
+    monkeypatch.setattr(ordermanagement, "PAYMENT_PENDING_RETRY_SECONDS", 0)
+    monkeypatch.setattr(ordermanagement, "PAYMENT_CONFIRMATION", "sync")
+    # A breaker of its own, so failures in one test never open the circuit for the next
+    monkeypatch.setattr(ordermanagement, "payment_dependency",
+                        Dependency("payment", CircuitBreaker("payment"), Bulkhead("payment", 4)))
+    return answers, calls
+
+
+@pytest.mark.parametrize("answer", [
+    requests.Timeout(), requests.ConnectionError(), Response(502, "pending"), Response(503), Response(409, "pending")
+])
+def test_unknown_outcomes_are_polled_again_with_the_same_key(payment, answer):
+    answers, calls = payment
+    answers.extend([answer, Response(200, "success")])
+    assert ordermanagement.charge_payment("tok", 5.0, "order_a")[0] == "success"
+    assert len(calls) == 2
+    assert {c["headers"]["Idempotency-Key"] for c in calls} == {"order-order_a"}
+
+
+def test_declined_card_fails_without_retrying(payment):
+    answers, calls = payment
+    answers.append(Response(400, "failed"))
+    assert ordermanagement.charge_payment("tok", 5.0, "order_a")[0] == "failed"
+    assert len(calls) == 1
+
+
+def test_unknown_outcome_stays_pending_in_webhook_mode(payment, monkeypatch):
+    monkeypatch.setattr(ordermanagement, "PAYMENT_CONFIRMATION", "webhook")
+    answers, calls = payment
+    answers.extend([Response(502)] * (ordermanagement.PAYMENT_PENDING_RETRIES + 1))
+    assert ordermanagement.charge_payment("tok", 5.0, "order_a")[0] == "pending"
+
+
+def test_call_that_was_never_sent_fails(payment, monkeypatch):
+    def reject(*args, **kwargs):
+        raise DependencyUnavailable("payment", "circuit open")
+
+    monkeypatch.setattr(ordermanagement.payment_dependency, "call", reject)
+    assert ordermanagement.request_payment({}, "order_a")[0] == "failed"
+
+
+def test_timeout_covers_stripe_retries(payment):
+    answers, calls = payment
+    answers.append(Response(200, "success"))
+    ordermanagement.request_payment({}, "order_a")
+    assert calls[0]["timeout"] >= 10 * 3
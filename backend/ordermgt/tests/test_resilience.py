@@ -0,0 +1,162 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from resilience import (  # noqa: E402
+    CLOSED, OPEN, HALF_OPEN, CircuitBreaker, Bulkhead, Dependency, DependencyUnavailable
+)
+
+
+class Response:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+def make_breaker(**overrides):
+    options = dict(window_seconds=30, min_calls=4, failure_ratio=0.5, slow_call_seconds=1.0,
+                   slow_ratio=0.8, open_seconds=0.05, half_open_probes=2)
+    options.update(overrides)
+    return CircuitBreaker("test", **options)
+
+
+def record(breaker, failed=False, duration=0.0):
+    breaker.before_call()
+    breaker.after_call(failed=failed, duration=duration)
+
+
+def open_breaker(breaker):
+    for _ in range(breaker.min_calls):
+        record(breaker, failed=True)
+    assert breaker.state == OPEN
+
+
+def test_stays_closed_below_min_calls():
+    breaker = make_breaker()
+    for _ in range(3):
+        record(breaker, failed=True)
+    assert breaker.state == CLOSED
+
+
+def test_opens_on_failure_ratio():
+    breaker = make_breaker()
+    record(breaker)
+    record(breaker)
+    record(breaker, failed=True)
+    assert breaker.state == CLOSED
+    record(breaker, failed=True)
+    assert breaker.state == OPEN
+
+
+def test_opens_on_slow_ratio():
+    breaker = make_breaker()
+    for _ in range(4):
+        record(breaker, duration=2.0)
+    assert breaker.state == OPEN
+
+
+def test_open_rejects_with_retry_after():
+    breaker = make_breaker(open_seconds=10)
+    open_breaker(breaker)
+    with pytest.raises(DependencyUnavailable) as excinfo:
+        breaker.before_call()
+    assert 0 < excinfo.value.retry_after <= 10
+
+
+def test_half_open_after_cool_down_limits_probes():
+    breaker = make_breaker()
+    open_breaker(breaker)
+    time.sleep(0.06)
+    assert breaker.state == HALF_OPEN
+    assert breaker.before_call() is True
+    assert breaker.before_call() is True
+    with pytest.raises(DependencyUnavailable):
+        breaker.before_call()
+
+
+def test_half_open_closes_after_successful_probes():
+    breaker = make_breaker()
+    open_breaker(breaker)
+    time.sleep(0.06)
+    record(breaker)
+    assert breaker.state == HALF_OPEN
+    record(breaker)
+    assert breaker.state == CLOSED
+
+
+def test_half_open_reopens_on_failed_probe():
+    breaker = make_breaker()
+    open_breaker(breaker)
+    time.sleep(0.06)
+    record(breaker, failed=True)
+    assert breaker.state == OPEN
+
+
+def test_cancel_call_releases_probe_without_outcome():
+    breaker = make_breaker(half_open_probes=1)
+    open_breaker(breaker)
+    time.sleep(0.06)
+    probe = breaker.before_call()
+    breaker.cancel_call(probe)
+    # Still half-open (no success recorded) and the probe slot is free again
+    assert breaker.state == HALF_OPEN
+    assert breaker.before_call() is True
+
+
+def full_bulkhead():
+    bulkhead = Bulkhead("test", 1, max_wait=0.01)
+    bulkhead.acquire()
+    return bulkhead
+
+
+def test_bulkhead_rejection_does_not_close_half_open_circuit():
+    breaker = make_breaker(half_open_probes=1)
+    dependency = Dependency("test", breaker, full_bulkhead())
+    open_breaker(breaker)
+    time.sleep(0.06)
+    for _ in range(3):
+        with pytest.raises(DependencyUnavailable):
+            dependency.call(lambda: Response(200))
+    assert breaker.state == HALF_OPEN
+
+
+def test_bulkhead_rejection_does_not_dilute_failure_ratio():
+    breaker = make_breaker()
+    dependency = Dependency("test", breaker, full_bulkhead())
+    for _ in range(10):
+        with pytest.raises(DependencyUnavailable):
+            dependency.call(lambda: Response(200))
+    assert breaker.snapshot()["calls"] == 0
+
+
+def test_dependency_counts_server_errors_and_exceptions():
+    breaker = make_breaker()
+    dependency = Dependency("test", breaker, Bulkhead("test", 4))
+    dependency.call(lambda: Response(503))
+    dependency.call(lambda: Response(404))
+    with pytest.raises(ConnectionError):
+        dependency.call(lambda: (_ for _ in ()).throw(ConnectionError()))
+    snapshot = breaker.snapshot()
+    assert snapshot["calls"] == 3
+    assert snapshot["failures"] == 2
+    assert dependency.bulkhead.snapshot()["active"] == 0
+
+
+def test_bulkhead_limits_concurrency():
+    bulkhead = Bulkhead("test", 2, max_wait=0.01)
+    release = threading.Event()
+    dependency = Dependency("test", make_breaker(), bulkhead)
+    threads = [threading.Thread(target=dependency.call, args=(release.wait,)) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.05)
+    with pytest.raises(DependencyUnavailable):
+        dependency.call(lambda: Response(200))
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert bulkhead.snapshot() == {"active": 0, "maxConcurrent": 2, "rejected": 1}
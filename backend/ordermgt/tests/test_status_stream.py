@@ -0,0 +1,73 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import status_stream  # noqa: E402
+from status_stream import StatusBroadcaster, event_stream  # noqa: E402
+
+
+def status(order_id, value, updated_at=1):
+    return {"orderId": order_id, "status": value, "updatedAt": updated_at}
+
+
+def test_subscribe_refuses_beyond_max_subscribers():
+    broadcaster = StatusBroadcaster(max_subscribers=2)
+    first = broadcaster.subscribe("order", "a")
+    assert broadcaster.subscribe("user", "u") is not None
+    assert broadcaster.subscribe("order", "b") is None
+    first.close()
+    assert broadcaster.subscribe("order", "b") is not None
+    assert broadcaster.subscriber_count() == 2
+
+
+def test_closing_twice_frees_one_slot():
+    broadcaster = StatusBroadcaster(max_subscribers=2)
+    subscription = broadcaster.subscribe("order", "a")
+    broadcaster.subscribe("order", "a")
+    subscription.close()
+    subscription.close()
+    assert broadcaster.subscriber_count() == 1
+
+
+def test_publish_reaches_order_and_user_subscribers_once():
+    broadcaster = StatusBroadcaster()
+    by_order = broadcaster.subscribe("order", "a")
+    by_user = broadcaster.subscribe("user", "u")
+    broadcaster.publish("u", status("a", "paid", 1))
+    broadcaster.publish("u", status("a", "paid", 2))
+    assert by_order.queue.qsize() == 1
+    assert by_user.queue.qsize() == 1
+
+
+def test_slow_subscriber_is_dropped(monkeypatch):
+    monkeypatch.setattr(status_stream, "SUBSCRIBER_QUEUE_SIZE", 1)
+    broadcaster = StatusBroadcaster()
+    subscription = broadcaster.subscribe("order", "a")
+    broadcaster.publish(None, status("a", "paid"))
+    broadcaster.publish(None, status("a", "ready"))
+    assert subscription.closed
+    assert broadcaster.subscriber_count() == 0
+
+
+def test_stream_ends_on_terminal_status():
+    broadcaster = StatusBroadcaster()
+    subscription = broadcaster.subscribe("order", "a")
+    stream = event_stream(subscription, status("a", "paid"), close_when_done=True)
+    assert next(stream).startswith("retry:")
+    assert '"paid"' in next(stream)
+    broadcaster.publish(None, status("a", "ready", 2))
+    assert '"ready"' in next(stream)
+    assert list(stream) == []
+    assert broadcaster.subscriber_count() == 0
+
+
+def test_stream_ends_after_max_seconds():
+    broadcaster = StatusBroadcaster()
+    subscription = broadcaster.subscribe("user", "u")
+    start = time.monotonic()
+    frames = list(event_stream(subscription, max_seconds=0.05))
+    assert time.monotonic() - start < 1
+    assert frames == ["retry: 3000\n\n"]
+    assert broadcaster.subscriber_count() == 0
@@ -0,0 +1,297 @@
+"""
+Local stand-in for the Stripe endpoints the payment service uses, for load
+tests on machines without Stripe access.
+
+    python fake_stripe.py                       # http://localhost:12111
+    STRIPE_API_BASE=http://localhost:12111 STRIPE_API_KEY=sk_test_fake python payment.py
+
+Behaviour is configured with environment variables and can be changed while
+it runs with POST /_fake/config (same keys, JSON body), e.g. to start a
+latency spike in the middle of a benchmark:
+
+    FAKE_STRIPE_LATENCY_MEDIAN_MS   median latency per call (lognormal), default 250
+    FAKE_STRIPE_LATENCY_SIGMA       spread of the lognormal, default 0.4
+    FAKE_STRIPE_DECLINE_RATE        share of charges declined (402 card_error), default 0.02
+    FAKE_STRIPE_ERROR_RATE          share of calls failing with 500 api_error, default 0
+    FAKE_STRIPE_IDEMPOTENCY         "on" (Stripe's behaviour) or "off", default on
+    FAKE_STRIPE_WEBHOOK_URL         where to deliver payment_intent.* events, e.g.
+                                    http://localhost:5002/payment/webhook (unset: none)
+    FAKE_STRIPE_WEBHOOK_SECRET      signing secret for Stripe-Signature, default whsec_fake
+
+Tokens "tok_chargeDeclined" and "tok_fail" are always declined; any other
+token is charged (subject to the rates above).
+
+Idempotency follows Stripe: a repeated Idempotency-Key with the same
+parameters replays the first response (Idempotent-Replayed: true); with
+different parameters it is rejected with 400 idempotency_error.
+GET /_fake/stats reports call, replay, decline, error and webhook counts.
+"""
+import hashlib
+import hmac
+import json
+import math
+import os
+import random
+import threading
+import time
+import urllib.request
+import uuid
+
+from flask import Flask, jsonify, request
+
+app = Flask(__name__)
+
+config = {
+    "latencyMedianMs": float(os.environ.get("FAKE_STRIPE_LATENCY_MEDIAN_MS", 250)),
+    "latencySigma": float(os.environ.get("FAKE_STRIPE_LATENCY_SIGMA", 0.4)),
+    "declineRate": float(os.environ.get("FAKE_STRIPE_DECLINE_RATE", 0.02)),
+    "errorRate": float(os.environ.get("FAKE_STRIPE_ERROR_RATE", 0)),
+    "idempotency": os.environ.get("FAKE_STRIPE_IDEMPOTENCY", "on") == "on",
+    "webhookUrl": os.environ.get("FAKE_STRIPE_WEBHOOK_URL"),
+    "webhookSecret": os.environ.get("FAKE_STRIPE_WEBHOOK_SECRET", "whsec_fake"),
+}
+DECLINED_TOKENS = {"tok_chargeDeclined", "tok_fail"}
+
+lock = threading.Lock()
+# Idempotency-Key -> (request fingerprint, (body, status code))
+idempotent_responses = {}
+payment_intents = {}
+# PaymentIntent id -> card token, for confirming later
+payment_tokens = {}
+stats = {"calls": 0, "replays": 0, "declines": 0, "errors": 0, "webhooks": 0, "webhookFailures": 0}
+
+
+def count(stat):
+    with lock:
+        stats[stat] += 1
+
+
+def simulate_latency():
+    median = config["latencyMedianMs"]
+    if median > 0:
+        time.sleep(random.lognormvariate(math.log(median), config["latencySigma"]) / 1000)
+
+
+def stripe_error(status_code, error_type, message, code=None, decline_code=None):
+    error = {"type": error_type, "message": message}
+    if code:
+        error["code"] = code
+    if decline_code:
+        error["decline_code"] = decline_code
+    return {"error": error}, status_code
+
+
+def idempotent(handler):
+    """Runs handler once per Idempotency-Key, like Stripe does."""
+    def wrapper(*args, **kwargs):
+        count("calls")
+        simulate_latency()
+        key = request.headers.get("Idempotency-Key")
+        fingerprint = (request.path, tuple(sorted(request.form.items(multi=True))))
+        if key and config["idempotency"]:
+            with lock:
+                recorded = idempotent_responses.get(key)
+            if recorded is not None:
+                if recorded[0] != fingerprint:
+                    body, status_code = stripe_error(
+                        400, "idempotency_error",
+                        "Keys for idempotent requests can only be used with the same parameters they were first used with."
+                    )
+                    return jsonify(body), status_code
+                count("replays")
+                body, status_code = recorded[1]
+                return jsonify(body), status_code, {"Idempotent-Replayed": "true"}
+
+        if random.random() < config["errorRate"]:
+            # Not recorded: Stripe does not store responses of failed (500) requests
+            count("errors")
+            body, status_code = stripe_error(500, "api_error", "Fake Stripe API error.")
+            return jsonify(body), status_code, {"Stripe-Should-Retry": "true"}
+
+        body, status_code = handler(*args, **kwargs)
+        if key and config["idempotency"]:
+            with lock:
+                idempotent_responses[key] = (fingerprint, (body, status_code))
+        return jsonify(body), status_code, {"Request-Id": f"req_{uuid.uuid4().hex[:14]}"}
+    wrapper.__name__ = handler.__name__
+    return wrapper
+
+
+def new_payment_intent(form):
+    return {
+        "id": f"pi_{uuid.uuid4().hex[:24]}",
+        "object": "payment_intent",
+        "amount": int(form.get("amount", 0)),
+        "currency": form.get("currency", "sgd"),
+        "status": "requires_payment_method",
+        "client_secret": f"pi_secret_{uuid.uuid4().hex[:24]}",
+        "latest_charge": None,
+        "created": int(time.time()),
+        "livemode": False,
+        "metadata": {
+            key[len("metadata["):-1]: value for key, value in form.items() if key.startswith("metadata[")
+        },
+    }
+
+
+def confirm(payment_intent, token):
+    if token in DECLINED_TOKENS or random.random() < config["declineRate"]:
+        count("declines")
+        payment_intent["status"] = "requires_payment_method"
+        payment_intent["last_payment_error"] = {"type": "card_error", "code": "card_declined", "message": "Your card was declined."}
+        send_webhook("payment_intent.payment_failed", payment_intent)
+        body, status_code = stripe_error(402, "card_error", "Your card was declined.", "card_declined", "generic_decline")
+        body["error"]["payment_intent"] = payment_intent
+        return body, status_code
+    payment_intent["status"] = "succeeded"
+    payment_intent["latest_charge"] = f"ch_{uuid.uuid4().hex[:24]}"
+    send_webhook("payment_intent.succeeded", payment_intent)
+    return payment_intent, 200
+
+
+def send_webhook(event_type, payment_intent):
+    """Delivers a signed event in the background, retrying a few times like Stripe."""
+    url = config["webhookUrl"]
+    if not url:
+        return
+    payload = json.dumps({
+        "id": f"evt_{uuid.uuid4().hex[:24]}",
+        "object": "event",
+        "type": event_type,
+        "created": int(time.time()),
+        "livemode": False,
+        "data": {"object": dict(payment_intent)},
+    })
+
+    def deliver():
+        for attempt in range(4):
+            timestamp = int(time.time())
+            signature = hmac.new(
+                config["webhookSecret"].encode(), f"{timestamp}.{payload}".encode(), hashlib.sha256
+            ).hexdigest()
+            delivery = urllib.request.Request(
+                url, data=payload.encode(), method="POST",
+                headers={"Content-Type": "application/json", "Stripe-Signature": f"t={timestamp},v1={signature}"}
+            )
+            try:
+                with urllib.request.urlopen(delivery, timeout=10):
+                    count("webhooks")
+                    return
+            except Exception as e:
+                print(f"Webhook {event_type} to {url} failed: {e}")
+                time.sleep(2 ** attempt)
+        count("webhookFailures")
+
+    threading.Thread(target=deliver, daemon=True).start()
+
+
+###############################################################################
+# Stripe API
+###############################################################################
+@app.route("/v1/payment_intents", methods=["POST"])
+@idempotent
+def create_payment_intent():
+    form = request.form
+    if not form.get("amount") or not form.get("currency"):
+        return stripe_error(400, "invalid_request_error", "Missing required param: amount/currency.")
+    payment_intent = new_payment_intent(form)
+    with lock:
+        payment_intents[payment_intent["id"]] = payment_intent
+    token = form.get("payment_method_data[card][token]")
+    if token:
+        payment_intent["payment_method"] = f"pm_{uuid.uuid4().hex[:24]}"
+        payment_intent["status"] = "requires_confirmation"
+        with lock:
+            payment_tokens[payment_intent["id"]] = token
+    if form.get("confirm") == "true":
+        if not token:
+            return stripe_error(400, "invalid_request_error", "A payment method is required to confirm.")
+        return confirm(payment_intent, token)
+    return payment_intent, 200
+
+
+@app.route("/v1/payment_intents/<payment_intent_id>/confirm", methods=["POST"])
+@idempotent
+def confirm_payment_intent(payment_intent_id):
+    with lock:
+        payment_intent = payment_intents.get(payment_intent_id)
+        token = payment_tokens.get(payment_intent_id)
+    if payment_intent is None:
+        return stripe_error(404, "invalid_request_error", f"No such payment_intent: '{payment_intent_id}'", "resource_missing")
+    if payment_intent["status"] != "requires_confirmation" or not token:
+        return stripe_error(
+            400, "invalid_request_error",
+            f"This PaymentIntent's status is {payment_intent['status']} and cannot be confirmed.",
+            "payment_intent_unexpected_state"
+        )
+    return confirm(payment_intent, token)
+
+
+@app.route("/v1/payment_intents/<payment_intent_id>/cancel", methods=["POST"])
+@idempotent
+def cancel_payment_intent(payment_intent_id):
+    with lock:
+        payment_intent = payment_intents.get(payment_intent_id)
+    if payment_intent is None:
+        return stripe_error(404, "invalid_request_error", f"No such payment_intent: '{payment_intent_id}'", "resource_missing")
+    if payment_intent["status"] in ("succeeded", "canceled", "processing"):
+        return stripe_error(
+            400, "invalid_request_error",
+            f"This PaymentIntent's status is {payment_intent['status']} and cannot be canceled.",
+            "payment_intent_unexpected_state"
+        )
+    payment_intent["status"] = "canceled"
+    payment_intent["cancellation_reason"] = request.form.get("cancellation_reason")
+    send_webhook("payment_intent.canceled", payment_intent)
+    return payment_intent, 200
+
+
+@app.route("/v1/payment_intents/<payment_intent_id>", methods=["GET"])
+def get_payment_intent(payment_intent_id):
+    count("calls")
+    simulate_latency()
+    with lock:
+        payment_intent = payment_intents.get(payment_intent_id)
+    if payment_intent is None:
+        body, status_code = stripe_error(404, "invalid_request_error", f"No such payment_intent: '{payment_intent_id}'", "resource_missing")
+        return jsonify(body), status_code
+    return jsonify(payment_intent), 200
+
+
+@app.route("/v1/payment_methods", methods=["POST"])
+@idempotent
+def create_payment_method():
+    return {
+        "id": f"pm_{uuid.uuid4().hex[:24]}",
+        "object": "payment_method",
+        "type": request.form.get("type", "card"),
+        "card": {"brand": "visa", "last4": "4242"},
+    }, 200
+
+
+###############################################################################
+# Control endpoints for benchmarks
+###############################################################################
+@app.route("/_fake/config", methods=["GET", "POST"])
+def fake_config():
+    if request.method == "POST":
+        updates = request.get_json(silent=True) or {}
+        unknown = set(updates) - set(config)
+        if unknown:
+            return jsonify({"error": f"Unknown settings: {', '.join(sorted(unknown))}"}), 400
+        config.update(updates)
+        print(f"Fake Stripe config: {config}")
+    return jsonify(config), 200
+
+
+@app.route("/_fake/stats", methods=["GET", "DELETE"])
+def fake_stats():
+    with lock:
+        if request.method == "DELETE":
+            for stat in stats:
+                stats[stat] = 0
+        return jsonify(dict(stats)), 200
+
+
+if __name__ == "__main__":
+    app.run(host="0.0.0.0", port=int(os.environ.get("FAKE_STRIPE_PORT", 12111)), threaded=True)
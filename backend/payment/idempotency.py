@@ -0,0 +1,93 @@
+"""
+Local idempotency store for POST /payment.
+
+The first request for a key runs the charge; every later request with the
+same key gets the recorded outcome without another Stripe round trip.
+Duplicates that arrive while the first is still running wait for its
+outcome instead of charging in parallel.
+
+Only final outcomes (success, card declined) are recorded. When a charge
+fails for any other reason the key is released so a retry can run it
+again.
+
+This store is a per-process cache, not the guarantee. Every gunicorn
+worker and replica has its own, so a retry that lands on another worker
+misses it and calls Stripe again. What stops that call from charging
+twice is Stripe's idempotency key, derived from the same key and sent
+with every Stripe call (Stripe remembers keys for 24 hours). The cache
+only saves the Stripe round trip, and the parallel charge attempt, for
+duplicates that reach the same worker.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class IdempotencyConflict(Exception):
+    """The key was already used for a different request."""
+
+
+class _Entry:
+    def __init__(self, fingerprint):
+        self.fingerprint = fingerprint
+        self.done = threading.Event()
+        self.outcome = None
+        self.expires_at = None
+
+
+class IdempotencyStore:
+    def __init__(self, ttl_seconds: float = 86400, max_entries: int = 100000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def _evict(self, now: float):
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            expired = entry.expires_at is not None and entry.expires_at <= now
+            if not expired and len(self._entries) <= self.max_entries:
+                break
+            del self._entries[key]
+
+    def begin(self, key: str, fingerprint, wait_seconds: float = 30):
+        """
+        Returns the recorded outcome for key, or None when the caller now
+        owns the key and must call complete() or release().
+        Raises IdempotencyConflict if key was used with another fingerprint.
+        """
+        while True:
+            now = time.monotonic()
+            with self._lock:
+                self._evict(now)
+                entry = self._entries.get(key)
+                if entry is None or (entry.expires_at is not None and entry.expires_at <= now):
+                    self._entries[key] = _Entry(fingerprint)
+                    self._entries.move_to_end(key)
+                    return None
+                if entry.fingerprint != fingerprint:
+                    raise IdempotencyConflict(key)
+                if entry.done.is_set():
+                    return entry.outcome
+            # Another request is charging with this key: wait for its outcome
+            if not entry.done.wait(wait_seconds):
+                raise TimeoutError(f"Payment with idempotency key {key} is still in progress")
+            if entry.outcome is not None:
+                return entry.outcome
+            # It was released without an outcome; try to take the key
+
+    def complete(self, key: str, outcome):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            entry.outcome = outcome
+            entry.expires_at = time.monotonic() + self.ttl_seconds
+        entry.done.set()
+
+    def release(self, key: str):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        if entry is not None:
+            entry.done.set()
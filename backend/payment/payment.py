@@ -1,20 +1,122 @@
 import os
+import sys
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pika
 from flask import Flask, jsonify, request
 from flask_cors import CORS
 from dotenv import load_dotenv
 import stripe
+# Shared helpers in backend/ (copied next to this file in the Docker image)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import responses
+import http_client
+from idempotency import IdempotencyStore, IdempotencyConflict
+from timings import StageTimer, StageTimings
 
 #import key 
 
 
 load_dotenv()
 app = Flask(__name__)
+responses.init_app(app)
 CORS(app)
 
 # stripe.api_key = "pk_test_51R80VkFKfP7LOez7sDTq82hBlhj8mZFJRFcFmb2Y35saQ1FVMVUIOdfX8EzGEsDRYReFZ3CKzP7lFeONCQL2XldX00o7spgvVN"
 stripe.api_key = os.environ.get("STRIPE_API_KEY")
 if not stripe.api_key:
     raise ValueError("StripE secret key is missing! Please set STRIPE_API_KEY in your environment.")
+# Point at a Stripe stand-in for load tests, e.g. fake_stripe.py (http://localhost:12111)
+if os.environ.get("STRIPE_API_BASE"):
+    stripe.api_base = os.environ["STRIPE_API_BASE"]
+    print(f"Using Stripe API at {stripe.api_base}")
+
+# Stripe calls reuse keep-alive connections from the shared pool instead of
+# the library's default client; with idempotency keys on every call the
+# library's own network retries are safe
+STRIPE_TIMEOUT = float(os.environ.get("STRIPE_TIMEOUT", 10))
+stripe.default_http_client = stripe.RequestsClient(session=http_client.get_session(), timeout=STRIPE_TIMEOUT)
+stripe.max_network_retries = int(os.environ.get("STRIPE_MAX_NETWORK_RETRIES", 2))
+
+payment_timings = StageTimings()
+
+# How long a synchronous charge waits for a "processing" PaymentIntent to
+# settle (polling it) before answering 202
+PAYMENT_PROCESSING_WAIT = float(os.environ.get("PAYMENT_PROCESSING_WAIT", 2))
+PAYMENT_PROCESSING_POLL_INTERVAL = 0.5
+
+# Confirmation mode: "sync" confirms while the caller waits; "webhook" creates
+# the PaymentIntent, replies 202 and confirms in the background, with the
+# outcome (including 3DS) arriving on POST /payment/webhook. Callers can
+# choose per request with "confirmation" in the body.
+PAYMENT_CONFIRMATION = os.environ.get("PAYMENT_CONFIRMATION", "sync")
+STRIPE_WEBHOOK_SECRET = os.environ.get("STRIPE_WEBHOOK_SECRET")
+PAYMENT_CONFIRM_ATTEMPTS = int(os.environ.get("PAYMENT_CONFIRM_ATTEMPTS", 4))
+confirm_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("PAYMENT_CONFIRM_WORKERS", 8)), thread_name_prefix="confirm"
+)
+
+# RabbitMQ: webhook outcomes are published as <orderId>.payment on order_exchange
+RABBITMQ_HOST = os.environ.get("RABBITMQ_HOST", "localhost")
+EXCHANGE_NAME = 'order_exchange'
+connection = None
+channel = None
+publish_lock = threading.Lock()
+
+def setup_rabbitmq_connection():
+    global connection, channel
+    max_retries = 10
+    retry_delay = 3
+
+    for attempt in range(1, max_retries + 1):
+        try:
+            print(f"Attempt {attempt}: Connecting to RabbitMQ at {RABBITMQ_HOST}...")
+            connection = pika.BlockingConnection(pika.ConnectionParameters(host=RABBITMQ_HOST, port=5672))
+            channel = connection.channel()
+            print("Connected to RabbitMQ")
+            break
+        except pika.exceptions.AMQPConnectionError as e:
+            print(f"Connection failed: {e}")
+            if attempt < max_retries:
+                print("Retrying in 3 seconds...")
+                time.sleep(retry_delay)
+            else:
+                print("Failed to connect to RabbitMQ after multiple attempts.")
+
+def publish_message(routing_key: str, message: dict):
+    try:
+        with publish_lock:
+            if channel is None or channel.is_closed:
+                setup_rabbitmq_connection()
+            channel.basic_publish(
+                exchange=EXCHANGE_NAME,
+                routing_key=routing_key,
+                body=json.dumps(message),
+                properties=pika.BasicProperties(delivery_mode=2)
+            )
+        print(f"Published {routing_key}: {message}")
+        return True
+    except Exception as e:
+        print(f"Failed to publish {routing_key}: {e}")
+        return False
+
+# Outcomes of recent payments by idempotency key, so retries reaching this worker
+# are answered locally (a cache: Stripe's idempotency keys are the guarantee)
+idempotency_store = IdempotencyStore(ttl_seconds=int(os.environ.get("PAYMENT_IDEMPOTENCY_TTL", 86400)))
+
+def idempotency_key_for(data, token_id):
+    """
+    The caller's Idempotency-Key header, else one derived from the orderId,
+    else from the token (Stripe tokens can only be used once anyway).
+    """
+    key = request.headers.get("Idempotency-Key")
+    if key:
+        return key
+    if data.get("orderId"):
+        return f"order-{data['orderId']}"
+    return f"token-{token_id}"
 
 @app.route('/payment', methods=['POST'])
 def payment():
@@ -25,35 +127,259 @@ def payment():
     id = token.get("id")
     type = token.get("type")
 
+    idempotency_key = idempotency_key_for(data, id)
+    timer = StageTimer()
     try:
-    # Step 1: Create a PaymentMethod using the token
-        payment_method = stripe.PaymentMethod.create(
-            type=type,
-            card={"token": id}  #card is the parameter in the stripe.PaymentMethod function --> points to token id 
-        )
+        with timer.stage("idempotency"):
+            recorded = idempotency_store.begin(idempotency_key, (id, payment_amount))
+    except IdempotencyConflict:
+        return jsonify({
+            "code": 409,
+            "data": {"message": "Idempotency key was already used for a different payment", "status": "failed"}
+        }), 409
+    except TimeoutError as e:
+        return jsonify({"code": 409, "data": {"message": str(e), "status": "pending"}}), 409
+    if recorded is not None:
+        body, status_code = recorded
+        return jsonify(body), status_code, {"Idempotent-Replayed": "true", "Server-Timing": timer.server_timing()}
+
+    confirmation = data.get("confirmation", PAYMENT_CONFIRMATION)
+    if confirmation == "webhook" and not STRIPE_WEBHOOK_SECRET:
+        print("STRIPE_WEBHOOK_SECRET is not set; confirming synchronously")
+        confirmation = "sync"
+    try:
+        with timer.stage("stripe"):
+            if confirmation == "webhook":
+                body, status_code = create_for_webhook(id, type, payment_amount, idempotency_key, data.get("orderId"))
+            else:
+                body, status_code = charge(id, type, payment_amount, idempotency_key, data.get("orderId"))
+    except Exception:
+        idempotency_store.release(idempotency_key)
+        raise
+    if status_code in (200, 400):
+        # Final outcomes only; anything else may be retried
+        idempotency_store.complete(idempotency_key, (body, status_code))
+    else:
+        idempotency_store.release(idempotency_key)
+    payment_timings.record(timer)
+    return jsonify(body), status_code, {"Server-Timing": timer.server_timing()}
 
-        # Step 2: Create a PaymentIntent with the created PaymentMethod
+@app.route('/payment/metrics', methods=['GET'])
+def payment_metrics():
+    """Recent latency per stage of POST /payment (count, p50/p95/p99/max in ms)."""
+    return jsonify(payment_timings.summary()), 200
+
+def project_payment_intent(payment_intent):
+    """The fields callers use, instead of the whole PaymentIntent object."""
+    return {
+        "id": payment_intent["id"],
+        "status": payment_intent["status"],
+        "amount": payment_intent["amount"],
+        "currency": payment_intent["currency"],
+        "latestCharge": payment_intent["latest_charge"] if "latest_charge" in payment_intent else None
+    }
+
+def wait_while_processing(payment_intent):
+    """
+    Polls a "processing" PaymentIntent for up to PAYMENT_PROCESSING_WAIT
+    seconds. Replaying the create call would not help: Stripe answers a
+    repeated idempotency key with the first response.
+    """
+    deadline = time.monotonic() + PAYMENT_PROCESSING_WAIT
+    while payment_intent["status"] == "processing" and time.monotonic() < deadline:
+        time.sleep(PAYMENT_PROCESSING_POLL_INTERVAL)
+        payment_intent = stripe.PaymentIntent.retrieve(payment_intent["id"])
+    return payment_intent
+
+def charge(id, type, payment_amount, idempotency_key, order_id=None):
+    """
+    Charges the token with Stripe in one round trip: the PaymentIntent is
+    created with the card token as payment_method_data and confirmed in the
+    same call. Returns (response body, status code).
+    """
+    try:
         payment_intent = stripe.PaymentIntent.create(
-            amount=int(payment_amount * 100),  # Convert to cents
+            amount=int(round(payment_amount * 100)),  # Convert to cents
             currency="sgd",
-            payment_method=payment_method.id,  # Use the created PaymentMethod ID
+            payment_method_data={"type": type, "card": {"token": id}},
             confirm=True, # Confirm the payment immediately
-            automatic_payment_methods={"enabled": True, "allow_redirects": "never"}
+            automatic_payment_methods={"enabled": True, "allow_redirects": "never"},
+            metadata={"orderId": order_id or "", "idempotencyKey": idempotency_key},
+            idempotency_key=f"{idempotency_key}-charge"
         )
-        print(payment_intent)
+        projection = project_payment_intent(wait_while_processing(payment_intent))
+        print(f"PaymentIntent {projection['id']} for {idempotency_key}: {projection['status']}")
+        if projection["status"] == "processing":
+            # Still not final; a retry with the same key polls the PaymentIntent again
+            return {
+                "code": 202,
+                "data": {"message": "Payment processing", "status": "pending", "paymentIntent": projection}
+            }, 202
+        if projection["status"] != "succeeded":
+            return {
+                "code": 400,
+                "data": {"message": f"Payment {projection['status']}", "status": "failed", "paymentIntent": projection}
+            }, 400
         # Return a success response
-        return jsonify({
+        return {
             "code": 200,
-            "data": {"message": "Payment successful", "status": "success", "paymentIntent": payment_intent}
-        }), 200
+            "data": {"message": "Payment successful", "status": "success", "paymentIntent": projection}
+        }, 200
 
     except stripe.error.CardError as e:
         # Handle card error (e.g., insufficient funds, etc.)
-        return jsonify({
+        return {
             "code": 400,
             "data": {"message": f'{e}', "status": "failed"}
-        }), 400
+        }, 400
+
+    except stripe.error.IdempotencyError as e:
+        return {
+            "code": 409,
+            "data": {"message": f'{e}', "status": "failed"}
+        }, 409
+
+    except stripe.error.StripeError as e:
+        # Network or API error: the outcome is unknown, the caller may retry with the same key
+        print(f"Stripe error for {idempotency_key}: {e}")
+        return {
+            "code": 502,
+            "data": {"message": f'{e}', "status": "pending"}
+        }, 502
         
+###############################################################################
+# Webhook confirmation mode
+###############################################################################
+def create_for_webhook(id, type, payment_amount, idempotency_key, order_id):
+    """
+    Creates the PaymentIntent without confirming it and hands confirmation
+    to the background pool. Returns 202/pending straight away; the outcome
+    is published from the webhook. The clientSecret lets the customer's
+    browser complete 3D Secure when Stripe asks for it.
+    """
+    try:
+        payment_intent = stripe.PaymentIntent.create(
+            amount=int(round(payment_amount * 100)),  # Convert to cents
+            currency="sgd",
+            payment_method_data={"type": type, "card": {"token": id}},
+            automatic_payment_methods={"enabled": True, "allow_redirects": "never"},
+            metadata={"orderId": order_id or "", "idempotencyKey": idempotency_key},
+            idempotency_key=f"{idempotency_key}-intent"
+        )
+    except stripe.error.IdempotencyError as e:
+        return {"code": 409, "data": {"message": f'{e}', "status": "failed"}}, 409
+    except stripe.error.StripeError as e:
+        print(f"Stripe error for {idempotency_key}: {e}")
+        return {"code": 502, "data": {"message": f'{e}', "status": "pending"}}, 502
+
+    projection = project_payment_intent(payment_intent)
+    confirm_executor.submit(confirm_payment_intent, projection["id"], idempotency_key, order_id)
+    return {
+        "code": 202,
+        "data": {
+            "message": "Payment submitted",
+            "status": "pending",
+            "paymentIntent": projection,
+            "clientSecret": payment_intent["client_secret"]
+        }
+    }, 202
+
+def confirm_payment_intent(payment_intent_id, idempotency_key, order_id):
+    """
+    Confirms in the background, retrying errors with the same key (Stripe
+    does not store failed requests). If it never goes through the intent is
+    cancelled and payment.failed published, so the order does not wait for
+    a webhook that will not come.
+    """
+    error = None
+    for attempt in range(1, PAYMENT_CONFIRM_ATTEMPTS + 1):
+        try:
+            stripe.PaymentIntent.confirm(payment_intent_id, idempotency_key=f"{idempotency_key}-confirm")
+            return
+        except stripe.error.CardError as e:
+            # The payment_intent.payment_failed webhook carries the outcome
+            print(f"PaymentIntent {payment_intent_id} declined: {e}")
+            return
+        except Exception as e:
+            error = e
+            print(f"Attempt {attempt}: failed to confirm PaymentIntent {payment_intent_id}: {e}")
+            if attempt < PAYMENT_CONFIRM_ATTEMPTS:
+                time.sleep(2 ** (attempt - 1))
+    fail_payment_intent(payment_intent_id, idempotency_key, order_id, f"Could not confirm payment: {error}")
+
+def fail_payment_intent(payment_intent_id, idempotency_key, order_id, reason):
+    payment_intent = None
+    try:
+        payment_intent = stripe.PaymentIntent.retrieve(payment_intent_id)
+        if payment_intent["status"] in ("succeeded", "processing", "requires_action"):
+            # A confirm went through after all; its webhook carries the outcome
+            return
+        payment_intent = stripe.PaymentIntent.cancel(payment_intent_id, idempotency_key=f"{idempotency_key}-cancel")
+    except Exception as e:
+        print(f"Failed to cancel PaymentIntent {payment_intent_id}: {e}")
+    if not order_id:
+        return
+    message = {
+        "type": "payment.failed",
+        "orderId": order_id,
+        "eventId": f"confirm-failed-{payment_intent_id}",
+        "paymentIntent": project_payment_intent(payment_intent) if payment_intent is not None else {"id": payment_intent_id},
+        "timestamp": time.time(),
+        "reason": reason
+    }
+    if not publish_message(f"{order_id}.payment", message):
+        # ordermgt's pending order sweeper fails the order eventually
+        print(f"Could not publish payment.failed for order {order_id}")
+
+# Stripe event type -> event published to Order Management
+WEBHOOK_EVENTS = {
+    "payment_intent.succeeded": "payment.succeeded",
+    "payment_intent.payment_failed": "payment.failed",
+    "payment_intent.canceled": "payment.failed",
+    "payment_intent.requires_action": "payment.requires_action",
+}
+
+@app.route('/payment/webhook', methods=['POST'])
+def stripe_webhook():
+    """
+    Stripe webhook: verifies the signature and publishes PaymentIntent
+    outcomes as <orderId>.payment on order_exchange. Replies 500 when the
+    event could not be published, so Stripe delivers it again.
+    """
+    if not STRIPE_WEBHOOK_SECRET:
+        return jsonify({"error": "Webhooks are not configured"}), 404
+    try:
+        event = stripe.Webhook.construct_event(
+            request.get_data(), request.headers.get("Stripe-Signature", ""), STRIPE_WEBHOOK_SECRET
+        )
+    except (ValueError, stripe.error.SignatureVerificationError) as e:
+        print(f"Rejected webhook: {e}")
+        return jsonify({"error": "Invalid webhook"}), 400
+
+    event_type = WEBHOOK_EVENTS.get(event["type"])
+    payment_intent = event["data"]["object"]
+    metadata = payment_intent["metadata"] if "metadata" in payment_intent else {}
+    order_id = metadata["orderId"] if "orderId" in metadata else None
+    if event_type is None or not order_id:
+        return jsonify({"received": True}), 200
+
+    message = {
+        "type": event_type,
+        "orderId": order_id,
+        "eventId": event["id"],
+        "paymentIntent": project_payment_intent(payment_intent),
+        "timestamp": time.time()
+    }
+    if event_type == "payment.requires_action":
+        # Lets the customer's browser run 3D Secure (stripe.handleNextAction)
+        message["clientSecret"] = payment_intent["client_secret"]
+    if "last_payment_error" in payment_intent and payment_intent["last_payment_error"]:
+        error = payment_intent["last_payment_error"]
+        message["reason"] = error["message"] if "message" in error else None
+    if not publish_message(f"{order_id}.payment", message):
+        return jsonify({"error": "Could not publish payment event"}), 500
+    return jsonify({"received": True}), 200
+
 if __name__ == "__main__":
     #change port for full testing if needed
-    app.run(debug=True, port=5002, host='0.0.0.0')
\ No newline at end of file
+    app.run(debug=os.environ.get("FLASK_DEBUG") == "1", port=5002, host='0.0.0.0')
\ No newline at end of file
@@ -0,0 +1,59 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from idempotency import IdempotencyConflict, IdempotencyStore  # noqa: E402
+
+
+def test_replay_returns_the_recorded_outcome():
+    store = IdempotencyStore()
+    assert store.begin("k", ("tok", 5.0)) is None
+    store.complete("k", ({"status": "success"}, 200))
+    assert store.begin("k", ("tok", 5.0)) == ({"status": "success"}, 200)
+
+
+def test_same_key_with_another_body_conflicts():
+    store = IdempotencyStore()
+    store.begin("k", ("tok", 5.0))
+    store.complete("k", ({"status": "success"}, 200))
+    with pytest.raises(IdempotencyConflict):
+        store.begin("k", ("tok", 6.0))
+
+
+def test_released_key_can_be_run_again():
+    store = IdempotencyStore()
+    store.begin("k", ("tok", 5.0))
+    store.release("k")
+    assert store.begin("k", ("tok", 5.0)) is None
+
+
+def test_duplicate_in_flight_waits_for_the_outcome():
+    store = IdempotencyStore()
+    store.begin("k", ("tok", 5.0))
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(store.begin("k", ("tok", 5.0))))
+    waiter.start()
+    time.sleep(0.02)
+    store.complete("k", ({"status": "success"}, 200))
+    waiter.join()
+    assert results == [({"status": "success"}, 200)]
+
+
+def test_duplicate_in_flight_times_out():
+    store = IdempotencyStore()
+    store.begin("k", ("tok", 5.0))
+    with pytest.raises(TimeoutError):
+        store.begin("k", ("tok", 5.0), wait_seconds=0.01)
+
+
+def test_outcomes_expire():
+    store = IdempotencyStore(ttl_seconds=0.01)
+    store.begin("k", ("tok", 5.0))
+    store.complete("k", ({"status": "success"}, 200))
+    time.sleep(0.02)
+    assert store.begin("k", ("tok", 6.0)) is None
@@ -0,0 +1,64 @@
+"""
+Per-stage latency of POST /payment ("idempotency" and "stripe").
+
+Keeps the last window_size samples of each stage in memory and reports
+count and percentiles for GET /payment/metrics. Each response also carries
+its own stage times in a Server-Timing header.
+"""
+
+import threading
+import time
+from collections import deque
+
+
+class StageTimer:
+    """Times the stages of one request."""
+
+    def __init__(self):
+        self.stages = {}
+
+    def stage(self, name):
+        timer = self
+
+        class _Stage:
+            def __enter__(self):
+                self.start = time.perf_counter()
+
+            def __exit__(self, *exc):
+                timer.stages[name] = time.perf_counter() - self.start
+
+        return _Stage()
+
+    def server_timing(self) -> str:
+        return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.stages.items())
+
+
+class StageTimings:
+    def __init__(self, window_size: int = 2048):
+        self.window_size = window_size
+        self._lock = threading.Lock()
+        self._samples = {}
+        self._counts = {}
+
+    def record(self, timer: StageTimer):
+        with self._lock:
+            for name, seconds in timer.stages.items():
+                self._samples.setdefault(name, deque(maxlen=self.window_size)).append(seconds)
+                self._counts[name] = self._counts.get(name, 0) + 1
+
+    def summary(self) -> dict:
+        with self._lock:
+            samples = {name: sorted(values) for name, values in self._samples.items()}
+            counts = dict(self._counts)
+        result = {}
+        for name, values in samples.items():
+            def percentile(p):
+                return round(values[min(len(values) - 1, int(p * len(values)))] * 1000, 1)
+            result[name] = {
+                "count": counts[name],
+                "p50Ms": percentile(0.50),
+                "p95Ms": percentile(0.95),
+                "p99Ms": percentile(0.99),
+                "maxMs": round(values[-1] * 1000, 1),
+            }
+        return result
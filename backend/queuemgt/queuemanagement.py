@@ -1,18 +1,25 @@
-import os, pika, json, time
+import os, sys, pika, json, time
 import threading
 import pytz
 from dotenv import load_dotenv
-from flask import Flask, jsonify, abort
+from flask import Flask, jsonify, abort, request
 from google.cloud import firestore
+from google.cloud.firestore_v1.field_path import FieldPath
 from google.oauth2 import service_account
 from apscheduler.schedulers.background import BackgroundScheduler
 from flask_socketio import SocketIO, emit, join_room, leave_room
 from flask_cors import CORS
+# Shared helpers in backend/ (copied next to this file in the Docker image)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import responses
+import service_runner
+import order_ids
 
 # Load environment variables (if using a .env file)
 load_dotenv()
 
 app = Flask(__name__)
+responses.init_app(app)
 CORS(app, resources={r"/*": {"origins": "*"}})
 
 # Retrieve environment variables for credentials and project
@@ -150,6 +157,7 @@ def start_rabbitmq_consumer():
     print(f"Listening for orders on queue: {QUEUE_NAME}")
 
     channel.basic_consume(queue=QUEUE_NAME, on_message_callback=process_order, auto_ack=True)
+    service_runner.stop_consuming_on_shutdown(connection, channel)
 
     try:
         channel.start_consuming()
@@ -246,6 +254,20 @@ def is_order_completed(order_data):
     return True
 
 
+def stream_orders(orders_ref):
+    """
+    Streams a stall's orders oldest first. Order IDs are time-ordered (see
+    order_ids.py), so ?after=<orderId>&limit=<n> pages through them by key.
+    """
+    query = orders_ref.order_by(FieldPath.document_id())
+    after = request.args.get("after")
+    if after:
+        query = query.start_after({FieldPath.document_id(): after})
+    limit = request.args.get("limit", type=int)
+    if limit:
+        query = query.limit(limit)
+    return query.stream()
+
 ######GET - Scenario 2: Hawker UI pulls complete order list######
 @app.route('/<hawkerCenter>/<hawkerStall>/orders', methods=['GET'])
 def get_all_orders(hawkerCenter, hawkerStall):
@@ -257,7 +279,7 @@ def get_all_orders(hawkerCenter, hawkerStall):
             abort(404, description="Hawker stall not found.")
 
         orders_ref = doc_ref.collection("orders")
-        orders = orders_ref.stream()
+        orders = stream_orders(orders_ref)
         
         result = {}
 
@@ -280,7 +302,7 @@ def get_completed_orders(hawkerCenter, hawkerStall):
             abort(404, description="Hawker stall not found.")
 
         orders_ref = doc_ref.collection("orders")
-        orders = orders_ref.stream()
+        orders = stream_orders(orders_ref)
         
         completed_orders = {}
 
@@ -306,7 +328,7 @@ def get_pending_orders(hawkerCenter, hawkerStall):
             abort(404, description="Hawker stall not found.")
 
         orders_ref = doc_ref.collection("orders")
-        orders = orders_ref.stream()
+        orders = stream_orders(orders_ref)
         
         pending_orders = {}
 
@@ -367,6 +389,14 @@ def complete_dish(hawkerCenter, hawkerStall, orderId, dishName):
             f"{dishName}.time_completed": firestore.SERVER_TIMESTAMP
         }
         order_ref.update(updates)
+        publish_message(f"{orderId}.status", {
+            "type": "dish.completed",
+            "orderId": orderId,
+            "userId": userId,
+            "stallName": hawkerStall,
+            "dishName": dishName,
+            "timestamp": time.time()
+        })
 
         dish_price= dish_data.get("price")
         if dish_price is None:
@@ -423,6 +453,13 @@ def complete_dish(hawkerCenter, hawkerStall, orderId, dishName):
             }
             publish_message(f"{orderId}.notif", notif_data)
             publish_message(f"{orderId}.log", log_data)
+            publish_message(f"{orderId}.status", {
+                "type": "stall.ready",
+                "orderId": orderId,
+                "userId": userId,
+                "stallName": hawkerStall,
+                "timestamp": time.time()
+            })
 
             # Emit WebSocket message to inform user to collect order
             print("User ID to emit to:", userId)
@@ -451,43 +488,90 @@ def complete_dish(hawkerCenter, hawkerStall, orderId, dishName):
 ###############################################################################
 #deleting the orders from the db after 24hours
 ###############################################################################
+# Orders issued more than ORDER_RETENTION_HOURS before the purge starts are deleted
+ORDER_RETENTION_HOURS = float(os.environ.get("ORDER_RETENTION_HOURS", 0))
+PURGE_BATCH_SIZE = 400
+
 def delete_orders_and_reset_wait_time():
-    # Function to recursively delete orders and reset wait times
-    def process_collection(collection_ref):
-        # Stream all documents in the current collection
-        documents = collection_ref.stream()
-        for document in documents:
-            # Attempt to get the 'orders' subcollection
-            orders_subcollection = document.reference.collection('orders')
-            orders = orders_subcollection.stream()
-            has_orders = False
-            
-            # Delete each order in the 'orders' subcollection
-            for order in orders:
-                has_orders = True
-                print(f"Deleting order {order.id} from {document.id} in collection '{collection_ref.id}'")
-                order.reference.delete()
-            
+    """
+    Deletes every stall's orders issued before the cutoff. Order IDs are
+    time-ordered, so the old orders are the key range below
+    order_id_floor(cutoff) and orders placed while the purge runs are kept.
+    Documents with other IDs (legacy order_<unix ms> IDs, which sort above
+    every current ID) are found by a second pass over the range above
+    order_id_floor(now + MAX_CLOCK_SKEW_SECONDS).
+    """
+    cutoff = time.time() - ORDER_RETENTION_HOURS * 3600
+    cutoff_id = order_ids.order_id_floor(cutoff)
+    foreign_floor_id = order_ids.order_id_floor(time.time() + order_ids.MAX_CLOCK_SKEW_SECONDS)
+
+    def is_expired_foreign(order_id):
+        if order_ids.is_order_id(order_id):
+            return False
+        legacy_time = order_ids.legacy_order_time(order_id)
+        # Unrecognised IDs are deleted, as every order was before retention existed
+        return legacy_time is None or legacy_time < cutoff
+
+    def purge_foreign_orders(orders_ref):
+        deleted = 0
+        batch = db.batch()
+        pending = 0
+        foreign_orders = (
+            orders_ref
+                .where(filter=firestore.FieldFilter(FieldPath.document_id(), ">=", orders_ref.document(foreign_floor_id)))
+                .select([FieldPath.document_id()])
+        )
+        for order in foreign_orders.stream():
+            if not is_expired_foreign(order.id):
+                continue
+            batch.delete(order.reference)
+            pending += 1
+            if pending == PURGE_BATCH_SIZE:
+                batch.commit()
+                deleted += pending
+                batch, pending = db.batch(), 0
+        if pending:
+            batch.commit()
+            deleted += pending
+        return deleted
+
+    def purge_orders(orders_ref):
+        deleted = 0
+        old_orders = (
+            orders_ref
+                .where(filter=firestore.FieldFilter(FieldPath.document_id(), "<", orders_ref.document(cutoff_id)))
+                .select([FieldPath.document_id()])  # Document references only
+        )
+        while True:
+            batch = db.batch()
+            page = list(old_orders.limit(PURGE_BATCH_SIZE).stream())
+            for order in page:
+                batch.delete(order.reference)
+            if page:
+                batch.commit()
+                deleted += len(page)
+            if len(page) < PURGE_BATCH_SIZE:
+                return deleted
+
+    # Root collections are hawker centres, their documents are stalls
+    for hawker_collection in db.collections():
+        for stall_ref in hawker_collection.list_documents():
+            orders_ref = stall_ref.collection('orders')
+            deleted = purge_orders(orders_ref) + purge_foreign_orders(orders_ref)
             # If there were orders, reset the estimatedWaitTime
-            if has_orders:
-                document.reference.update({'estimatedWaitTime': 0})
-                document.reference.update({'totalEarned': 0})
-                print(f"Reset estimatedWaitTime & totalEarned to 0 for {document.id} in collection '{collection_ref.id}'")
-            
-            # Recursively process all subcollections
-            subcollections = document.reference.collections()
-            for subcollection in subcollections:
-                process_collection(subcollection)
-
-    # Retrieve all root-level collections and process each
-    root_collections = db.collections()
-    for root_collection in root_collections:
-        process_collection(root_collection)
+            if deleted:
+                stall_ref.update({'estimatedWaitTime': 0, 'totalEarned': 0})
+                print(f"Deleted {deleted} orders and reset estimatedWaitTime & totalEarned for {stall_ref.id} in collection '{hawker_collection.id}'")
 
 scheduler = BackgroundScheduler()
 # Schedule the function to run daily at 3 AM
 scheduler.add_job(delete_orders_and_reset_wait_time, 'cron', hour=3, minute=0, second=0, timezone=pytz.timezone('Asia/Singapore'))
-scheduler.start()
+
+def start_scheduler():
+    # Started by one process only (__main__ or the consumer role), not by
+    # every web worker, so the daily purge runs once
+    if not scheduler.running:
+        scheduler.start()
 
 def safe_start():
     try:
@@ -499,7 +583,10 @@ def safe_start():
     except Exception as e:
         print(f"RabbitMQ consumer crashed: {e}")
 
+# service_runner consumer role: python service_runner.py consumer queuemanagement:safe_start
+
 if __name__ == '__main__':
+    start_scheduler()
     threading.Thread(target=safe_start, daemon=True).start()
     app.run(host='0.0.0.0', port=5000, debug=False, use_reloader=False)
 
@@ -101,4 +101,72 @@ create_queue(
     exchange_name=order_exchange_name, #order_exchange
     queue_name="O_queue",
     routing_key="*.queue",
-)
\ No newline at end of file
+)
+
+#Order Status (fed by both services, consumed by Order Management)
+create_queue(
+    channel=order_channel,
+    exchange_name=order_exchange_name, #order_exchange
+    queue_name="O_status",
+    routing_key="*.status",
+)
+
+create_queue(
+    channel=queue_channel,
+    exchange_name=queue_exchange_name, #queue_exchange
+    queue_name="O_status",
+    routing_key="*.status",
+)
+
+#Payment outcomes (published by Payment from Stripe webhooks, consumed by Order Management)
+create_queue(
+    channel=order_channel,
+    exchange_name=order_exchange_name, #order_exchange
+    queue_name="O_payment",
+    routing_key="*.payment",
+)
+
+#Notification retries: failed sends wait in <queue>.retry.<delay>s (message TTL)
+#and are dead-lettered back to <queue>; after the last delay they go to <queue>.dlq
+#(drained with notification/replay_dlq.py). Delays must match the notification service.
+notification_retry_exchange_name = "notification_retry_exchange"
+notification_retry_delays = [int(delay) for delay in os.environ.get("NOTIFICATION_RETRY_DELAYS", "5,30,120,600").split(",")]
+
+def create_retry_queues(channel, exchange_name, queue_name, delays):
+    # <queue> is also reachable by its own name, for messages coming back from retry
+    channel.queue_bind(exchange=exchange_name, queue=queue_name, routing_key=queue_name)
+    for delay in delays:
+        retry_queue_name = f"{queue_name}.retry.{delay}s"
+        print(f"Bind to queue: {retry_queue_name}")
+        channel.queue_declare(
+            queue=retry_queue_name,
+            durable=True,
+            arguments={
+                "x-message-ttl": delay * 1000,
+                "x-dead-letter-exchange": exchange_name,
+                "x-dead-letter-routing-key": queue_name,
+            },
+        )
+        channel.queue_bind(exchange=exchange_name, queue=retry_queue_name, routing_key=retry_queue_name)
+    create_queue(channel=channel, exchange_name=exchange_name, queue_name=f"{queue_name}.dlq", routing_key=f"{queue_name}.dlq")
+
+retry_channel = create_exchange(
+    hostname=amqp_host,
+    port=amqp_port,
+    exchange_name=notification_retry_exchange_name, #notification_retry_exchange
+    exchange_type="direct",
+)
+
+create_retry_queues(
+    channel=retry_channel,
+    exchange_name=notification_retry_exchange_name, #notification_retry_exchange
+    queue_name="Q_notif",
+    delays=notification_retry_delays,
+)
+
+create_retry_queues(
+    channel=retry_channel,
+    exchange_name=notification_retry_exchange_name, #notification_retry_exchange
+    queue_name="O_notif",
+    delays=notification_retry_delays,
+)
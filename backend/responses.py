@@ -0,0 +1,148 @@
+"""
+Shared response layer for the HawkerFlow Flask services.
+
+    from responses import init_app
+    init_app(app)
+
+- Swaps Flask's JSON provider for orjson, so every existing jsonify() call
+  gets the fast encoder without touching the routes. Firestore timestamps
+  (DatetimeWithNanoseconds) are emitted as RFC 3339 strings by the encoder
+  itself, so routes no longer need isoformat() loops.
+- Compresses responses above a size threshold with brotli or gzip, whichever
+  the client prefers in Accept-Encoding. compress_body() does the same for
+  apps that are not Flask (the menu service's Quart mode).
+
+orjson and brotli are optional: without orjson the standard library encoder
+is used, without brotli only gzip is offered.
+"""
+import datetime
+import decimal
+import gzip
+import json
+import uuid
+
+from flask import request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Responses smaller than this are sent uncompressed (the headers cost more than they save)
+COMPRESS_MIN_SIZE = 1024
+COMPRESSIBLE_MIMETYPES = {"application/json", "text/html", "text/plain", "text/css", "application/javascript"}
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5  # Quality 11 is for static assets; 4-6 is the usual on-the-fly trade-off
+
+
+def _default(obj):
+    """Types orjson does not encode natively (it only accepts exact datetime
+    instances, so Firestore's datetime subclass lands here)."""
+    if isinstance(obj, datetime.datetime):
+        rfc3339 = getattr(obj, "rfc3339", None)  # DatetimeWithNanoseconds keeps its nanoseconds
+        return rfc3339() if rfc3339 else datetime.datetime.isoformat(obj)
+    if isinstance(obj, datetime.date):
+        return obj.isoformat()
+    if isinstance(obj, decimal.Decimal):
+        return str(obj)
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson (falls back to the default provider)."""
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None:
+            kwargs.setdefault("default", _default)
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        if orjson is None:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        if orjson is None:
+            return super().response(obj)
+        # Skip the bytes -> str -> bytes round trip of dumps()
+        body = orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+def dumps_bytes(obj) -> bytes:
+    """Encodes obj to UTF-8 JSON bytes with the same rules as the responses
+    (for AMQP payloads and anything else outside a request)."""
+    if orjson is None:
+        return json.dumps(obj, default=_default).encode("utf-8")
+    return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+def _choose_encoding(accepted):
+    candidates = []
+    if brotli is not None and accepted.quality("br") > 0:
+        candidates.append((accepted.quality("br"), 1, "br"))
+    if accepted.quality("gzip") > 0:
+        candidates.append((accepted.quality("gzip"), 0, "gzip"))
+    if not candidates:
+        return None
+    # Highest q-value wins; brotli breaks ties
+    return max(candidates)[2]
+
+
+def compress_response(response, min_size: int = COMPRESS_MIN_SIZE):
+    if (
+        response.direct_passthrough
+        or response.is_streamed
+        or response.status_code < 200
+        or response.status_code in (204, 206, 304)
+        or "Content-Encoding" in response.headers
+        or response.mimetype not in COMPRESSIBLE_MIMETYPES
+    ):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    compressed, encoding = compress_body(response.get_data(), request.accept_encodings, min_size)
+    if encoding is None:
+        return response
+
+    response.set_data(compressed)
+    response.headers["Content-Encoding"] = encoding
+    response.headers["Content-Length"] = str(len(compressed))
+    return response
+
+
+def compress_body(body: bytes, accepted, min_size: int = COMPRESS_MIN_SIZE):
+    """
+    Returns (body, Content-Encoding or None) for a body the client sent
+    `accepted` (a werkzeug Accept-Encoding, e.g. request.accept_encodings).
+    """
+    if len(body) < min_size:
+        return body, None
+    encoding = _choose_encoding(accepted)
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY), encoding
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_LEVEL), encoding
+    return body, None
+
+
+def init_app(app, compress_min_size: int = COMPRESS_MIN_SIZE):
+    app.json = FastJSONProvider(app)
+
+    @app.after_request
+    def _compress(response):
+        return compress_response(response, compress_min_size)
+
+    return app
@@ -0,0 +1,220 @@
+"""
+Production runner shared by the HawkerFlow services.
+
+HTTP and AMQP consumers run as separate roles, so each can be scaled on
+its own (and a multi-worker web server never starts extra consumers):
+
+    # HTTP: gunicorn with WEB_WORKERS worker processes
+    python service_runner.py web queuemanagement:app --port 5000 \\
+        --warmup queuemanagement:setup_rabbitmq_connection
+
+    # Consumers: CONSUMER_PROCESSES supervised processes running the target
+    python service_runner.py consumer activity:run_consumer --processes 2
+
+- web: gunicorn drains in-flight requests on SIGTERM (up to
+  GRACEFUL_TIMEOUT seconds). --preload imports the app once in the master;
+  leave it off for apps that open gRPC/Firestore clients at import time,
+  which must not be shared across fork.
+- consumer: every process imports the target itself, runs the --warmup
+  hooks and calls the target, which is expected to block while consuming.
+  Processes that exit are restarted with backoff. On SIGTERM the runner
+  calls the stop callbacks registered with on_shutdown() in each process
+  (stop_consuming_on_shutdown() for pika consumers), so the current
+  message is finished and acked before the process exits.
+- --warmup hooks (module:function, repeatable) run once per worker process
+  before it takes traffic: connecting to RabbitMQ, priming caches, etc.
+- Every web worker gets WEB_WORKER_INDEX, the lowest index (from 0) no
+  live worker holds, so it is stable across worker restarts (order_ids.py
+  uses it for its node).
+"""
+import argparse
+import importlib
+import multiprocessing
+import os
+import signal
+import sys
+import time
+
+GRACEFUL_TIMEOUT = int(os.environ.get("GRACEFUL_TIMEOUT", 30))
+
+_shutdown_callbacks = []
+
+
+def import_target(target: str):
+    """Resolves "module:attribute"."""
+    module_name, _, attribute = target.partition(":")
+    if not attribute:
+        raise ValueError(f"Expected module:attribute, got '{target}'")
+    return getattr(importlib.import_module(module_name), attribute)
+
+
+def run_warmups(warmups):
+    for warmup in warmups or []:
+        print(f"[{os.getpid()}] Running warm-up {warmup}")
+        import_target(warmup)()
+
+
+###############################################################################
+# Graceful shutdown hooks (used by consumers)
+###############################################################################
+def on_shutdown(callback):
+    """Registers callback to run when this process is asked to stop."""
+    _shutdown_callbacks.append(callback)
+
+
+def stop_consuming_on_shutdown(connection, channel):
+    """Makes start_consuming() return after the message being processed."""
+    # pika connections are not thread/signal safe; this is the one call that is
+    on_shutdown(lambda: connection.add_callback_threadsafe(channel.stop_consuming))
+
+
+def _handle_stop(signum, frame):
+    if not _shutdown_callbacks:
+        sys.exit(0)
+    callbacks = list(_shutdown_callbacks)
+    _shutdown_callbacks.clear()
+    # A second signal exits immediately
+    on_shutdown(lambda: os._exit(1))
+    for callback in callbacks:
+        try:
+            callback()
+        except Exception as e:
+            print(f"[{os.getpid()}] Shutdown callback failed: {e}")
+
+
+###############################################################################
+# web role
+###############################################################################
+def run_web(args):
+    from gunicorn.app.base import BaseApplication
+
+    warmups = args.warmup
+
+    def pre_fork(server, worker):
+        # Runs in the master just before the fork, so the child inherits it
+        taken = {getattr(w, "worker_index", None) for w in server.WORKERS.values()}
+        worker.worker_index = next(i for i in range(len(taken) + 1) if i not in taken)
+        os.environ["WEB_WORKER_INDEX"] = str(worker.worker_index)
+
+    def post_worker_init(worker):
+        run_warmups(warmups)
+
+    options = {
+        "bind": f"{args.host}:{args.port}",
+        "workers": args.workers,
+        "worker_class": args.worker_class,
+        "threads": args.threads,
+        "timeout": args.timeout,
+        "graceful_timeout": GRACEFUL_TIMEOUT,
+        "preload_app": args.preload,
+        "pre_fork": pre_fork,
+        "post_worker_init": post_worker_init,
+        "accesslog": "-",
+    }
+
+    class WebApplication(BaseApplication):
+        def load_config(self):
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return import_target(args.target)
+
+    WebApplication().run()
+
+
+###############################################################################
+# consumer role
+###############################################################################
+def _consumer_main(target, warmups):
+    # The service registers its callbacks on the importable module, which is
+    # not this one when the runner was started as a script
+    runner = importlib.import_module("service_runner")
+    signal.signal(signal.SIGTERM, runner._handle_stop)
+    signal.signal(signal.SIGINT, runner._handle_stop)
+    consume = import_target(target)
+    run_warmups(warmups)
+    print(f"[{os.getpid()}] Consumer {target} started")
+    consume()
+    print(f"[{os.getpid()}] Consumer {target} stopped")
+
+
+def run_consumers(args):
+    context = multiprocessing.get_context("spawn")
+    stopping = False
+    processes = {}
+    restarts = {}
+
+    def start(slot):
+        process = context.Process(target=_consumer_main, args=(args.target, args.warmup), name=f"consumer-{slot}")
+        process.start()
+        processes[slot] = process
+
+    def stop(signum, frame):
+        nonlocal stopping
+        if stopping:
+            return
+        stopping = True
+        print(f"Stopping {len(processes)} consumer process(es)...")
+        for process in processes.values():
+            if process.is_alive():
+                process.terminate()  # SIGTERM: drain, then exit
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for slot in range(args.processes):
+        start(slot)
+
+    while not stopping:
+        time.sleep(1)
+        for slot, process in list(processes.items()):
+            if stopping or process.is_alive():
+                continue
+            restarts[slot] = restarts.get(slot, 0) + 1
+            delay = min(30, 2 ** restarts[slot])
+            print(f"Consumer process {process.pid} exited with {process.exitcode}; restarting in {delay}s")
+            time.sleep(delay)
+            if not stopping:
+                start(slot)
+
+    deadline = time.monotonic() + GRACEFUL_TIMEOUT
+    for process in processes.values():
+        process.join(max(0, deadline - time.monotonic()))
+        if process.is_alive():
+            print(f"Consumer process {process.pid} did not stop in time; killing it")
+            process.kill()
+            process.join()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a HawkerFlow service role")
+    roles = parser.add_subparsers(dest="role", required=True)
+
+    web = roles.add_parser("web", help="Serve a WSGI app with gunicorn")
+    web.add_argument("target", help="module:app")
+    web.add_argument("--host", default="0.0.0.0")
+    web.add_argument("--port", type=int, required=True)
+    web.add_argument("--workers", type=int, default=int(os.environ.get("WEB_WORKERS", 2)))
+    web.add_argument("--worker-class", default=os.environ.get("WEB_WORKER_CLASS", "gthread"))
+    web.add_argument("--threads", type=int, default=int(os.environ.get("WEB_THREADS", 8)))
+    web.add_argument("--timeout", type=int, default=int(os.environ.get("WEB_TIMEOUT", 30)))
+    web.add_argument("--preload", action="store_true")
+    web.add_argument("--warmup", action="append", default=[], help="module:function run in every worker")
+
+    consumer = roles.add_parser("consumer", help="Run an AMQP consumer in supervised processes")
+    consumer.add_argument("target", help="module:function that consumes until stopped")
+    consumer.add_argument("--processes", type=int, default=int(os.environ.get("CONSUMER_PROCESSES", 1)))
+    consumer.add_argument("--warmup", action="append", default=[], help="module:function run in every process")
+
+    args = parser.parse_args(argv)
+    # Service modules sit next to this file in the images
+    sys.path.insert(0, os.getcwd())
+    if args.role == "web":
+        run_web(args)
+    else:
+        run_consumers(args)
+
+
+if __name__ == "__main__":
+    main()
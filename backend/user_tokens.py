@@ -0,0 +1,73 @@
+"""
+Signed customer tokens, shared by the HawkerFlow services.
+
+Order Management issues one with every POST /order response
+("customerToken"); the notification sockets and preference routes and
+ordermgt's per-customer endpoints only trust the userId inside a valid
+token, never one sent by the client.
+
+    token = issue("user_123", secret)    # ordermgt, for the order's userId
+    verify(token, secret)                # -> "user_123", or raises InvalidToken
+
+A token is "<base64url userId>.<expires at>.<base64url HMAC-SHA256>",
+signed with CUSTOMER_TOKEN_SECRET, which every service that issues or
+verifies tokens must share.
+
+    python user_tokens.py <userId> [ttl seconds]    # prints a token, for testing
+"""
+
+import base64
+import hashlib
+import hmac
+import os
+import sys
+import time
+
+DEFAULT_TTL_SECONDS = 12 * 3600
+
+
+class InvalidToken(Exception):
+    pass
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def _signature(payload: str, secret: str) -> str:
+    return _b64encode(hmac.new(secret.encode("utf-8"), payload.encode("ascii"), hashlib.sha256).digest())
+
+
+def issue(user_id: str, secret: str, ttl_seconds: int = DEFAULT_TTL_SECONDS) -> str:
+    payload = f"{_b64encode(user_id.encode('utf-8'))}.{int(time.time()) + ttl_seconds}"
+    return f"{payload}.{_signature(payload, secret)}"
+
+
+def verify(token, secret: str) -> str:
+    """Returns the token's userId; raises InvalidToken if it is malformed, forged or expired."""
+    if not secret:
+        raise InvalidToken("no secret configured")
+    if not token or not isinstance(token, str) or token.count(".") != 2:
+        raise InvalidToken("malformed token")
+    encoded_user, expires_at, signature = token.split(".")
+    if not hmac.compare_digest(signature, _signature(f"{encoded_user}.{expires_at}", secret)):
+        raise InvalidToken("bad signature")
+    try:
+        expired = int(expires_at) < time.time()
+        user_id = _b64decode(encoded_user).decode("utf-8")
+    except ValueError:
+        raise InvalidToken("malformed token")
+    if expired:
+        raise InvalidToken("token expired")
+    return user_id
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or not os.environ.get("CUSTOMER_TOKEN_SECRET"):
+        sys.exit("usage: CUSTOMER_TOKEN_SECRET=... python user_tokens.py <userId> [ttl seconds]")
+    ttl = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_TTL_SECONDS
+    print(issue(sys.argv[1], os.environ["CUSTOMER_TOKEN_SECRET"], ttl))